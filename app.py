@@ -1,20 +1,24 @@
+import asyncio
 import json
-import boto3
 import logging
 import os
 
 from chalice import Chalice
 
 from chalicelib.action import Action
-from chalicelib.lib.helpers import parse_config
+from chalicelib.lib import metrics, profiler
+from chalicelib.lib.api import get_backend
+from chalicelib.lib.config import load_config
+from chalicelib.lib.helpers import parse_bool, parse_rate, parse_seconds
 from chalicelib.lib.reminder import remind_users
+from chalicelib.lib.reminder_ledger import SqliteReminderLedger
 from chalicelib.lib.slack import (
-    Slack,
+    get_slack,
     slack_payload_extractor,
     slack_responder,
     verify_token,
 )
-from chalicelib.lib.sqs import send_message
+from chalicelib.lib.sqs import process_records, send_message
 
 app = Chalice(app_name="timereport")
 app.debug = True
@@ -23,8 +27,9 @@ app.debug = True
 logger = logging.getLogger()
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
-config = parse_config(f"{dir_path}/chalicelib/config.yaml")
+config = load_config(f"{dir_path}/chalicelib/config.yaml")
 config["backend_url"] = os.getenv("backend_url")
+config["backend_api_key"] = os.getenv("backend_api_key", "development")
 config["bot_access_token"] = os.getenv("bot_access_token")
 config["signing_secret"] = os.getenv("signing_secret")
 config["enable_lock_reminder"] = os.getenv("enable_lock_reminder")
@@ -32,6 +37,26 @@ config["format_str"] = "%Y-%m-%d"
 config["command_queue"] = f"timereport-slack-command-{os.getenv('environment')}"
 config["interactive_queue"] = f"timereport-slack-interactive-{os.getenv('environment')}"
 config["enable_queue"] = os.getenv("enable_queue")
+# Optional, when not set the queue URL is looked up by name on first use
+config["command_queue_url"] = os.getenv("command_queue_url")
+config["interactive_queue_url"] = os.getenv("interactive_queue_url")
+config["sqs_partial_batch_response"] = parse_bool(
+    os.getenv("sqs_partial_batch_response")
+)
+config["period_data_cross_check"] = parse_bool(os.getenv("period_data_cross_check"))
+config["lock_cache_ttl"] = parse_seconds(
+    "lock_cache_ttl", os.getenv("lock_cache_ttl"), default=60
+)
+config["idempotency_ttl"] = os.getenv("idempotency_ttl")
+config["enable_metrics"] = parse_bool(os.getenv("enable_metrics"))
+# Comma separated user ids allowed to read the events of all users
+config["admin_user_ids"] = os.getenv("admin_user_ids")
+# Profile this share of the queue handler invocations, 0.01 is 1%
+config["profile_sample_rate"] = parse_rate(
+    "profile_sample_rate", os.getenv("profile_sample_rate")
+)
+# Comma separated user ids that are always profiled
+config["profile_user_ids"] = os.getenv("profile_user_ids")
 
 logger.setLevel(config["log_level"])
 
@@ -41,11 +66,35 @@ def dummy():
     The sole purpose is to force Chalice to generate the right permissions in the policy.
     Does nothing and returns nothing.
     """
+    import boto3
+
     sqs = boto3.client("sqs")
     sqs.send_message()
     sqs.get_queue_url()
 
 
+def profile(function, message):
+    """
+    Profile handling message when sampled, see profiler.should_profile
+    """
+    return profiler.profile(
+        function,
+        enabled=profiler.should_profile(config, profiler.message_user_id(message)),
+        top=config["profile_top"],
+    )
+
+
+def invocation(function):
+    """
+    Collect metrics for an invocation of function, emitted when enable_metrics is true
+    """
+    return metrics.invocation(
+        namespace=config["metrics_namespace"],
+        enabled=config["enable_metrics"],
+        function=function,
+    )
+
+
 @app.route(
     "/interactive",
     methods=["POST"],
@@ -61,9 +110,11 @@ def interactive():
             config["interactive_queue"],
             payload,
             interactive_handler,
+            queue_url=config["interactive_queue_url"],
         )
 
-    return handle_slack_request(_handle_message)
+    with invocation("interactive"):
+        return handle_slack_request(_handle_message)
 
 
 @app.route(
@@ -72,26 +123,35 @@ def interactive():
 def command():
     def _handle_message(payload):
         action_instance = Action.create(payload, config)
-        if action_instance.is_valid():
+        metrics.set_dimension("action", action_instance.name)
+        with metrics.span("is_valid"):
+            is_valid = action_instance.is_valid()
+        if is_valid:
             send_message(
                 config["enable_queue"],
                 config["command_queue"],
-                payload,
+                action_instance.to_envelope(),
                 command_handler,
+                queue_url=config["command_queue_url"],
             )
 
-    return handle_slack_request(_handle_message)
+    with invocation("command"):
+        return handle_slack_request(_handle_message)
 
 
+@metrics.timed("handle_slack_request")
 def handle_slack_request(action):
     payload = None
     try:
         req = app.current_request.raw_body.decode()
         req_headers = app.current_request.headers
-        if not verify_token(req_headers, req, config["signing_secret"]):
+        with metrics.span("verify_token"):
+            verified = verify_token(req_headers, req, config["signing_secret"])
+        if not verified:
             return "Slack signing secret not valid"
 
-        payload = slack_payload_extractor(req)
+        with metrics.span("parse_payload"):
+            payload = slack_payload_extractor(req)
 
         logger.info(f"Slack extracted payload for command: {payload}")
 
@@ -107,24 +167,50 @@ def handle_slack_request(action):
     return ""
 
 
-@app.on_sqs_message(queue=config["command_queue"])
+@app.on_sqs_message(queue=config["command_queue"], batch_size=config["sqs_batch_size"])
 def command_handler(event):
-    for record in event:
-        action = Action.create(json.loads(record.body), config)
-        action.perform_action()
-
-
-@app.on_sqs_message(queue=config["interactive_queue"])
+    def _handle_record(record):
+        message = json.loads(record.body)
+        with invocation("command_handler"), profile("command_handler", message):
+            action = Action.from_message(message, config)
+            metrics.set_dimension("action", action.name)
+            with metrics.span("perform_action"):
+                asyncio.run(action.perform_action_async())
+
+    return process_records(
+        event,
+        _handle_record,
+        max_workers=config["sqs_max_workers"],
+        partial_batch_response=config["sqs_partial_batch_response"],
+    )
+
+
+@app.on_sqs_message(
+    queue=config["interactive_queue"], batch_size=config["sqs_batch_size"]
+)
 def interactive_handler(event):
-    for record in event:
-        action = Action.create(json.loads(record.body), config)
-        action.perform_interactive()
+    def _handle_record(record):
+        message = json.loads(record.body)
+        with invocation("interactive_handler"), profile("interactive_handler", message):
+            action = Action.create(message, config)
+            metrics.set_dimension("action", action.name)
+            with metrics.span("perform_interactive"):
+                action.perform_interactive_once()
+
+    return process_records(
+        event,
+        _handle_record,
+        max_workers=config["sqs_max_workers"],
+        partial_batch_response=config["sqs_partial_batch_response"],
+    )
 
 
 @app.schedule("rate(1 day)")
 def check_user_locks(event):
     if config["enable_lock_reminder"]:
         remind_users(
-            slack=Slack(slack_token=config["bot_access_token"]),
-            backend_url=config["backend_url"],
+            slack=get_slack(config["bot_access_token"]),
+            backend=get_backend(config),
+            ledger=SqliteReminderLedger(),
+            cadence_days=config["reminder_cadence_days"],
         )
@@ -0,0 +1,65 @@
+"""
+Benchmark of finding locked months in a date range, compared with the previous
+implementation that walked every day in the range.
+
+Run from the root of the project:
+    python -m benchmarks.check_locks
+"""
+
+import timeit
+from datetime import datetime
+
+from chalicelib.lib.helpers import date_range, locked_months_in_range
+
+# Two years of locks, the first month of every quarter is left unlocked
+LOCKED_MONTHS = frozenset(
+    f"{year}-{month:02}"
+    for year in (2019, 2020)
+    for month in range(1, 13)
+    if month % 3 != 1
+)
+
+RANGES = {
+    "1 day": ("2020-06-01", "2020-06-01"),
+    "1 month": ("2020-06-01", "2020-06-30"),
+    "summer vacation": ("2020-06-01", "2020-08-31"),
+    "1 year": ("2020-01-01", "2020-12-31"),
+    "5 years": ("2016-01-01", "2020-12-31"),
+}
+
+
+def per_day_locked_months(locked_months, start_date, end_date):
+    dates_to_check = list()
+    for date in date_range(start_date=start_date, stop_date=end_date):
+        if not date.strftime("%Y-%m") in dates_to_check:
+            dates_to_check.append(date.strftime("%Y-%m"))
+
+    locked = list(locked_months)
+    return [date for date in dates_to_check if date in locked]
+
+
+def main(number=1000):
+    print(f"{'range':<16}{'per day (us)':>14}{'month set (us)':>16}{'speedup':>10}")
+    for name, (start, end) in RANGES.items():
+        start_date = datetime.strptime(start, "%Y-%m-%d")
+        end_date = datetime.strptime(end, "%Y-%m-%d")
+        assert per_day_locked_months(
+            LOCKED_MONTHS, start_date, end_date
+        ) == locked_months_in_range(LOCKED_MONTHS, start_date, end_date)
+
+        per_day = timeit.timeit(
+            lambda: per_day_locked_months(LOCKED_MONTHS, start_date, end_date),
+            number=number,
+        )
+        month_set = timeit.timeit(
+            lambda: locked_months_in_range(LOCKED_MONTHS, start_date, end_date),
+            number=number,
+        )
+        print(
+            f"{name:<16}{per_day / number * 1e6:>14.1f}"
+            f"{month_set / number * 1e6:>16.1f}{per_day / month_set:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
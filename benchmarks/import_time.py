@@ -0,0 +1,81 @@
+"""
+Cold start benchmark, the time to import app and the modules it loads.
+
+Every run imports app in a new interpreter with -X importtime and the median
+cumulative import time per module is reported. The first run is discarded so
+bytecode is compiled and cached before measuring.
+
+Run from the root of the project:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 20 --json > import_time.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules to report besides the ones in this project
+TRACKED = ("app", "boto3", "requests", "ruamel.yaml", "asyncio", "sqlite3", "chalice")
+
+
+def import_times(module: str = "app") -> Dict[str, int]:
+    """
+    Cumulative import time in microseconds per module, from a new interpreter
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def tracked(name: str) -> bool:
+    return name in TRACKED or name == "chalicelib" or name.startswith("chalicelib.")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    import_times()
+    runs = [import_times() for _ in range(args.runs)]
+    modules = sorted(
+        {name for times in runs for name in times if tracked(name)},
+        key=lambda name: -statistics.median(times.get(name, 0) for times in runs),
+    )
+    results = {
+        name: round(statistics.median(times.get(name, 0) for times in runs) / 1000, 2)
+        for name in modules
+    }
+
+    if args.json:
+        print(json.dumps(dict(runs=args.runs, milliseconds=results), indent=2))
+        return
+
+    print(f"Median cumulative import time of {args.runs} runs")
+    print(f"{'module':<36}{'ms':>8}")
+    for name, milliseconds in results.items():
+        print(f"{name:<36}{milliseconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Overhead of the metrics spans, per timed call and per span.
+
+A function returning a response is called undecorated, decorated with
+metrics.timed outside an invocation (metrics disabled) and decorated within
+an invocation (metrics enabled).
+
+Run from the root of the project:
+    python -m benchmarks.metrics_overhead
+"""
+
+import timeit
+
+from chalicelib.lib import metrics
+
+
+class Response:
+    status_code = 200
+
+
+def read_event():
+    return Response()
+
+
+timed_read_event = metrics.timed("backend.read_event")(read_event)
+
+
+def span():
+    with metrics.span("verify_token"):
+        pass
+
+
+def main(number=100000):
+    runs = [
+        ("undecorated", read_event, False),
+        ("timed, disabled", timed_read_event, False),
+        ("timed, enabled", timed_read_event, True),
+        ("span, disabled", span, False),
+        ("span, enabled", span, True),
+    ]
+
+    print(f"{'call':<20}{'ns per call':>14}")
+    for name, func, enabled in runs:
+        with metrics.invocation(
+            namespace="benchmark", enabled=enabled, emit=lambda line: None
+        ):
+            elapsed = timeit.timeit(func, number=number)
+        print(f"{name:<20}{elapsed / number * 1e9:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark of the period summary in list, compared with the previous
+implementation that parsed every date with strptime and searched a list of holidays.
+The current implementation is timed including parsing the events to Event, and
+the memory of the events as dicts and as Event is compared.
+
+Run from the root of the project:
+    python -m benchmarks.period_summary
+"""
+
+import json
+import timeit
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from chalicelib.lib.list import period_summary
+from chalicelib.lib.workdays import month_data, year_table
+from chalicelib.model.event import Event
+
+REASONS = ("vacation", "vab", "sick", "parental")
+
+
+def year_of_events(year):
+    """
+    An event every day of the year, including weekends and holidays
+    """
+    day = date(year, 1, 1)
+    events = []
+    while day.year == year:
+        events.append(
+            dict(
+                event_date=day.isoformat(),
+                reason=REASONS[day.toordinal() % len(REASONS)],
+                hours="8",
+            )
+        )
+        day += timedelta(days=1)
+    return events
+
+
+def year_period_data(year):
+    return dict(
+        total_workdays=sum(year_table(year).workdays),
+        holidays=[
+            holiday
+            for month in range(1, 13)
+            for holiday in month_data(year, month)["helgdagar"]
+        ],
+    )
+
+
+def previous_period_summary(list_data, period_data):
+    holidays = [day["datum"] for day in period_data["holidays"]]
+
+    total_per_type = defaultdict(int)
+    total_absent = 0
+    for event in list_data:
+        event_date = event.get("event_date")
+        weekend = datetime.strptime(event_date, "%Y-%m-%d").isoweekday() >= 6
+        if event_date in holidays or weekend:
+            continue
+        hours = float(event.get("hours"))
+        total_absent += hours
+        total_per_type[event.get("reason")] += hours
+
+    total_workhours = period_data["total_workdays"] * 8
+    return total_workhours - total_absent, total_workhours, dict(total_per_type)
+
+
+def allocated(func):
+    """
+    Bytes allocated by the objects func returns
+    """
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main(number=200):
+    print(f"{'events':<10}{'previous (us)':>15}{'current (us)':>14}{'speedup':>10}")
+    period_data = year_period_data(2020)
+    for size in (31, 366, 5 * 366):
+        events = (year_of_events(2020) * 5)[:size]
+        summary = period_summary(Event.from_list(events), period_data)
+        assert previous_period_summary(events, period_data) == (
+            summary.total_worked,
+            summary.total_workhours,
+            summary.per_reason,
+        )
+
+        previous = timeit.timeit(
+            lambda: previous_period_summary(events, period_data), number=number
+        )
+        current = timeit.timeit(
+            lambda: period_summary(Event.from_list(events), period_data),
+            number=number,
+        )
+        print(
+            f"{size:<10}{previous / number * 1e6:>15.1f}"
+            f"{current / number * 1e6:>14.1f}{previous / current:>9.1f}x"
+        )
+
+    body = json.dumps(year_of_events(2020))
+    as_dicts = allocated(lambda: json.loads(body))
+    as_events = allocated(lambda: Event.from_list(json.loads(body)))
+    print(
+        f"\nMemory of a year of events: {as_dicts / 1024:.0f} KiB as dicts, "
+        f"{as_events / 1024:.0f} KiB as Event"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
+import asyncio
+import calendar
 import json
 import logging
-from collections import defaultdict
+import tempfile
 from datetime import datetime
-from typing import Dict
-
-from chalicelib.lib.api import (
-    create_event,
-    create_lock,
-    delete_event,
-    read_event,
-    read_lock,
-)
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple, Type
+
+import requests
+from chalicelib.lib.aio import run_blocking
+from chalicelib.lib.api import AsyncBackendApi, get_backend
+from chalicelib.lib.cache import get_lock_cache
+from chalicelib.lib.export import export_months, read_events, write_events
 from chalicelib.lib.factory import factory
 from chalicelib.lib.helpers import (
     check_locks,
@@ -19,23 +20,110 @@ from chalicelib.lib.helpers import (
     validate_date,
     validate_reason,
 )
-from chalicelib.lib.list import get_list_data
-from chalicelib.lib.period_data import get_period_data
-from chalicelib.lib.reminder import remind_users
+from chalicelib.lib.idempotency import get_idempotency_store, interactive_key
+from chalicelib.lib.list import (
+    EventRun,
+    event_runs,
+    get_list_data,
+    period_summary,
+    summarize_months,
+)
+from chalicelib.lib.period_data import get_period_data, get_period_data_async
+from chalicelib.lib.reminder import last_month, remind_users
 from chalicelib.lib.slack import (
-    Slack,
+    SlackMessage,
     delete_message_menu,
+    get_slack,
     slack_client_responder,
     slack_responder,
     submit_message_menu,
 )
+from chalicelib.lib.team import UserReport, team_report
+from chalicelib.model.event import format_hours
 
 log = logging.getLogger(__name__)
 
+# Version of the envelope sent on the command queue, see Action.to_envelope
+ENVELOPE_VERSION = 1
+
+
+class ActionRegistry:
+    """
+    Index of Action subclasses by name, alias and unique prefix.
+
+    Subclasses with a name are registered when they are defined. The index and
+    the help text are rebuilt on every registration, which only happens at
+    import, so lookups are a single dict access.
+    """
+
+    def __init__(self):
+        self._actions: Dict[str, Type["Action"]] = {}
+        self.index: Mapping[str, Type["Action"]] = MappingProxyType({})
+        self.help_text = ""
+
+    def register(self, action_cls: Type["Action"]) -> None:
+        for name in (action_cls.name, *action_cls.aliases):
+            if name in self._actions:
+                raise ValueError(
+                    f"{action_cls.__name__} uses the name {name} of {self._actions[name].__name__}"
+                )
+        for name in (action_cls.name, *action_cls.aliases):
+            self._actions[name] = action_cls
+
+        self.index = MappingProxyType(self._build_index())
+        self.help_text = self._build_help_text()
+
+    def get(self, name: str) -> Optional[Type["Action"]]:
+        """
+        The action with name, alias or unique prefix of one, None if there is none
+        """
+        return self.index.get(name)
+
+    @property
+    def actions(self) -> Tuple[Type["Action"], ...]:
+        """
+        The registered actions in the order they were defined
+        """
+        return tuple(dict.fromkeys(self._actions.values()))
+
+    def _build_index(self) -> Dict[str, Type["Action"]]:
+        prefixes: Dict[str, set] = {}
+        for name, action_cls in self._actions.items():
+            if action_cls.hidden:
+                continue
+            for end in range(1, len(name)):
+                prefixes.setdefault(name[:end], set()).add(action_cls)
+
+        index = {
+            prefix: action_classes.pop()
+            for prefix, action_classes in prefixes.items()
+            if len(action_classes) == 1
+        }
+        # Full names and aliases always win over prefixes
+        index.update(self._actions)
+        return index
+
+    def _build_help_text(self) -> str:
+        text = "Supported actions are:\n"
+        for action_cls in self.actions:
+            if action_cls.hidden:
+                continue
+            text += f"\n{action_cls.name} - {action_cls.short_doc}"
+            if action_cls.aliases:
+                text += f" (alias: {', '.join(action_cls.aliases)})"
+        return text
+
+
+registry = ActionRegistry()
+
 
 class Action:
     # Name to identify the action
     name = None
+    # Other names for the action
+    aliases: Tuple[str, ...] = ()
+    # Hide the action from help and prefix matching
+    hidden = False
     # Help text to show when running `/timereport help`
     short_doc = None
     # Help text to show in help for specific command
@@ -47,6 +135,11 @@ class Action:
     # Max arguments required
     max_arguments = 100
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name is not None:
+            registry.register(cls)
+
     @staticmethod
     def create(payload, config):
         try:
@@ -58,28 +151,61 @@ class Action:
                 log.info("No parameters received. Defaulting to help action")
                 params = ["help"]
 
-        action = params[0]
+        action_cls = registry.get(params[0]) or UnsupportedAction
+        return action_cls(payload, config)
+
+    @staticmethod
+    def from_envelope(envelope, config):
+        """
+        Rehydrate an action from an envelope created with to_envelope,
+        without parsing and validating the slack payload again.
+        """
+        if envelope.get("version") != ENVELOPE_VERSION:
+            raise ValueError(f"Unsupported envelope version: {envelope.get('version')}")
 
-        for action_cls in Action.__subclasses__():
-            if action_cls.name == action:
-                return action_cls(payload, config)
+        payload = dict(
+            user_id=envelope["user_id"],
+            user_name=envelope["user_name"],
+            response_url=envelope["response_url"],
+        )
+        action_cls = registry.get(envelope["action"])
+        if action_cls is None or action_cls.name != envelope["action"]:
+            raise ValueError(f"Unknown action in envelope: {envelope['action']}")
 
-        return UnsupportedAction(payload, config)
+        return action_cls(
+            payload, config, params=envelope["params"], state=envelope["state"]
+        )
 
-    def __init__(self, payload, config):
+    @staticmethod
+    def from_message(message, config):
+        """
+        Create an action from a command queue message, either an envelope or a slack payload
+        """
+        if "version" in message:
+            return Action.from_envelope(message, config)
+        return Action.create(message, config)
+
+    def __init__(self, payload, config, params=None, state=None):
         self.payload = payload
         self.config = config
-        self.payload = payload
 
-        try:
-            self.params = self.payload["text"].split()
-        except KeyError:
-            log.info("No parameters received. Defaulting to help action")
-            self.params = ["help"]
+        if params is not None:
+            self.params = params
+        else:
+            try:
+                self.params = self.payload["text"].split()
+            except KeyError:
+                log.info("No parameters received. Defaulting to help action")
+                self.params = ["help"]
+
+        # Anything resolved while validating that perform_action can reuse
+        self.state = state if state is not None else {}
 
         self.config = config
         self.bot_access_token = config["bot_access_token"]
-        self.slack = Slack(slack_token=config["bot_access_token"])
+        self.slack = get_slack(config["bot_access_token"])
+        self.backend = get_backend(config)
+        self.async_backend = AsyncBackendApi(self.backend)
         self.response_url = self.payload["response_url"]
         self.format_str = self.config.get("format_str")
 
@@ -96,6 +222,20 @@ class Action:
         except KeyError:
             self.user_name = ""
 
+    def to_envelope(self) -> Dict[str, Any]:
+        """
+        The parsed and validated action as a compact dict to send on the command queue
+        """
+        return dict(
+            version=ENVELOPE_VERSION,
+            action=self.name,
+            params=self.params,
+            user_id=self.user_id,
+            user_name=self.user_name,
+            response_url=self.response_url,
+            state=self.state,
+        )
+
     def send_response(self, message):
         """
         Send a response to slack
@@ -108,6 +248,37 @@ class Action:
 
         return ""
 
+    def is_admin(self) -> bool:
+        """
+        If the user is in admin_user_ids of config (comma separated), admins can
+        read the events of other users
+        """
+        admin_user_ids = self.config.get("admin_user_ids") or ""
+        return self.user_id in {
+            user_id.strip() for user_id in admin_user_ids.split(",") if user_id.strip()
+        }
+
+    def send_locks_unavailable(self, error):
+        """
+        Respond that the locks of the user couldn't be read, changes are refused
+        since any month in the range could be locked
+        """
+        log.error(f"Unable to read locks for user {self.user_id}: {error}")
+        return self.send_response(
+            message="Unable to check locked months, try again later :cry:"
+        )
+
+    def send_write_result(self, message):
+        """
+        Respond with the result of a backend write. Failures are only logged, raising
+        would release the interactive key and redo the write on redelivery, see
+        perform_interactive_once
+        """
+        try:
+            slack_responder(url=self.response_url, msg=message)
+        except requests.RequestException as error:
+            log.error(f"Failed to send result {message!r} to slack: {error}")
+
     def send_attachment(self, attachment):
         """
         Send an message to slack using attachment
@@ -129,9 +300,7 @@ class Action:
         return slack_client_response
 
     def _get_events(self, date_str):
-        return get_list_data(
-            f"{self.config['backend_url']}", self.user_id, date_str=date_str
-        )
+        return get_list_data(self.backend, self.user_id, date_str=date_str)
 
     def perform_action(self):
         """
@@ -139,6 +308,15 @@ class Action:
         """
         raise NotImplementedError()
 
+    async def perform_action_async(self):
+        """
+        Run the action with asyncio
+
+        Actions with independent backend calls override this to run them concurrently.
+        Defaults to running perform_action.
+        """
+        return self.perform_action()
+
     def perform_interactive(self):
         """
         Run interactive slack callback
@@ -147,6 +325,27 @@ class Action:
         """
         raise NotImplementedError()
 
+    def perform_interactive_once(self):
+        """
+        Run perform_interactive unless the same interactive payload is already handled
+
+        Slack retries, double clicks and SQS redeliveries are ignored
+        """
+        key = interactive_key(self.payload)
+        if key is None:
+            return self.perform_interactive()
+
+        store = get_idempotency_store(self.config)
+        if not store.claim(key):
+            log.info(f"Ignoring duplicate interactive {key}. Stats: {store.stats}")
+            return ""
+
+        try:
+            return self.perform_interactive()
+        except Exception:
+            store.release(key)
+            raise
+
     def is_valid(self):
         """
         Validate input data
@@ -160,6 +359,35 @@ class Action:
             return False
         return True
 
+    def _resolve_date(self, date_string: str) -> None:
+        """
+        Parse the date argument when the command is received and keep it in state,
+        so "today" is the day the command was sent. Invalid dates are reported by
+        perform_action.
+        """
+        date = parse_date(date_string, format_str=self.format_str)
+        if date["from"] is not None and date["to"] is not None:
+            self.state["date"] = {key: value.isoformat() for key, value in date.items()}
+
+    def _parse_date(self, date_string: str) -> Dict[str, Optional[datetime]]:
+        """
+        The date resolved by _resolve_date, or date_string parsed now
+        """
+        if "date" in self.state:
+            return {
+                key: datetime.fromisoformat(value)
+                for key, value in self.state["date"].items()
+            }
+        return parse_date(date_string, format_str=self.format_str)
+
+    def _format_date(self, date: Dict[str, datetime]) -> str:
+        """
+        The parsed date as the date argument, "today" resolved, for confirmation menus
+        """
+        date_from = date["from"].strftime(self.format_str)
+        date_to = date["to"].strftime(self.format_str)
+        return date_from if date_from == date_to else f"{date_from}:{date_to}"
+
 
 class HelpAction(Action):
     name = "help"
@@ -171,16 +399,11 @@ class HelpAction(Action):
     def perform_action(self):
         msg = ""
         if len(self.arguments) > 0:
-            for action_cls in Action.__subclasses__():
-                if action_cls.name == self.arguments[0]:
-                    msg = f"{action_cls.doc}"
-                    break
+            action_cls = registry.get(self.arguments[0])
+            if action_cls is not None:
+                msg = f"{action_cls.doc}"
         if msg == "":
-            msg = "Supported actions are:\n"
-            for action_cls in Action.__subclasses__():
-                if action_cls == UnsupportedAction:
-                    continue
-                msg += f"\n{action_cls.name} - {action_cls.short_doc}"
+            msg = registry.help_text
 
         return self.send_response(message=msg)
 
@@ -211,13 +434,12 @@ class LockAction(Action):
             )
         log.debug(f"Event date is: {self.arguments[0]}")
 
-        response = create_lock(
-            url=self.config["backend_url"],
-            user_id=self.user_id,
-            date=self.arguments[0],
+        response = self.backend.create_lock(
+            user_id=self.user_id, date=self.arguments[0]
         )
         log.debug(f"response was: {response.text}")
         if response.status_code == 200:
+            get_lock_cache(self.config).add_lock(self.user_id, self.arguments[0])
             self.send_response(message=f"Lock successful! :lock: :+1:")
             return ""
         else:
@@ -236,20 +458,27 @@ class LockAction(Action):
             now = datetime.now()
             year = now.year
 
-        response = read_lock(url=self.config["backend_url"], user_id=self.user_id)
-        locks = response.json()
-        locks = [l for l in locks if l["event_date"].startswith(str(year))]
+        try:
+            locked_months = get_lock_cache(self.config).locked_months(
+                self.backend, user_id=self.user_id
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        locks = sorted(month for month in locked_months if month.startswith(str(year)))
 
         if not locks:
             return self.send_response(f"No locks found for year *{year}*")
 
-        self.slack.add_section_block(text=f"Locks found for months in *{year}*")
-        self.slack.add_divider_block()
+        message = SlackMessage()
+        message.add_section_block(text=f"Locks found for months in *{year}*")
+        message.add_divider_block()
 
         for lock in locks:
-            self.slack.add_section_block(text=f"{lock.get('event_date')} :lock:")
+            message.add_section_block(text=f"{lock} :lock:")
 
-        self.slack.post_message(message="From timereport", channel=self.user_id)
+        self.slack.post_message(
+            message="From timereport", channel=self.user_id, blocks=message
+        )
         return ""
 
 
@@ -281,6 +510,13 @@ class AddAction(Action):
     min_arguments = 2
     max_arguments = 3
 
+    def is_valid(self):
+        if not super().is_valid():
+            return False
+
+        self._resolve_date(self.arguments[1])
+        return True
+
     def perform_action(self):
         reason: str = self.arguments[0]
         input_date: str = self.arguments[1]
@@ -297,19 +533,21 @@ class AddAction(Action):
             return self.send_response(message=f"Could not parse hours: {hours}")
 
         # validate dates
-        parsed_dates: Dict[str, datetime] = parse_date(
-            date=input_date, format_str=self.format_str
-        )
+        parsed_dates: Dict[str, datetime] = self._parse_date(input_date)
         if parsed_dates["to"] is None or parsed_dates["from"] is None:
             return self.send_response(message=f"failed to parse date {input_date}")
 
         # validate months in date argument are not locked
-        if check_locks(
-            config=self.config,
-            user_id=self.user_id,
-            date=parsed_dates["from"],
-            second_date=parsed_dates["to"],
-        ):
+        try:
+            locked = check_locks(
+                config=self.config,
+                user_id=self.user_id,
+                date=parsed_dates["from"],
+                second_date=parsed_dates["to"],
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        if locked:
             return self.send_response(
                 message=f"Unable to add since one or more month in range are locked :cry:"
             )
@@ -319,7 +557,7 @@ class AddAction(Action):
             attachment=submit_message_menu(
                 user_name=self.user_name,
                 reason=reason,
-                date=f"{input_date}",
+                date=self._format_date(parsed_dates),
                 hours=hours,
             )
         )
@@ -333,16 +571,14 @@ class AddAction(Action):
         if selection == "submit_yes":
             msg = "Added successfully"
             events = factory(self.payload, format_str=self.config.get("format_str"))
-            response = create_event(
-                url=self.config["backend_url"], event=json.dumps(events)
-            )
+            response = self.backend.create_event(event=json.dumps(events))
 
             if response.status_code != 200:
                 log.debug(
                     f"Event {events} got unexpected response from backend: {response.text}"
                 )
                 msg = "Failed to add one or more of the events"
-            slack_responder(url=response_url, msg=msg)
+            self.send_write_result(msg)
             return ""
         else:
             slack_responder(url=response_url, msg="Action canceled :cry:")
@@ -350,6 +586,7 @@ class AddAction(Action):
 
 class DeleteAction(Action):
     name = "delete"
+    aliases = ("rm",)
     doc = """
         Delete event in timereport.
 
@@ -359,40 +596,90 @@ class DeleteAction(Action):
         """
     short_doc = "Delete event in timereport"
 
+    def is_valid(self):
+        if not super().is_valid():
+            return False
+
+        if self.arguments:
+            self._resolve_date(self.arguments[0])
+        return True
+
     def perform_action(self):
+        date = self._parse_arguments()
+        if date is None:
+            return ""
+
+        try:
+            locked = check_locks(
+                config=self.config,
+                user_id=self.user_id,
+                date=date["from"],
+                second_date=date["to"],
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        if locked:
+            return self._confirm_delete(date=date, locked=locked, events=None)
+
+        events = self._get_events(date_str=date["from"].date().isoformat())
+        return self._confirm_delete(date=date, locked=locked, events=events)
+
+    async def perform_action_async(self):
+        date = self._parse_arguments()
+        if date is None:
+            return ""
+
+        date_str = date["from"].date().isoformat()
+        try:
+            locked, events = await asyncio.gather(
+                run_blocking(
+                    check_locks,
+                    config=self.config,
+                    user_id=self.user_id,
+                    date=date["from"],
+                    second_date=date["to"],
+                ),
+                run_blocking(self._get_events, date_str=date_str),
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        return self._confirm_delete(date=date, locked=locked, events=events)
+
+    def _parse_arguments(self) -> Optional[Dict[str, datetime]]:
+        """
+        Parse the date to delete, responds to the user and returns None if not valid
+        """
         date_string = self.params[1]
-        date: Dict[str, datetime] = parse_date(date_string, format_str=self.format_str)
+        date: Dict[str, datetime] = self._parse_date(date_string)
 
         if date["from"] is None or date["to"] is None:
-            return self.send_response(message=f"Could not parse date {date_string}")
+            self.send_response(message=f"Could not parse date {date_string}")
+            return None
 
         if date["from"] != date["to"]:
-            return self.send_response(
-                message=f"Delete doesn't support date range :cry:"
-            )
+            self.send_response(message=f"Delete doesn't support date range :cry:")
+            return None
 
-        if check_locks(
-            config=self.config,
-            user_id=self.user_id,
-            date=date["from"],
-            second_date=date["to"],
-        ):
+        return date
+
+    def _confirm_delete(self, date, locked, events):
+        """
+        Send the delete confirmation menu if the date is not locked and has events
+        """
+        if locked:
             return self.send_response(
                 message=f"Unable to delete since month is locked :cry:"
             )
 
-        date_str = date["from"].strftime(self.format_str)
-        events = self._get_events(date_str=date_str)
-        has_events = any(
-            event["event_date"] == date_str for event in json.loads(events)
-        )
+        ordinal = date["from"].toordinal()
+        has_events = bool(events) and any(event.ordinal == ordinal for event in events)
         if not has_events:
             return self.send_response(
                 message=f"Unable to delete since no events found :cry:"
             )
 
         self.send_attachment(
-            attachment=delete_message_menu(self.user_name, date_string)
+            attachment=delete_message_menu(self.user_name, self._format_date(date))
         )
         return ""
 
@@ -405,28 +692,25 @@ class DeleteAction(Action):
             user_id = self.payload["user"]["id"]
             message = self.payload["original_message"]["attachments"][0]["fields"]
             date = message[1]["value"]
+            # Only menus sent before the date was resolved in is_valid have "today"
             if date == "today":
                 date = datetime.now().strftime(self.config["format_str"])
 
-            delete_by_date = delete_event(
-                url=self.config["backend_url"], user_id=user_id, date=date
-            )
+            delete_by_date = self.backend.delete_event(user_id=user_id, date=date)
             log.debug(f"Delete event posted. User={user_id}. Date={date}")
 
             if delete_by_date.status_code != 200:
                 log.debug(
                     f"Error from backend: status code: {delete_by_date.status_code}. Response text: {delete_by_date.text}"
                 )
-                slack_responder(
-                    url=response_url, msg=f"Got unexpected response from backend"
-                )
+                self.send_write_result("Got unexpected response from backend")
             else:
                 deleted_count = int(delete_by_date.json().get("count", "0"))
                 if deleted_count > 0:
                     msg = f"Deleted {deleted_count} events for {date}"
                 else:
                     msg = f"No events found to delete for {date}"
-                slack_responder(url=response_url, msg=msg)
+                self.send_write_result(msg)
             return ""
         else:
             slack_responder(url=response_url, msg="Action canceled :cry:")
@@ -445,11 +729,68 @@ class EditAction(Action):
     min_arguments = 3
     max_arguments = 3
 
+    def is_valid(self):
+        if not super().is_valid():
+            return False
+
+        self._resolve_date(self.arguments[1])
+        return True
+
     def perform_action(self):
+        arguments = self._parse_arguments()
+        if arguments is None:
+            return ""
+
+        try:
+            locked = check_locks(
+                config=self.config,
+                user_id=self.user_id,
+                date=arguments["date"]["from"],
+                second_date=arguments["date"]["to"],
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        if locked:
+            return self._confirm_edit(arguments, locked=locked, event_to_edit=None)
+
+        event_to_edit = self.backend.read_event(
+            user_id=self.user_id,
+            date={"from": arguments["date"]["from"].strftime(self.format_str)},
+        )
+        return self._confirm_edit(arguments, locked=locked, event_to_edit=event_to_edit)
+
+    async def perform_action_async(self):
+        arguments = self._parse_arguments()
+        if arguments is None:
+            return ""
+
+        try:
+            locked, event_to_edit = await asyncio.gather(
+                run_blocking(
+                    check_locks,
+                    config=self.config,
+                    user_id=self.user_id,
+                    date=arguments["date"]["from"],
+                    second_date=arguments["date"]["to"],
+                ),
+                self.async_backend.read_event(
+                    user_id=self.user_id,
+                    date={"from": arguments["date"]["from"].strftime(self.format_str)},
+                ),
+            )
+        except requests.RequestException as error:
+            return self.send_locks_unavailable(error)
+        return self._confirm_edit(arguments, locked=locked, event_to_edit=event_to_edit)
+
+    def _parse_arguments(self) -> Optional[Dict[str, Any]]:
+        """
+        Parse reason, date and hours, responds to the user and returns None if not valid
+        """
         reason = self.arguments[0]
 
         if not validate_reason(self.config, reason):
-            return self.send_response(message=f"Reason {reason} is not valid")
+            self.send_response(message=f"Reason {reason} is not valid")
+            return None
 
         date_input = self.arguments[1]
 
@@ -457,29 +798,28 @@ class EditAction(Action):
             hours = float(self.arguments[2])
         except ValueError as error:
             log.error(f"Failed to parse hours. Error was: {error}")
-            return self.send_response(message="Could not parse hours")
+            self.send_response(message="Could not parse hours")
+            return None
 
-        date: Dict[str, datetime] = parse_date(date_input, format_str=self.format_str)
+        date: Dict[str, datetime] = self._parse_date(date_input)
         if date["from"] is None or date["to"] is None:
-            return self.send_response(message=f"failed to parse date {date_input}")
+            self.send_response(message=f"failed to parse date {date_input}")
+            return None
 
         if date["from"] != date["to"]:
-            return self.send_response(message=f"Edit doesn't support date range :cry:")
+            self.send_response(message=f"Edit doesn't support date range :cry:")
+            return None
 
-        if check_locks(
-            config=self.config,
-            user_id=self.user_id,
-            date=date["from"],
-            second_date=date["to"],
-        ):
+        return dict(reason=reason, date_input=date_input, hours=hours, date=date)
+
+    def _confirm_edit(self, arguments, locked, event_to_edit):
+        """
+        Send the edit confirmation menu if the date is not locked and has an event
+        """
+        if locked:
             return self.send_response(
-                message=f"Can't edit date {date_input} because locked month :cry:"
+                message=f"Can't edit date {arguments['date_input']} because locked month :cry:"
             )
-        event_to_edit = read_event(
-            url=self.config["backend_url"],
-            user_id=self.user_id,
-            date={"from": date["from"].strftime(self.format_str)},
-        )
 
         if event_to_edit.status_code != 200:
             log.error(f"Response code from API: {event_to_edit.status_code}")
@@ -489,11 +829,18 @@ class EditAction(Action):
 
         log.debug(f"Event to edit is: {event_to_edit.json()}")
         if not event_to_edit.json():
-            self.send_response(message=f"No event for date {date} to edit. :shrug:")
+            self.send_response(
+                message=f"No event for date {arguments['date']} to edit. :shrug:"
+            )
             return ""
 
         self.send_attachment(
-            attachment=submit_message_menu(self.user_name, reason, date_input, hours)
+            attachment=submit_message_menu(
+                self.user_name,
+                arguments["reason"],
+                self._format_date(arguments["date"]),
+                arguments["hours"],
+            )
         )
 
         return ""
@@ -501,6 +848,7 @@ class EditAction(Action):
 
 class UnsupportedAction(Action):
     name = "unsupported"
+    hidden = True
 
     def perform_action(self):
         return self.send_response(message=f"Unsupported action: {self.action}")
@@ -512,24 +860,202 @@ class ReminderAction(Action):
     doc = ""
 
     def perform_action(self):
-        remind_users(
-            self.slack, self.config["backend_url"], only_for_user_ids=[self.user_id]
+        remind_users(self.slack, self.backend, only_for_user_ids=[self.user_id])
+
+
+class TeamAction(Action):
+    name = "team"
+    short_doc = "Show the reporting status of the whole team"
+    doc = """
+        Show worked hours, absence and lock status for every user in a month.
+        If no month is supplied it will default to last month. Only for admins.
+
+        /timereport team 2020-09
+        """
+    max_arguments = 1
+
+    def perform_action(self):
+        if not self.is_admin():
+            log.warning(f"User {self.user_id} is not allowed to show the team report")
+            return self.send_response(
+                message="Only admins can show the team report :no_entry:"
+            )
+
+        month = self.arguments[0] if self.arguments else last_month()
+        if not validate_date(month, format_str="%Y-%m"):
+            return self.send_response(
+                message=f"Unable to show team report for '{month}' :cry:"
+            )
+
+        report = team_report(
+            self.backend,
+            month=month,
+            max_workers=int(self.config.get("team_report_max_workers") or 8),
         )
+        if report is None:
+            return self.send_response(message="Failed to load users :cry:")
+
+        message = SlackMessage()
+        message.add_section_block(
+            text=f"Team report for *{month}*, {len(report.locked)} of {len(report.users)} locked"
+        )
+        message.add_divider_block()
+        for user in report.users:
+            message.add_section_block(text=self._format_user(user))
+        message.add_section_block(
+            text=f"_Read {len(report.users)} users in {report.elapsed:.1f} seconds_"
+        )
+
+        self.slack.post_message(
+            message="From timereport",
+            channel=self.user_id,
+            thread_pages=True,
+            blocks=message,
+        )
+        return ""
+
+    def _format_user(self, user: UserReport) -> str:
+        if user.error:
+            return f"<@{user.user_id}> :warning: {user.error}"
+
+        lock = ":lock:" if user.locked else ":unlock:"
+        text = f"<@{user.user_id}> {lock} {user.worked_hours} / {user.expected_hours}h"
+        absence = ", ".join(
+            f"{reason}: {hours}h" for reason, hours in user.absence.items()
+        )
+        return f"{text} ({absence})" if absence else text
+
+
+class ExportAction(Action):
+    name = "export"
+    short_doc = "Export events as a CSV or JSONL file"
+    doc = """
+        Export events for a month, a range of months or a year as a file.
+        If no date is supplied it will default to last month.
+        Supported arguments:
+        "date" - The month as "2020-09", a range as "2020-01:2020-06" or a year as "2020".
+        "--all" - Export events for all users instead of only your own, only for admins.
+        "--jsonl" - Export as JSON lines instead of CSV.
+
+        /timereport export 2020-09 --all
+        """
+    max_arguments = 3
+
+    def perform_action(self):
+        arguments = [argument for argument in self.arguments if argument[:2] != "--"]
+        date_str = arguments[0] if arguments else last_month()
+        fmt = "jsonl" if "--jsonl" in self.arguments else "csv"
+
+        try:
+            months = export_months(date_str)
+        except ValueError as error:
+            log.debug(f"Invalid export range {date_str}: {error}")
+            return self.send_response(message=f"Unable to export '{date_str}' :cry:")
+
+        if "--all" in self.arguments:
+            if not self.is_admin():
+                log.warning(f"User {self.user_id} is not allowed to export all users")
+                return self.send_response(
+                    message="Only admins can export all users :no_entry:"
+                )
+            try:
+                response = self.backend.read_users()
+            except requests.RequestException as error:
+                log.error(f"Failed to load users for export: {error}")
+                return self.send_response(message="Failed to load users :cry:")
+            if response.status_code != 200:
+                return self.send_response(message="Failed to load users :cry:")
+            user_ids = list(response.json() or [])
+        else:
+            user_ids = [self.user_id]
+
+        channel = self.slack.open_conversation(self.user_id)
+        if channel is None:
+            return self.send_response(message="Unable to send export :cry:")
+
+        # Events are encoded to a file on disk as they are read, to keep memory flat
+        with tempfile.TemporaryFile() as fd:
+            try:
+                count = write_events(
+                    read_events(self.backend, user_ids, months), fd, fmt
+                )
+            except requests.RequestException as error:
+                log.error(f"Failed to read events for export: {error}")
+                return self.send_response(message="Export failed :cry:")
+
+            response = self.slack.upload_file(
+                fd,
+                filename=f"timereport-{date_str.replace(':', '_')}.{fmt}",
+                channel=channel,
+                title=f"Timereport {date_str}, {count} events",
+            )
+
+        if response.status_code != 200 or not response.json().get("ok"):
+            return self.send_response(message="Failed to upload export :cry:")
+        return ""
 
 
 class ListAction(Action):
     name = "list"
+    aliases = ("ls",)
     doc = """
         List timereport for user.
         If no arguments supplied it will default to current month.
         Supported arguments:
         "today" - List the event for the todays date
         "date" - The date as a string.
+        "--days" - List every day instead of grouping consecutive days with the same reason and hours.
+        "--summary" - One row per month with worked hours and absence, default when listing a year.
         """
     short_doc = "List one or more events in timereport"
 
+    def is_valid(self):
+        if not super().is_valid():
+            return False
+
+        # Resolve "today" and the current month when the command is received
+        self.state["date_str"] = self._get_date_str()
+        return self.state["date_str"] is not None
+
     def perform_action(self):
-        arguments = self.params[1:]
+        date_str = self.state.get("date_str") or self._get_date_str()
+        if date_str is None:
+            return ""
+
+        if self._is_summary(date_str):
+            list_data = self._get_events(date_str=date_str)
+            return self._send_summary(date_str, list_data=list_data)
+
+        period_data = get_period_data(
+            date_str=date_str, cross_check=self.config.get("period_data_cross_check")
+        )
+        list_data = self._get_events(date_str=date_str)
+        return self._send_list(date_str, list_data=list_data, period_data=period_data)
+
+    async def perform_action_async(self):
+        date_str = self.state.get("date_str") or self._get_date_str()
+        if date_str is None:
+            return ""
+
+        if self._is_summary(date_str):
+            list_data = await run_blocking(self._get_events, date_str=date_str)
+            return self._send_summary(date_str, list_data=list_data)
+
+        period_data, list_data = await asyncio.gather(
+            get_period_data_async(
+                date_str=date_str,
+                cross_check=self.config.get("period_data_cross_check"),
+            ),
+            run_blocking(self._get_events, date_str=date_str),
+        )
+        return self._send_list(date_str, list_data=list_data, period_data=period_data)
+
+    def _get_date_str(self) -> Optional[str]:
+        """
+        Get the date string to list from the arguments, responds to the user and
+        returns None if the arguments can't be handled
+        """
+        arguments = [argument for argument in self.params[1:] if argument[:2] != "--"]
 
         log.debug(f"Got arguments: {arguments}")
         try:
@@ -538,90 +1064,113 @@ class ListAction(Action):
             else:
                 date_str = arguments[0]
         except IndexError:
-            month = datetime.now().strftime("%Y-%m")
-            # A hack to set the date_str to the current month
-            date_str = f"{month}-01:{month}-31"
-            arguments = self.params[1:]
+            now = datetime.now()
+            last_day = calendar.monthrange(now.year, now.month)[1]
+            # Default to the current month
+            date_str = f"{now:%Y-%m}-01:{now:%Y-%m}-{last_day:02}"
         except Exception as error:
             log.debug(f"got unexpected exception: {error}", exc_info=True)
             self.send_response(
                 message=f"Got unexpected error with arguments: {arguments}"
             )
-            return ""
+            return None
 
         log.debug(f"The date string set to: {date_str}")
+        return date_str
 
-        period_data = get_period_data(date_str=date_str)
-        list_data = self._get_events(date_str=date_str)
+    def _is_summary(self, date_str: str) -> bool:
+        return "--summary" in self.params or len(date_str) == 4
 
-        if not list_data or list_data == "[]":
+    def _send_summary(self, date_str, list_data):
+        if list_data is False:
             log.debug(f"List returned nothing. Date string was: {date_str}")
             self.send_response(
                 message=f"Sorry, nothing to list with supplied argument {date_str}"
             )
             return ""
 
-        self._create_list_message(data=list_data, period_data=period_data)
-        self.slack.post_message(message="From timereport", channel=self.user_id)
+        if len(date_str) == 4:
+            start_month, end_month = f"{date_str}-01", f"{date_str}-12"
+        else:
+            start_date, _, end_date = date_str.partition(":")
+            start_month, end_month = start_date[:7], (end_date or start_date)[:7]
+
+        message = SlackMessage()
+        message.add_section_block(
+            text=f"Summary for period *{start_month}:{end_month}*"
+        )
+        for summary in summarize_months(list_data, start_month, end_month):
+            absence = ", ".join(
+                f"{reason}: {hours}h" for reason, hours in summary.absence.items()
+            )
+            message.add_section_block(
+                text=f"*{summary.month}* {summary.worked_hours} / {summary.expected_hours}h"
+                + (f" ({absence})" if absence else "")
+            )
+
+        self.slack.post_message(
+            message="From timereport", channel=self.user_id, blocks=message
+        )
         return ""
 
-    def _create_list_message(self, data, period_data) -> None:
+    def _send_list(self, date_str, list_data, period_data):
+        if not list_data:
+            log.debug(f"List returned nothing. Date string was: {date_str}")
+            self.send_response(
+                message=f"Sorry, nothing to list with supplied argument {date_str}"
+            )
+            return ""
+
+        message = self._create_list_message(data=list_data, period_data=period_data)
+        self.slack.post_message(
+            message="From timereport", channel=self.user_id, blocks=message
+        )
+        return ""
+
+    def _create_list_message(self, data, period_data) -> SlackMessage:
         """
         Create the slack block message layout for list action
         """
-        data = json.loads(data)
-
-        start_date = data[0].get("event_date")
-        end_date = data[-1].get("event_date")
+        start_date = data[0].event_date
+        end_date = data[-1].event_date
 
-        self.slack.add_section_block(
+        message = SlackMessage()
+        message.add_section_block(
             text=f"Reported time for period *{start_date}:{end_date}*",
         )
-        self._show_period_data(list_data=data, period_data=period_data)
-        self.slack.add_divider_block()
+        self._show_period_data(message, list_data=data, period_data=period_data)
+        message.add_divider_block()
+
+        if "--days" not in self.params:
+            holidays = [day["datum"] for day in (period_data or {}).get("holidays", [])]
+            for run in event_runs(data, holidays=holidays):
+                message.add_section_block(text=self._format_run(run))
+            return message
 
         for event in data:
-            event_date = event.get("event_date")
-            reason = event.get("reason")
-            hours = event.get("hours")
-            self.slack.add_section_block(
+            event_date = event.event_date
+            reason = event.reason
+            hours = format_hours(event.centihours)
+            message.add_section_block(
                 text=f"Date: *{event_date}*\nReason: *{reason}*\nHours: *{hours}*"
             )
-            self.slack.add_divider_block()
+            message.add_divider_block()
+        return message
 
-    def _show_period_data(self, list_data, period_data) -> Dict[str, int]:
+    def _format_run(self, run: EventRun) -> str:
+        if run.count == 1:
+            return f"*{run.start_date}* · {run.reason} · {run.hours:g}h"
+        return f"*{run.start_date} → {run.end_date}* · {run.reason} · {run.hours:g}h × {run.count}"
+
+    def _show_period_data(self, message: SlackMessage, list_data, period_data) -> None:
         if not period_data:
-            self.slack.add_section_block(text="No information about worked hours")
+            message.add_section_block(text="No information about worked hours")
             return
 
-        total_per_type = defaultdict(int)
-        total_absent = 0
-        for event in self._filter_non_workdays(list_data, period_data):
-            hours = float(event.get("hours"))
-            total_absent += hours
-            total_per_type[event.get("reason")] += hours
-
-        total_workhours = period_data["total_workdays"] * 8
-        total_worked = total_workhours - total_absent
-
-        self.slack.add_section_block(
-            text=f"Total hours: {total_worked} / {total_workhours} ({-total_absent})"
+        summary = period_summary(list_data, period_data)
+        message.add_section_block(
+            text=f"Total hours: {summary.total_worked} / {summary.total_workhours} ({-summary.total_absent})"
         )
 
-        for reason, hours in total_per_type.items():
-            self.slack.add_section_block(text=f"{reason}: {hours}h")
-
-    def _filter_non_workdays(self, list_data, period_data):
-        holidays = [day["datum"] for day in period_data["holidays"]]
-
-        workday_events = []
-        for event in list_data:
-            event_date = event.get("event_date")
-            if event_date not in holidays and not self._is_weekend(event_date):
-                workday_events.append(event)
-
-        return workday_events
-
-    def _is_weekend(self, date_str):
-        date = datetime.strptime(date_str, "%Y-%m-%d")
-        return date.isoweekday() >= 6
+        for reason, hours in summary.per_reason.items():
+            message.add_section_block(text=f"{reason}: {hours}h")
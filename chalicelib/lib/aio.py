@@ -0,0 +1,24 @@
+import asyncio
+import contextvars
+import functools
+from typing import Any, Callable
+
+from chalicelib.lib.profiler import run_profiled
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking function in the default executor of the running event loop
+
+    func runs in a copy of the current context, like asyncio.to_thread, so spans
+    it records end up in the current metrics invocation. It's also part of the
+    active profile, if any.
+
+    :param func: The function to run
+    :return: The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        None, functools.partial(context.run, run_profiled, func, *args, **kwargs)
+    )
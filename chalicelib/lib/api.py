@@ -1,6 +1,11 @@
-import requests
 import logging
-import os
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from chalicelib.lib import metrics
+from chalicelib.lib.aio import run_blocking
 
 log = logging.getLogger(__name__)
 
@@ -8,76 +13,176 @@ log = logging.getLogger(__name__)
 #        implementation of timereport-api v2        #
 #####################################################
 
-# TODO: This should be provided via app.py as rest of config.
-# Maybe convert this to a class to make it easy to setup URL and api key
-backend_api_key = os.getenv("backend_api_key", "development")
-headers = {"Content-Type": "application/json", "Authorization": backend_api_key}
 
+class BackendApi:
+    """
+    Client for timereport-api v2.
 
-def create_event(url: str, event: dict) -> requests.models.Response:
-    """Create event
+    Every instance owns a single requests.Session so connections to the backend
+    are kept alive and reused between calls (and between invocations in a warm
+    lambda container when the instance is fetched with get_backend).
+    """
 
-    :param url: str: URL to backend API v2
-    :param event: dict: event
-    :return: requests.models.Response
+    # Timeout in seconds per endpoint. Can be overridden with backend_timeouts in config
+    default_timeouts = {
+        "create_event": 5,
+        "read_event": 3,
+        "delete_event": 3,
+        "create_lock": 3,
+        "read_lock": 3,
+        "read_users": 3,
+    }
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        timeouts: Optional[Dict[str, float]] = None,
+        pool_maxsize: int = 10,
+    ):
+        self.url = url.rstrip("/") if url else url
+        self.timeouts = dict(self.default_timeouts, **(timeouts or {}))
+
+        self.session = requests.Session()
+        self.session.headers.update(
+            {"Content-Type": "application/json", "Authorization": api_key}
+        )
+        # All calls go to the same host so one pool with a few connections is enough
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @metrics.timed("backend.create_event")
+    def create_event(self, event: dict) -> requests.models.Response:
+        """Create event
+
+        :param event: dict: event
+        :return: requests.models.Response
+        """
+        return self.session.post(
+            url=f"{self.url}/events",
+            json=event,
+            timeout=self.timeouts["create_event"],
+        )
+
+    @metrics.timed("backend.read_event")
+    def read_event(self, user_id: str, date: dict) -> requests.models.Response:
+        """Get existing timereport for a user
+
+        :param user_id: str: a user id
+        :param date: dict: Valid formats: {"from": "2019-01-01"}, {"from": "2019-01-02", "to": "2019-01-03"}
+        :return: requests.models.Response
+        """
+        if not date.get("to"):
+            date["to"] = date["from"]
+
+        return self.session.get(
+            url=f"{self.url}/users/{user_id}/events",
+            params=date,
+            timeout=self.timeouts["read_event"],
+        )
+
+    @metrics.timed("backend.delete_event")
+    def delete_event(self, user_id: str, date: str) -> requests.models.Response:
+        """Delete event for user
+
+        :param user_id: str: user_id
+        :param date: Date to delete as a string (2019-01-01)
+        :return: requests.models.Response
+        """
+        return self.session.delete(
+            url=f"{self.url}/users/{user_id}/events/{date}",
+            timeout=self.timeouts["delete_event"],
+        )
+
+    @metrics.timed("backend.create_lock")
+    def create_lock(self, user_id: str, date: str) -> requests.models.Response:
+        """Lock month for user
+
+        :param user_id: str: user_id
+        :param date: str: date in "YYYY-mm"
+        :return: requests.models.Response
+        """
+        data = {"user_id": user_id, "event_date": date}
+        log.debug(f"Create lock data is: {data}")
+        return self.session.post(
+            url=f"{self.url}/locks",
+            json=data,
+            timeout=self.timeouts["create_lock"],
+        )
+
+    @metrics.timed("backend.read_lock")
+    def read_lock(self, user_id: str) -> requests.models.Response:
+        """
+        List locks for user. Response contains a list of all locks for user
+        and will need to get parsed on our side.
+        :param user_id: str
+        :return: requests.models.Response
+        """
+        return self.session.get(
+            url=f"{self.url}/users/{user_id}/locks",
+            timeout=self.timeouts["read_lock"],
+        )
+
+    @metrics.timed("backend.read_users")
+    def read_users(self) -> requests.models.Response:
+        """
+        List all users. Response contains a dict of user_id -> user name
+        :return: requests.models.Response
+        """
+        return self.session.get(
+            url=f"{self.url}/users", timeout=self.timeouts["read_users"]
+        )
+
+
+class AsyncBackendApi:
     """
-    url = f"{url}/events"
-    response = requests.post(url=url, json=event, headers=headers)
-    return response
+    Asyncio variant of BackendApi.
 
+    Requests are run in the event loop executor using the pooled session of the
+    wrapped BackendApi, so independent calls can be awaited concurrently.
+    """
 
-def read_event(url: str, user_id: str, date: dict) -> requests.models.Response:
-    """Get existing timereport for a user
+    def __init__(self, backend: BackendApi):
+        self.backend = backend
 
-    :param url: str: URL to backend API v2
-    :param user_id: str: a user id
-    :param date: dict: Valid formats: {"from": "2019-01-01"}, {"from": "2019-01-02", "to": "2019-01-03"}
-    :return: requests.models.Response
-    """
-    if not date.get("to"):
-        date["to"] = date["from"]
+    async def create_event(self, event: dict) -> requests.models.Response:
+        return await run_blocking(self.backend.create_event, event=event)
 
-    url = f"{url}/users/{user_id}/events"
-    response = requests.get(url=url, headers=headers, params=date)
-    return response
+    async def read_event(self, user_id: str, date: dict) -> requests.models.Response:
+        return await run_blocking(self.backend.read_event, user_id=user_id, date=date)
 
+    async def delete_event(self, user_id: str, date: str) -> requests.models.Response:
+        return await run_blocking(self.backend.delete_event, user_id=user_id, date=date)
 
-def delete_event(url: str, user_id: str, date: str) -> requests.models.Response:
-    """Delete event for user
+    async def create_lock(self, user_id: str, date: str) -> requests.models.Response:
+        return await run_blocking(self.backend.create_lock, user_id=user_id, date=date)
 
-    :param url: URL to backend API v2
-    :param user_id: str: user_id
-    :param date: Date to delete as a string (2019-01-01)
-    :return: requests.models.Response
-    """
-    url = f"{url}/users/{user_id}/events/{date}"
-    response = requests.delete(url=url, headers=headers)
-    return response
+    async def read_lock(self, user_id: str) -> requests.models.Response:
+        return await run_blocking(self.backend.read_lock, user_id=user_id)
 
+    async def read_users(self) -> requests.models.Response:
+        return await run_blocking(self.backend.read_users)
 
-def create_lock(url: str, user_id: str, date: str) -> requests.models.Response:
-    """Lock month for user
 
-    :param url: str: URL to backend API v2
-    :param user_id: str: user_id
-    :param date: str: date in "YYYY-mm"
-    :return: requests.models.Response
-    """
-    url = f"{url}/locks"
-    data = {"user_id": user_id, "event_date": date}
-    log.debug(f"Create lock data is: {data}")
-    response = requests.post(url=url, json=data, headers=headers)
-    return response
+# Clients are kept for the lifetime of the container to reuse connections
+_backends: Dict[Tuple[str, str], BackendApi] = {}
 
 
-def read_lock(url: str, user_id: str) -> requests.models.Response:
+def get_backend(config: Dict[str, Any]) -> BackendApi:
     """
-    List locks for user. Response contains a list of all locks for user
-    and will need to get parsed on our side.
-    :param url: str
-    :param user_id: str
-    :return: requests.models.Response
+    Get the shared backend client for the backend_url and backend_api_key in config
+
+    :param config: The app config
+    :return: BackendApi
     """
-    url = f"{url}/users/{user_id}/locks"
-    response = requests.get(url=url, headers=headers, timeout=3)
-    return response
+    url = config["backend_url"]
+    api_key = config.get("backend_api_key") or "development"
+
+    key = (url, api_key)
+    if key not in _backends:
+        _backends[key] = BackendApi(
+            url=url, api_key=api_key, timeouts=config.get("backend_timeouts")
+        )
+
+    return _backends[key]
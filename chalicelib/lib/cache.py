@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import requests
+from chalicelib.model.lock import Lock
+
+log = logging.getLogger(__name__)
+
+
+class PeriodDataCache:
+    """
+    Cache for period data per month ("YYYY-MM").
+
+    Entries are kept in an in-process LRU and written to a JSON file (under /tmp
+    by default) so they survive between invocations in the same container.
+    Months that have passed never change and are kept forever, the current and
+    future months expire after current_ttl seconds. The cache is shared by the
+    threads handling queue records, all access to the entries holds a lock.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 256,
+        current_ttl: int = 3600,
+        clock: Callable[[], float] = time.time,
+        today: Callable[[], date] = date.today,
+    ):
+        self.path = path or os.path.join(
+            tempfile.gettempdir(), "timereport-period-data.json"
+        )
+        self.max_entries = max_entries
+        self.current_ttl = current_ttl
+        self.clock = clock
+        self.today = today
+
+        # month -> (data, expires), expires is None for months that never change
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._file_loaded = False
+        self.stats = dict(hits=0, misses=0, file_hits=0, expired=0)
+        self._lock = threading.Lock()
+
+    def get(self, month: str) -> Optional[Any]:
+        """
+        Get cached data for month, None if not cached or expired
+        """
+        with self._lock:
+            return self._get(month)
+
+    def _get(self, month: str) -> Optional[Any]:
+        entry = self._entries.get(month)
+        if entry is None and not self._file_loaded:
+            self._load_file()
+            entry = self._entries.get(month)
+            if entry is not None:
+                self.stats["file_hits"] += 1
+
+        if entry is not None and entry[1] is not None and entry[1] < self.clock():
+            self.stats["expired"] += 1
+            del self._entries[month]
+            entry = None
+
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        self._entries.move_to_end(month)
+        return entry[0]
+
+    def get_many(self, months: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Get all cached months
+
+        :return: Tuple with a dict of the cached months and a list of missing months
+        """
+        found = {}
+        missing = []
+        for month in months:
+            data = self.get(month)
+            if data is None:
+                missing.append(month)
+            else:
+                found[month] = data
+        return found, missing
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """
+        Cache data for several months and write them to the file store
+        """
+        if not items:
+            return
+
+        with self._lock:
+            if not self._file_loaded:
+                self._load_file()
+            for month, data in items.items():
+                self._set(month, data)
+            self._write_file()
+
+    def set(self, month: str, data: Any) -> None:
+        self.set_many({month: data})
+
+    def _set(self, month: str, data: Any) -> None:
+        self._entries[month] = (data, self._expires(month))
+        self._entries.move_to_end(month)
+        self._trim()
+
+    def _trim(self) -> None:
+        # Evict the least recently used entries
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expires(self, month: str) -> Optional[float]:
+        today = self.today()
+        if month < f"{today.year}-{today.month:02}":
+            return None
+        return self.clock() + self.current_ttl
+
+    def _load_file(self) -> None:
+        self._file_loaded = True
+        try:
+            with open(self.path) as fd:
+                stored = json.load(fd)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            log.warning(f"Unable to read period data cache {self.path}: {error}")
+            return
+
+        # The file is ordered from least to most recently used, entries in memory
+        # were used after any entry in the file
+        for month, entry in reversed(list(stored.items())):
+            if month not in self._entries:
+                self._entries[month] = (entry["data"], entry["expires"])
+                self._entries.move_to_end(month, last=False)
+        self._trim()
+
+    def _write_file(self) -> None:
+        stored = {
+            month: dict(data=data, expires=expires)
+            for month, (data, expires) in self._entries.items()
+        }
+        try:
+            # Write to a temporary file first so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "w") as tmp:
+                json.dump(stored, tmp)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            log.warning(f"Unable to write period data cache {self.path}: {error}")
+
+
+class LockCache:
+    """
+    Read-through cache of locked months ("YYYY-MM") per user.
+
+    Locks only change when a lock is created, which updates the cache in place
+    with add_lock. Entries are refreshed from the backend after ttl seconds,
+    stats["stale"] counts refreshes where the backend had changed behind our back
+    and can be used to tune the ttl.
+
+    The cache is shared by the threads handling queue records. Entries are only
+    accessed holding a lock, which isn't held while reading from the backend.
+    """
+
+    def __init__(self, ttl: int = 60, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.clock = clock
+
+        # user_id -> (locked months, expires)
+        self._entries: Dict[str, Tuple[FrozenSet[str], float]] = {}
+        # user_id -> number of changes by add_lock and invalidate
+        self._changes: Dict[str, int] = {}
+        self.stats = dict(hits=0, misses=0, expired=0, stale=0, updates=0)
+        self._lock = threading.Lock()
+
+    def locked_months(self, backend, user_id: str) -> FrozenSet[str]:
+        """
+        Get the locked months for user, reading from backend when not cached
+
+        :param backend: The BackendApi to read locks from
+        :param user_id: The user id
+        :return: frozenset of months in format "YYYY-MM"
+        :raises requests.RequestException: If the locks can't be read, the months
+            must then be treated as locked
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] >= self.clock():
+                self.stats["hits"] += 1
+                return entry[0]
+
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["expired"] += 1
+            changes = self._changes.get(user_id, 0)
+
+        response = backend.read_lock(user_id=user_id)
+        if response.status_code != 200:
+            log.error(
+                f"Failed to read locks for user {user_id}. Status code was: {response.status_code}"
+            )
+            raise requests.HTTPError(
+                f"Failed to read locks for user {user_id}", response=response
+            )
+
+        months = frozenset(lock.month for lock in Lock.from_list(response.json() or []))
+        with self._lock:
+            if entry is not None and entry[0] != months:
+                self.stats["stale"] += 1
+
+            # A lock created while reading may be missing from the response, the
+            # user is then read again on next access instead of cached without it
+            if self._changes.get(user_id, 0) == changes:
+                self._entries[user_id] = (months, self.clock() + self.ttl)
+        return months
+
+    def add_lock(self, user_id: str, month: str) -> None:
+        """
+        Add a created lock to a cached user, users not in the cache are read on next access
+        """
+        with self._lock:
+            self._changes[user_id] = self._changes.get(user_id, 0) + 1
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+
+            self.stats["updates"] += 1
+            self._entries[user_id] = (entry[0] | {month}, entry[1])
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._changes[user_id] = self._changes.get(user_id, 0) + 1
+            self._entries.pop(user_id, None)
+
+
+# Shared for the lifetime of the container, created with the ttl from config
+_lock_cache: Optional[LockCache] = None
+
+
+def get_lock_cache(config: Dict[str, Any]) -> LockCache:
+    """
+    Get the shared lock cache
+
+    :param config: The app config, lock_cache_ttl sets the ttl in seconds, parsed
+        at startup with helpers.parse_seconds
+    :return: LockCache
+    """
+    global _lock_cache
+
+    if _lock_cache is None:
+        ttl = config.get("lock_cache_ttl")
+        _lock_cache = LockCache(ttl=60 if ttl is None else ttl)
+
+    return _lock_cache
@@ -0,0 +1,80 @@
+"""
+The app config is written in chalicelib/config.yaml and compiled to JSON when
+deploying, so cold starts read it with the json module instead of parsing yaml.
+
+Compile from the root of the project:
+    python -m chalicelib.lib.config
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from chalicelib.lib.helpers import parse_config
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.yaml"
+)
+
+
+def compiled_path(source: str) -> str:
+    """
+    The path of the compiled config for source, config.yaml -> config.compiled.json
+    """
+    return f"{os.path.splitext(source)[0]}.compiled.json"
+
+
+def compile_config(source: str = DEFAULT_SOURCE, target: Optional[str] = None) -> str:
+    """
+    Parse the yaml config and write it as JSON together with a hash of the source
+
+    :param source: Path to the yaml config
+    :param target: Path to write the compiled config, defaults to compiled_path(source)
+    :return: The path of the compiled config
+    """
+    target = target or compiled_path(source)
+    compiled = dict(source_sha256=_sha256(source), config=parse_config(source))
+    with open(target, "w") as fd:
+        json.dump(compiled, fd, ensure_ascii=False, indent=2, sort_keys=True)
+    return target
+
+
+def load_config(source: str = DEFAULT_SOURCE) -> Dict[str, Any]:
+    """
+    Load the config, from the compiled config if it's up to date with source
+
+    Falls back to parsing the yaml source when the compiled config is missing or
+    was compiled from a different version of source.
+
+    :param source: Path to the yaml config
+    :return: config
+    """
+    target = compiled_path(source)
+    try:
+        with open(target) as fd:
+            compiled = json.load(fd)
+    except FileNotFoundError:
+        log.debug(f"No compiled config {target}, parsing {source}")
+        return parse_config(source)
+    except (OSError, ValueError) as error:
+        log.warning(f"Unable to read compiled config {target}: {error}")
+        return parse_config(source)
+
+    if compiled.get("source_sha256") != _sha256(source):
+        log.warning(f"Compiled config {target} is out of date, parsing {source}")
+        return parse_config(source)
+
+    return compiled["config"]
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as fd:
+        return hashlib.sha256(fd.read()).hexdigest()
+
+
+if __name__ == "__main__":
+    print(f"Compiled config to {compile_config()}")
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List
+
+from chalicelib.lib.api import BackendApi
+from chalicelib.model.date_range import DateRange
+
+log = logging.getLogger(__name__)
+
+# Columns of the export, in order
+FIELDS = ("user_id", "user_name", "event_date", "reason", "hours")
+FORMATS = ("csv", "jsonl")
+
+
+def export_months(date_str: str) -> List[str]:
+    """
+    The months to export
+
+    :param date_str: Valid formats: "2020", "2020-09" and "2020-01:2020-06"
+    :return: List of months in format "YYYY-MM"
+    :raises ValueError: If date_str is not in a valid format
+    """
+    if len(date_str.partition(":")[0]) not in (4, 7):
+        raise ValueError(f"Export is by month: {date_str}")
+    return DateRange.parse(date_str).months()
+
+
+def read_events(
+    backend: BackendApi, user_ids: Iterable[str], months: List[str]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Read events one user and month at a time, so only a single month of events
+    for one user is held in memory
+
+    :param backend: The backend API client
+    :param user_ids: The users to read events for
+    :param months: Months in format "YYYY-MM"
+    :raises requests.RequestException: If events can't be read
+    """
+    for user_id in user_ids:
+        for month in months:
+            response = backend.read_event(
+                user_id=user_id, date=DateRange.parse(month).to_dict()
+            )
+            response.raise_for_status()
+            yield from response.json() or []
+
+
+def write_events(events: Iterable[Dict[str, Any]], fd: BinaryIO, fmt: str) -> int:
+    """
+    Encode events to fd as they are read
+
+    :param events: The events to write
+    :param fd: Binary file object to write to
+    :param fmt: "csv" or "jsonl"
+    :return: The number of events written
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    text = io.TextIOWrapper(fd, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(text, fieldnames=FIELDS, extrasaction="ignore")
+    if fmt == "csv":
+        writer.writeheader()
+
+    count = 0
+    try:
+        for event in events:
+            if fmt == "csv":
+                writer.writerow(event)
+            else:
+                text.write(json.dumps({field: event.get(field) for field in FIELDS}))
+                text.write("\n")
+            count += 1
+    finally:
+        # Leave fd open for the caller
+        text.detach()
+
+    log.debug(f"Wrote {count} events as {fmt}")
+    return count
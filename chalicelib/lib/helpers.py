@@ -1,14 +1,12 @@
 import logging
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List
+from typing import AbstractSet, Any, Dict, List
 
-from chalicelib.lib.api import read_lock
-from ruamel.yaml import YAML
+from chalicelib.lib.api import get_backend
+from chalicelib.lib.cache import get_lock_cache
 
 log = logging.getLogger(__name__)
 
-yaml = YAML(typ="safe")
-
 
 def parse_config(path="config.yaml"):
     """
@@ -16,12 +14,69 @@ def parse_config(path="config.yaml"):
     :param path: the path to the config file. config.yaml is default
     :return: config
     """
+    # Imported here since the app reads the compiled config, see chalicelib.lib.config
+    from ruamel.yaml import YAML
+
     with open(path) as fd:
-        config = yaml.load(fd)
+        config = YAML(typ="safe").load(fd)
 
     return config
 
 
+def parse_rate(name: str, value: Any) -> float:
+    """
+    Parse a rate between 0 and 1 from config, invalid values are logged and disable it
+
+    :param name: The name of the setting, for the log
+    :param value: The value from config or the environment
+    :return: The rate, 0.0 if not set or invalid
+    """
+    try:
+        rate = float(value or 0)
+    except (TypeError, ValueError):
+        log.warning(f"Invalid {name} {value!r}, using 0")
+        return 0.0
+
+    if not 0 <= rate <= 1:
+        log.warning(f"{name} {value!r} is not between 0 and 1, using 0")
+        return 0.0
+    return rate
+
+
+def parse_seconds(name: str, value: Any, default: int) -> int:
+    """
+    Parse a number of seconds from config, invalid values are logged and replaced by default
+
+    :param name: The name of the setting, for the log
+    :param value: The value from config or the environment
+    :param default: The number of seconds when not set or invalid
+    :return: The number of seconds
+    """
+    if value is None or value == "":
+        return default
+
+    try:
+        seconds = int(value)
+    except (TypeError, ValueError):
+        log.warning(f"Invalid {name} {value!r}, using {default}")
+        return default
+
+    if seconds < 0:
+        log.warning(f"{name} {value!r} is negative, using {default}")
+        return default
+    return seconds
+
+
+def parse_bool(value: Any) -> bool:
+    """
+    Parse a flag from config or the environment, where "false" and "0" are strings
+
+    :param value: The value from config or the environment
+    :return: True for "1", "true" and "yes" in any case, False otherwise
+    """
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
 def date_range(start_date: datetime, stop_date: datetime) -> List[datetime]:
     """
     A generator that yields the days between start_date and stop_date
@@ -121,29 +176,34 @@ def parse_date(date: str, format_str: str = "%Y-%m-%d") -> dict:
     return dates
 
 
+def locked_months_in_range(
+    locked_months: AbstractSet[str], start_date: date, end_date: date
+) -> List[str]:
+    """
+    The locked months ("YYYY-MM") covered by the range start_date to end_date
+
+    Months are compared as strings, which sort the same way as the dates they represent,
+    so the cost only depends on the number of locked months and not the length of the range.
+    """
+    first = f"{start_date.year}-{start_date.month:02}"
+    last = f"{end_date.year}-{end_date.month:02}"
+    return sorted(month for month in locked_months if first <= month <= last)
+
+
 def check_locks(
     config: Dict[str, Any], user_id: str, date: datetime, second_date: datetime
 ) -> list:
     """
     Get a list of locks for the specified user and daterange
+
+    :raises requests.RequestException: If the locks can't be read
     """
-    dates_to_check = list()
-    for date in date_range(start_date=date, stop_date=second_date):
-        if not date.strftime("%Y-%m") in dates_to_check:
-            dates_to_check.append(date.strftime("%Y-%m"))
-
-    log.debug(f"Got {len(dates_to_check)} date(s) to check")
-    response = read_lock(url=config["backend_url"], user_id=user_id)
-    data = response.json()
-    if not data:
-        return []
-
-    locked_dates = list()
-    locked_months = [d["event_date"] for d in data]
-    for date in dates_to_check:
-        if date in locked_months:
-            log.info(f"Date {date} is locked")
-            dates_to_check.append(response.json())
-            locked_dates.append(date)
+    lock_cache = get_lock_cache(config)
+    locked_months = lock_cache.locked_months(get_backend(config), user_id=user_id)
+    log.debug(f"Lock cache stats: {lock_cache.stats}")
+
+    locked_dates = locked_months_in_range(locked_months, date, second_date)
+    if locked_dates:
+        log.info(f"Dates {locked_dates} are locked")
 
     return locked_dates
@@ -0,0 +1,138 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+
+def interactive_key(payload: Dict[str, Any]) -> Optional[str]:
+    """
+    The idempotency key of an interactive slack payload
+
+    A message can only be answered once per selection, so the key is built from the
+    message rather than the click (every click gets a new action_ts). action_ts is
+    only used when the payload has no message_ts.
+
+    :param payload: The interactive payload from slack
+    :return: The key or None if the payload can't be identified
+    """
+    message_ts = payload.get("message_ts") or payload.get("action_ts")
+    if not message_ts:
+        return None
+
+    try:
+        user_id = payload["user"]["id"]
+        selection = payload["actions"][0]["value"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+    return f"{payload.get('callback_id')}:{user_id}:{message_ts}:{selection}"
+
+
+class IdempotencyStore:
+    """
+    Store of handled keys, kept in memory and in a SQLite database (under /tmp
+    by default) shared by invocations in the same container.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: int = 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path or os.path.join(
+            tempfile.gettempdir(), "timereport-idempotency.sqlite"
+        )
+        self.ttl = ttl
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._seen: Dict[str, float] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = dict(claimed=0, duplicates=0, released=0)
+
+    def claim(self, key: str) -> bool:
+        """
+        Claim a key before handling it
+
+        :return: True if the key is new, False if it's already handled (a duplicate)
+        """
+        now = self.clock()
+        with self._lock:
+            expires = self._seen.get(key)
+            if expires is not None and expires >= now:
+                return self._duplicate(key)
+
+            if not self._claim_in_db(key, now):
+                self._seen[key] = now + self.ttl
+                return self._duplicate(key)
+
+            self._seen[key] = now + self.ttl
+            self.stats["claimed"] += 1
+            return True
+
+    def release(self, key: str) -> None:
+        """
+        Release a claimed key, used when handling failed so it can be retried
+        """
+        with self._lock:
+            self._seen.pop(key, None)
+            self.stats["released"] += 1
+            db = self._connection()
+            if db is not None:
+                with db:
+                    db.execute("DELETE FROM handled WHERE key = ?", (key,))
+
+    def _duplicate(self, key: str) -> bool:
+        self.stats["duplicates"] += 1
+        log.info(f"Duplicate delivery of {key}")
+        return False
+
+    def _claim_in_db(self, key: str, now: float) -> bool:
+        db = self._connection()
+        if db is None:
+            return True
+
+        with db:
+            db.execute("DELETE FROM handled WHERE expires < ?", (now,))
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO handled (key, expires) VALUES (?, ?)",
+                (key, now + self.ttl),
+            )
+        return cursor.rowcount == 1
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._db is None:
+            try:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS handled (key TEXT PRIMARY KEY, expires REAL)"
+                )
+            except sqlite3.Error as error:
+                log.warning(f"Unable to open idempotency store {self.path}: {error}")
+                self._db = None
+        return self._db
+
+
+# Shared for the lifetime of the container, created with the ttl from config
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store(config: Dict[str, Any]) -> IdempotencyStore:
+    """
+    Get the shared idempotency store
+
+    :param config: The app config, idempotency_ttl sets the ttl in seconds
+    :return: IdempotencyStore
+    """
+    global _store
+
+    if _store is None:
+        _store = IdempotencyStore(ttl=int(config.get("idempotency_ttl") or 3600))
+
+    return _store
@@ -1,41 +1,177 @@
 import logging
+from collections import defaultdict
 from datetime import date
-from chalicelib.lib.api import read_event
+from typing import Any, Dict, Iterable, List, NamedTuple, Union
 
-import requests
+from chalicelib.lib.api import BackendApi
+from chalicelib.lib.workdays import holiday_ordinals, year_table
+from chalicelib.model.date_range import DateRange, month_index, month_str
+from chalicelib.model.event import Event
 
 log = logging.getLogger(__name__)
 
 
-def get_list_data(url, user_id, date_str):
+def get_list_data(backend: BackendApi, user_id, date_str) -> Union[List[Event], bool]:
     """
     Get existing timereport for a user
 
-    :url: The URL to the backend API
+    :backend: The backend API client
     :user_id: The users user ID
-    :date_str: A string contaning date. Valid formats: "2019-01", "2019-01-01", "2019-01-02:2019-01-03" and ""
+    :date_str: A string contaning date. Valid formats: "2019", "2019-01", "2019-01-01", "2019-01-02:2019-01-03" and "2019-01:2019-06"
+    :return: List of Event sorted by date, or False if the events couldn't be read
     """
     try:
-        start_date, end_date = date_str.split(":")
+        date_range = DateRange.parse(date_str)
     except ValueError as error:
-        log.debug(f"Failed to split: {date_str}")
-        log.debug(f"{error}")
-
-        if len(date_str.split("-")) == 2:
-            start_date = f"{date_str}-01"
-            end_date = f"{date_str}-31"
-        else:
-            start_date, end_date = date_str, date_str
-
-    except Exception as error:
-        log.debug(f"Unexpected exception. Error was: {error}", exc_info=True)
+        log.debug(f"Unable to parse date string {date_str}. Error was: {error}")
         return False
 
-    response = read_event(
-        url=url, user_id=user_id, date={"from": start_date, "to": end_date}
-    )
+    response = backend.read_event(user_id=user_id, date=date_range.to_dict())
     if response.status_code == 200:
-        return response.text
+        events = Event.from_list(response.json() or [])
+        events.sort(key=lambda event: event.ordinal)
+        return events
     else:
         log.debug(f"Got response code {response.status_code} for user ID {user_id}")
         return False
+
+
+class EventRun(NamedTuple):
+    start_date: str
+    end_date: str
+    reason: str
+    hours: float
+    # Number of events in the run
+    count: int
+
+
+def event_runs(events: List[Event], holidays: Iterable[str] = ()) -> List[EventRun]:
+    """
+    Group consecutive events with the same reason and hours into runs
+
+    Events are consecutive when only weekends and holidays are between them, so a
+    vacation from monday to friday the week after is a single run.
+
+    :events: Events sorted by event_date
+    :holidays: Dates of holidays in format "YYYY-MM-DD"
+    :return: List of EventRun in the order of events
+    """
+    holidays = {date.fromisoformat(day).toordinal() for day in holidays}
+    runs = []
+    last_ordinal = None
+    for event in events:
+        if (
+            runs
+            and runs[-1].reason == event.reason
+            and runs[-1].hours == event.hours
+            and _only_days_off_between(last_ordinal, event.ordinal, holidays)
+        ):
+            runs[-1] = runs[-1]._replace(
+                end_date=event.event_date, count=runs[-1].count + 1
+            )
+        else:
+            event_date = event.event_date
+            runs.append(EventRun(event_date, event_date, event.reason, event.hours, 1))
+        last_ordinal = event.ordinal
+
+    return runs
+
+
+def _only_days_off_between(first: int, last: int, holidays: Iterable[int]) -> bool:
+    return not any(_is_workday(ordinal, holidays) for ordinal in range(first + 1, last))
+
+
+def _is_workday(ordinal: int, holidays: Iterable[int]) -> bool:
+    # date ordinal 1 is a monday, so ordinal % 7 is 6 for saturday and 0 for sunday
+    return ordinal % 7 not in (6, 0) and ordinal not in holidays
+
+
+class PeriodSummary(NamedTuple):
+    total_workhours: int
+    total_worked: float
+    total_absent: float
+    # Hours of absence on workdays per reason, in order of first occurrence
+    per_reason: Dict[str, float]
+
+
+def period_summary(
+    events: Iterable[Event], period_data: Dict[str, Any]
+) -> PeriodSummary:
+    """
+    Sum the absence on workdays in a period, in a single pass over the events
+
+    Weekends are found with arithmetic on the date ordinal of the events and
+    holidays with a set lookup. Hours are summed exactly in hundredths of an hour.
+
+    :events: The events in the period
+    :period_data: Period data from get_period_data
+    :return: PeriodSummary
+    """
+    holidays = {
+        date.fromisoformat(day["datum"]).toordinal() for day in period_data["holidays"]
+    }
+
+    per_reason: Dict[str, int] = {}
+    for event in events:
+        if _is_workday(event.ordinal, holidays):
+            per_reason[event.reason] = (
+                per_reason.get(event.reason, 0) + event.centihours
+            )
+
+    total_absent = sum(per_reason.values()) / 100 if per_reason else 0
+    total_workhours = period_data["total_workdays"] * 8
+    return PeriodSummary(
+        total_workhours=total_workhours,
+        total_worked=total_workhours - total_absent,
+        total_absent=total_absent,
+        per_reason={reason: hours / 100 for reason, hours in per_reason.items()},
+    )
+
+
+class MonthSummary(NamedTuple):
+    month: str
+    expected_hours: float
+    worked_hours: float
+    # Hours of absence on workdays per reason
+    absence: Dict[str, float]
+
+
+def summarize_months(
+    events: Iterable[Event], start_month: str, end_month: str
+) -> List[MonthSummary]:
+    """
+    Aggregate events into one row per month, in a single pass over the events
+
+    Only absence on workdays is counted, same as the period summary in list.
+
+    :events: The events to aggregate
+    :start_month: The first month in format "YYYY-MM"
+    :end_month: The last month in format "YYYY-MM"
+    :return: List of MonthSummary for every month from start_month to end_month
+    """
+    first = month_index(start_month)
+    absence = [defaultdict(int) for _ in range(month_index(end_month) - first + 1)]
+
+    for event in events:
+        event_date = event.date
+        index = event_date.year * 12 + event_date.month - 1 - first
+        if not 0 <= index < len(absence):
+            continue
+
+        if _is_workday(event.ordinal, holiday_ordinals(event_date.year)):
+            absence[index][event.reason] += event.centihours
+
+    summaries = []
+    for index, reasons in enumerate(absence):
+        year, month = divmod(first + index, 12)
+        expected = year_table(year).workdays[month] * 8
+        absent = sum(reasons.values())
+        summaries.append(
+            MonthSummary(
+                month=month_str(first + index),
+                expected_hours=expected,
+                worked_hours=expected - absent / 100 if absent else expected,
+                absence={reason: hours / 100 for reason, hours in reasons.items()},
+            )
+        )
+    return summaries
@@ -0,0 +1,252 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Max number of values of a metric in a single EMF log line
+MAX_VALUES = 100
+
+
+class Invocation:
+    """
+    Timings and status codes collected during a single invocation.
+
+    Spans may be recorded from several threads, see propagate.
+    """
+
+    def __init__(self, namespace: str, dimensions: Dict[str, str]):
+        self.namespace = namespace
+        self.dimensions = {name: str(value) for name, value in dimensions.items()}
+        # Duration in milliseconds of every span by name
+        self.durations: Dict[str, List[float]] = {}
+        # Number of responses per status code by name
+        self.status_codes: Dict[str, Dict[str, int]] = {}
+        self.errors: List[str] = []
+        self._lock = threading.Lock()
+
+    def add_duration(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.durations.setdefault(name, []).append(round(elapsed_ms, 3))
+
+    def add_status(self, name: str, status_code: int) -> None:
+        with self._lock:
+            counts = self.status_codes.setdefault(name, {})
+            counts[str(status_code)] = counts.get(str(status_code), 0) + 1
+
+    def set_dimension(self, name: str, value: str) -> None:
+        with self._lock:
+            self.dimensions[name] = str(value)
+
+    def add_error(self, name: str) -> None:
+        with self._lock:
+            self.errors.append(name)
+
+    def to_emf(self, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The invocation in CloudWatch Embedded Metric Format
+        https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            values = {
+                name: durations[0] if len(durations) == 1 else durations[:MAX_VALUES]
+                for name, durations in self.durations.items()
+            }
+            emf = dict(
+                _aws=dict(
+                    Timestamp=int(timestamp * 1000),
+                    CloudWatchMetrics=[
+                        dict(
+                            Namespace=self.namespace,
+                            Dimensions=[sorted(self.dimensions)],
+                            Metrics=[
+                                dict(Name=name, Unit="Milliseconds") for name in values
+                            ],
+                        )
+                    ],
+                ),
+                **self.dimensions,
+                **values,
+                status_codes={
+                    name: dict(counts) for name, counts in self.status_codes.items()
+                },
+            )
+            if self.errors:
+                emf["errors"] = list(self.errors)
+        return emf
+
+
+_current: "contextvars.ContextVar[Optional[Invocation]]" = contextvars.ContextVar(
+    "metrics_invocation", default=None
+)
+
+# Returned by span when no invocation is collecting metrics
+_NOOP = contextlib.nullcontext()
+
+
+def _print(line: str) -> None:
+    # EMF log lines must be the whole line, so they're not sent through logging
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+@contextlib.contextmanager
+def invocation(
+    namespace: str,
+    enabled: bool,
+    emit: Callable[[str], None] = _print,
+    **dimensions: str,
+) -> Iterator[Optional[Invocation]]:
+    """
+    Collect the spans recorded until exit and emit them as a single EMF log line
+
+    When not enabled nothing is collected, span and timed are then close to free.
+
+    :param namespace: The CloudWatch namespace of the metrics
+    :param enabled: Collect and emit metrics
+    :param emit: Function writing the EMF log line
+    :param dimensions: Dimensions of the metrics, like function="command"
+    :return: The Invocation, or None when not enabled
+    """
+    if not enabled:
+        yield None
+        return
+
+    current = Invocation(namespace, dimensions)
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.add_duration("invocation", (time.perf_counter() - start) * 1000)
+        _current.reset(token)
+        try:
+            emit(json.dumps(current.to_emf()))
+        except Exception:
+            log.warning("Failed to emit metrics", exc_info=True)
+
+
+class _Span:
+    __slots__ = ("invocation", "name", "start")
+
+    def __init__(self, current: Invocation, name: str):
+        self.invocation = current
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.invocation.add_duration(
+            self.name, (time.perf_counter() - self.start) * 1000
+        )
+        if exc_type is not None:
+            self.invocation.add_error(self.name)
+        return False
+
+
+def span(name: str):
+    """
+    Context manager timing the block as name in the current invocation
+
+    with metrics.span("verify_token"):
+        ...
+    """
+    current = _current.get()
+    if current is None:
+        return _NOOP
+    return _Span(current, name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call as name in the current invocation
+
+    The status code of responses returned by the function is recorded as well.
+    Works for functions and coroutine functions.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    result = await func(*args, **kwargs)
+                _record_result(name, result)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                result = func(*args, **kwargs)
+            _record_result(name, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _record_result(name: str, result: Any) -> None:
+    status_code = getattr(result, "status_code", None)
+    if isinstance(status_code, int):
+        record_status(name, status_code)
+
+
+def record_duration(name: str, elapsed_ms: float) -> None:
+    """
+    Add a duration measured by the caller to the current invocation
+    """
+    current = _current.get()
+    if current is not None:
+        current.add_duration(name, elapsed_ms)
+
+
+def record_status(name: str, status_code: int) -> None:
+    """
+    Count a response status code in the current invocation
+    """
+    current = _current.get()
+    if current is not None:
+        current.add_status(name, status_code)
+
+
+def set_dimension(name: str, value: str) -> None:
+    """
+    Set a dimension of the current invocation, like the name of the action
+    """
+    current = _current.get()
+    if current is not None:
+        current.set_dimension(name, value)
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Bind func to the current invocation, for functions run on other threads
+
+    Threads started by a ThreadPoolExecutor don't inherit context variables.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
@@ -1,20 +1,74 @@
+import asyncio
 import logging
 from datetime import date
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Set
 
 import requests
+from chalicelib.lib import metrics
+from chalicelib.lib.aio import run_blocking
+from chalicelib.lib.cache import PeriodDataCache
 from chalicelib.lib.helpers import month_range, parse_date
+from chalicelib.lib.workdays import month_data
 
 log = logging.getLogger(__name__)
 
+# Remote month data, shared between invocations in the same container
+period_cache = PeriodDataCache()
 
-def get_period_data(date_str: str) -> Dict[str, Any]:
+
+@metrics.timed("period_data")
+def get_period_data(date_str: str, cross_check: bool = False) -> Dict[str, Any]:
     """
     Get information about the period
 
+    The working days and holidays are calculated locally. When cross_check is set,
+    every month is also fetched from api2.codelabs.se (or period_cache) and
+    differences are logged.
+
     :date_str: A string contaning date. Valid formats: "2019-01", "2019-01-01", "2019-01-02:2019-01-03" and ""
+    :cross_check: Compare the result with api2.codelabs.se
     """
+    months = _period_months(date_str)
+    local = [month_data(dt.year, dt.month) for dt in months]
+
+    if cross_check:
+        cached, missing = period_cache.get_many(_month_str(dt) for dt in months)
+        fetched = {month_str: _fetch_month(month_str) for month_str in missing}
+        remote = _store_fetched(months, cached=cached, fetched=fetched)
+        _compare_months(months, local=local, remote=remote)
+
+    return _merge_months(local)
+
+
+@metrics.timed("period_data")
+async def get_period_data_async(
+    date_str: str, cross_check: bool = False
+) -> Dict[str, Any]:
+    """
+    Get information about the period, fetching all months concurrently when cross_check is set
+
+    :date_str: A string contaning date. Valid formats: "2019-01", "2019-01-01", "2019-01-02:2019-01-03" and ""
+    :cross_check: Compare the result with api2.codelabs.se
+    """
+    months = _period_months(date_str)
+    local = [month_data(dt.year, dt.month) for dt in months]
+
+    if cross_check:
+        cached, missing = period_cache.get_many(_month_str(dt) for dt in months)
+        results = await asyncio.gather(
+            *[run_blocking(_fetch_month, month_str) for month_str in missing]
+        )
+        fetched = dict(zip(missing, results))
+        remote = _store_fetched(months, cached=cached, fetched=fetched)
+        _compare_months(months, local=local, remote=remote)
 
+    return _merge_months(local)
+
+
+def _period_months(date_str: str) -> List[date]:
+    """
+    The first day of every month in the period
+    """
     dates = parse_date(date_str, format_str="%Y-%m")
     if dates["from"] is None or dates["to"] is None:
         dates = parse_date(date_str, format_str="%Y-%m-%d")
@@ -23,18 +77,87 @@ def get_period_data(date_str: str) -> Dict[str, Any]:
         current_month = date.today()
         dates = {"from": current_month, "to": current_month}
 
-    total_workdays = 0
-    holidays = []
-    for dt in month_range(dates["from"], dates["to"]):
-        month_str = f"{dt.year}-{dt.month:02}"
-        api_url = f"https://api2.codelabs.se/{month_str}.json"
+    return list(month_range(dates["from"], dates["to"]))
+
+
+def _month_str(dt: date) -> str:
+    return f"{dt.year}-{dt.month:02}"
 
+
+def _store_fetched(
+    months: List[date],
+    cached: Dict[str, Dict[str, Any]],
+    fetched: Dict[str, Optional[Dict[str, Any]]],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Cache the successfully fetched months and return the data for all months in order
+    """
+    period_cache.set_many(
+        {month_str: data for month_str, data in fetched.items() if data is not None}
+    )
+    log.debug(f"Period data cache stats: {period_cache.stats}")
+
+    return [cached.get(_month_str(dt), fetched.get(_month_str(dt))) for dt in months]
+
+
+def _fetch_month(month_str: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the data for a single month, returns None if the month couldn't be fetched
+    """
+    api_url = f"https://api2.codelabs.se/{month_str}.json"
+
+    try:
         response = requests.get(url=api_url, timeout=1)
-        if response.status_code == 200:
-            data = response.json()
-            total_workdays += data["antal_arbetsdagar"]
-            holidays += data["helgdagar"]
-        else:
-            log.debug(f"Got response code {response.status_code} for month {month_str}")
+    except requests.exceptions.RequestException as error:
+        log.debug(f"Failed to fetch month {month_str}. Error was: {error}")
+        return None
+
+    if response.status_code == 200:
+        return response.json()
+
+    log.debug(f"Got response code {response.status_code} for month {month_str}")
+    return None
+
+
+def _compare_months(
+    months: List[date],
+    local: List[Dict[str, Any]],
+    remote: List[Optional[Dict[str, Any]]],
+) -> None:
+    """
+    Log months where the local calendar doesn't match the remote api
+    """
+    for dt, local_data, remote_data in zip(months, local, remote):
+        if remote_data is None:
+            continue
+
+        # Only holidays on weekdays affect the number of working days
+        local_holidays = _weekday_holidays(local_data)
+        remote_holidays = _weekday_holidays(remote_data)
+        if (
+            local_data["antal_arbetsdagar"] != remote_data["antal_arbetsdagar"]
+            or local_holidays != remote_holidays
+        ):
+            log.warning(
+                f"Period data for {_month_str(dt)} differs. Local: {local_data}. Remote: {remote_data}"
+            )
+
+
+def _weekday_holidays(data: Dict[str, Any]) -> Set[str]:
+    return {
+        day["datum"]
+        for day in data["helgdagar"]
+        if date.fromisoformat(day["datum"]).weekday() < 5
+    }
+
+
+def _merge_months(months: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    total_workdays = 0
+    holidays = []
+    for data in months:
+        if data is None:
+            continue
+        total_workdays += data["antal_arbetsdagar"]
+        holidays += data["helgdagar"]
 
     return dict(total_workdays=total_workdays, holidays=holidays)
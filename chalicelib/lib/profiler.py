@@ -0,0 +1,206 @@
+import contextlib
+import contextvars
+import cProfile
+import glob
+import logging
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Only one profiler can be active at a time, see profile
+_lock = threading.Lock()
+
+
+class _Session:
+    """
+    Profiles of the functions run on other threads while a profile is active
+    """
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread with the first profiler
+            return func(*args, **kwargs)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self.profiles.append(profiler)
+
+
+_session: "contextvars.ContextVar[Optional[_Session]]" = contextvars.ContextVar(
+    "profiler_session", default=None
+)
+
+
+def run_profiled(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run func, profiled when called in the context of an active profile
+
+    cProfile only profiles the thread it's enabled in, functions run on executor
+    threads are run through this to be part of the profile, see aio.run_blocking.
+    """
+    session = _session.get()
+    if session is None:
+        return func(*args, **kwargs)
+    return session.run(func, *args, **kwargs)
+
+
+def should_profile(
+    config: Dict[str, Any],
+    user_id: Optional[str] = None,
+    rand: Callable[[], float] = random.random,
+) -> bool:
+    """
+    Decide if an invocation is profiled
+
+    Invocations of users in profile_user_ids (comma separated) are always
+    profiled, others with the probability profile_sample_rate (0.01 is 1%), a
+    float parsed at startup with helpers.parse_rate.
+
+    :param config: The app config
+    :param user_id: The user of the invocation, if known
+    :param rand: Random number in [0, 1)
+    :return: True if the invocation should be profiled
+    """
+    user_ids = config.get("profile_user_ids") or ""
+    if user_id and user_id in (value.strip() for value in user_ids.split(",")):
+        return True
+
+    sample_rate = config.get("profile_sample_rate") or 0
+    return sample_rate > 0 and rand() < sample_rate
+
+
+def message_user_id(message: Dict[str, Any]) -> Optional[str]:
+    """
+    The user of a queue message, an envelope or a slack payload
+    """
+    return message.get("user_id") or (message.get("user") or {}).get("id")
+
+
+@contextlib.contextmanager
+def profile(
+    name: str,
+    enabled: bool = True,
+    top: int = 20,
+    directory: Optional[str] = None,
+    keep: int = 20,
+) -> Iterator[None]:
+    """
+    Profile the block with cProfile, write the raw profile to directory and log
+    the top functions by cumulative time
+
+    The calling thread is profiled, and functions run on other threads with
+    run_profiled (like everything run with aio.run_blocking) are added to the
+    profile. Blocks entered while another profile is active run without profiling.
+
+    Read a profile with: python -m pstats /tmp/timereport-profile-....prof
+
+    :param name: Name of the profiled code, used in the file name
+    :param enabled: Profile the block
+    :param top: Number of functions in the summary
+    :param directory: Where to write profiles, the temp dir (/tmp) by default
+    :param keep: Max number of profiles kept in directory, older ones are removed
+    """
+    if not enabled or not _lock.acquire(blocking=False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    session = _Session()
+    token = _session.set(session)
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            _session.reset(token)
+
+            stats = pstats.Stats(profiler)
+            with session._lock:
+                for thread_profiler in session.profiles:
+                    stats.add(thread_profiler)
+            _save(
+                stats,
+                name,
+                elapsed,
+                len(session.profiles),
+                top,
+                directory or tempfile.gettempdir(),
+                keep,
+            )
+    finally:
+        _lock.release()
+
+
+def _save(
+    stats: pstats.Stats,
+    name: str,
+    elapsed: float,
+    threaded_calls: int,
+    top: int,
+    directory: str,
+    keep: int,
+) -> None:
+    path = os.path.join(
+        directory, f"timereport-profile-{name}-{int(time.time() * 1000)}.prof"
+    )
+    try:
+        stats.dump_stats(path)
+        _prune(directory, keep)
+    except OSError:
+        log.warning(f"Failed to write profile to {path}", exc_info=True)
+        path = None
+
+    log.info(
+        f"Profile of {name} in {elapsed * 1000:.1f} ms with {threaded_calls} calls "
+        f"on other threads, written to {path}\n" + summarize(stats, top)
+    )
+
+
+def _prune(directory: str, keep: int) -> None:
+    profiles = sorted(
+        glob.glob(os.path.join(directory, "timereport-profile-*.prof")),
+        key=os.path.getmtime,
+    )
+    for path in profiles[: max(0, len(profiles) - keep)]:
+        os.remove(path)
+
+
+def summarize(stats: pstats.Stats, top: int = 20) -> str:
+    """
+    The top functions by cumulative time, one per line
+
+    :param stats: The profile
+    :param top: Number of functions
+    :return: Lines with cumulative ms, own ms, number of calls and function
+    """
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top]
+    lines = [f"{'cum ms':>9} {'own ms':>9} {'calls':>7}  function"]
+    for (filename, line, function), (_, calls, own, cumulative, _) in rows:
+        location = (
+            f"{os.path.join(*filename.split(os.sep)[-2:])}:{line}({function})"
+            if line
+            else function
+        )
+        lines.append(
+            f"{cumulative * 1000:>9.1f} {own * 1000:>9.1f} {calls:>7}  {location}"
+        )
+    return "\n".join(lines)
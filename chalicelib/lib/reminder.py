@@ -1,13 +1,25 @@
-import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 import requests
+from chalicelib.lib.api import BackendApi
+from chalicelib.lib.reminder_ledger import ReminderLedger
 from chalicelib.lib.slack import Slack
+from chalicelib.model.lock import Lock
 
 logger = logging.getLogger()
 
+# Outcomes per user in ReminderReport
+LOCKED = "locked"
+REMINDED = "reminded"
+LOCK_READ_FAILED = "lock_read_failed"
+NOTIFY_FAILED = "notify_failed"
+NOT_DUE = "not_due"
+
 
 def last_month() -> str:
     now = datetime.now()
@@ -21,43 +33,204 @@ def last_month() -> str:
     return f"{year}-{month:02}"
 
 
+class TokenBucket:
+    """
+    Thread safe token bucket limiting the rate of slack messages.
+
+    pause() stops handing out tokens for a while, used to honour Retry-After.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available
+        """
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._tokens = 0
+
+
+class ReminderReport:
+    """
+    The outcome per user of a reminder run
+    """
+
+    def __init__(self, month: str):
+        self.month = month
+        self.outcomes: Dict[str, str] = {}
+        self.elapsed = 0.0
+
+    @property
+    def reminded(self) -> List[str]:
+        return [user for user, outcome in self.outcomes.items() if outcome == REMINDED]
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Number of users per outcome and throughput in users per second
+        """
+        summary = dict(users=len(self.outcomes), elapsed=round(self.elapsed, 3))
+        for outcome in self.outcomes.values():
+            summary[outcome] = summary.get(outcome, 0) + 1
+        summary["users_per_second"] = (
+            round(len(self.outcomes) / self.elapsed, 1) if self.elapsed else 0
+        )
+        return summary
+
+
 def remind_users(
-    slack: Slack, backend_url: str, only_for_user_ids: Optional[List[str]] = None
-) -> List[str]:
-    api_url = f"{backend_url}/users"
-    res = requests.get(url=api_url)
+    slack: Slack,
+    backend: BackendApi,
+    only_for_user_ids: Optional[List[str]] = None,
+    max_workers: int = 8,
+    limiter: Optional[TokenBucket] = None,
+    max_retries: int = 3,
+    ledger: Optional[ReminderLedger] = None,
+    cadence_days: float = 1,
+) -> Optional[ReminderReport]:
+    """
+    Send a reminder to every user that has not locked last month
+
+    Locks are fetched concurrently on a pool of max_workers threads and messages
+    are sent through limiter (5 messages per second by default).
+
+    With a ledger, users known to have locked the month are skipped without
+    reading their locks, and users are reminded at most every cadence_days.
+
+    :param slack: The slack client used to send messages
+    :param backend: The backend API client
+    :param only_for_user_ids: Only check these users
+    :param max_workers: Max number of users handled at the same time
+    :param limiter: Rate limiter for slack messages
+    :param max_retries: Max number of retries when slack responds with 429
+    :param ledger: Reminder state from previous runs
+    :param cadence_days: Min number of days between reminders when using a ledger
+    :return: ReminderReport or None if users couldn't be loaded
+    """
+    start = time.perf_counter()
+    try:
+        res = backend.read_users()
+    except requests.RequestException as error:
+        logger.error(f"Failed to load users: {error}")
+        return None
     if res.status_code != 200:
         logger.error(f"Failed to load users: {res.text}")
-        return
+        return None
+
+    limiter = limiter or TokenBucket(rate=5, capacity=5)
+    report = ReminderReport(month=last_month())
 
-    month = last_month()
+    user_ids = [
+        user_id
+        for user_id in res.json() or []
+        if not only_for_user_ids or user_id in only_for_user_ids
+    ]
 
-    reminded_users = []
+    entries = ledger.entries(report.month) if ledger else {}
+    # An hour of margin so a scheduled run that starts a bit early isn't skipped
+    not_before = time.time() - cadence_days * 24 * 3600 + 3600
 
-    for user_id, name in json.loads(res.text).items():
-        if only_for_user_ids and user_id not in only_for_user_ids:
-            continue
-        lock_url = f"{backend_url}/users/{user_id}/locks"
-        lock_res = requests.get(url=lock_url)
-        if res.status_code != 200:
-            logger.error(f"Failed to load user locks {user_id}: {res.text}")
-            continue
+    def _remind(user_id):
+        entry = entries.get(user_id)
+        if entry is not None and entry.locked:
+            return LOCKED
+        if entry is not None and (entry.reminded_at or 0) > not_before:
+            return NOT_DUE
 
-        locked = False
-        for lock in json.loads(lock_res.text):
-            if lock.get("event_date") == month:
-                locked = True
+        outcome = _remind_user(
+            slack, backend, user_id, report.month, limiter, max_retries
+        )
+        if ledger and outcome == LOCKED:
+            ledger.mark_locked(report.month, user_id)
+        elif ledger and outcome == REMINDED:
+            ledger.mark_reminded(report.month, user_id, time.time())
+        return outcome
 
-        if not locked:
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for user_id, outcome in zip(user_ids, pool.map(_remind, user_ids)):
+            report.outcomes[user_id] = outcome
+
+    report.elapsed = time.perf_counter() - start
+    logger.info(f"Reminder for {report.month} done: {report.summary()}")
+    return report
+
+
+def _remind_user(
+    slack: Slack,
+    backend: BackendApi,
+    user_id: str,
+    month: str,
+    limiter: TokenBucket,
+    max_retries: int,
+) -> str:
+    try:
+        lock_res = backend.read_lock(user_id=user_id)
+    except requests.RequestException as error:
+        logger.error(f"Failed to load user locks {user_id}: {error}")
+        return LOCK_READ_FAILED
+    if lock_res.status_code != 200:
+        logger.error(f"Failed to load user locks {user_id}: {lock_res.text}")
+        return LOCK_READ_FAILED
+
+    for lock in Lock.from_list(lock_res.json() or []):
+        if lock.month == month:
+            return LOCKED
+
+    for _ in range(max_retries + 1):
+        limiter.acquire()
+        try:
             slack_res = slack.post_message(
                 channel=user_id,
                 message=f":unlock: You have not locked {month}",
                 as_user=False,
+                # Rate limits are handled by limiter, shared by all threads
+                retries=0,
             )
-            if slack_res.status_code != 200:
-                logger.error(f"Failed to notify slack: {slack_res.text}")
-                continue
+        except requests.RequestException as error:
+            logger.error(f"Failed to notify slack: {error}")
+            return NOTIFY_FAILED
+        if slack_res.status_code != 429:
+            break
+
+        retry_after = float(slack_res.headers.get("Retry-After", 1))
+        logger.warning(f"Rate limited by slack, retrying in {retry_after} seconds")
+        limiter.pause(retry_after)
 
-            reminded_users.append(user_id)
+    if slack_res.status_code != 200:
+        logger.error(f"Failed to notify slack: {slack_res.text}")
+        return NOTIFY_FAILED
 
-    return reminded_users
+    return REMINDED
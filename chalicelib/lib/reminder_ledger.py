@@ -0,0 +1,82 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+
+class LedgerEntry(NamedTuple):
+    locked: bool
+    # Unix timestamp of the last reminder, None if never reminded
+    reminded_at: Optional[float]
+
+
+class ReminderLedger:
+    """
+    Reminder state per user and month, so a reminder run can skip users that
+    already locked the month or were reminded recently.
+    """
+
+    def entries(self, month: str) -> Dict[str, LedgerEntry]:
+        """
+        All entries for month ("YYYY-MM") by user id
+        """
+        raise NotImplementedError()
+
+    def mark_locked(self, month: str, user_id: str) -> None:
+        raise NotImplementedError()
+
+    def mark_reminded(self, month: str, user_id: str, reminded_at: float) -> None:
+        raise NotImplementedError()
+
+
+class SqliteReminderLedger(ReminderLedger):
+    """
+    ReminderLedger stored in a SQLite database, under /tmp by default
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(
+            tempfile.gettempdir(), "timereport-reminders.sqlite"
+        )
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS reminders (
+                    month TEXT,
+                    user_id TEXT,
+                    locked INTEGER DEFAULT 0,
+                    reminded_at REAL,
+                    PRIMARY KEY (month, user_id)
+                )""")
+
+    def entries(self, month: str) -> Dict[str, LedgerEntry]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_id, locked, reminded_at FROM reminders WHERE month = ?",
+                (month,),
+            ).fetchall()
+        return {
+            user_id: LedgerEntry(locked=bool(locked), reminded_at=reminded_at)
+            for user_id, locked, reminded_at in rows
+        }
+
+    def mark_locked(self, month: str, user_id: str) -> None:
+        self._upsert(month, user_id, "locked", 1)
+
+    def mark_reminded(self, month: str, user_id: str, reminded_at: float) -> None:
+        self._upsert(month, user_id, "reminded_at", reminded_at)
+
+    def _upsert(self, month: str, user_id: str, column: str, value) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO reminders (month, user_id) VALUES (?, ?)",
+                (month, user_id),
+            )
+            self._db.execute(
+                f"UPDATE reminders SET {column} = ? WHERE month = ? AND user_id = ?",
+                (value, month, user_id),
+            )
@@ -4,50 +4,381 @@ import hmac
 import json
 import logging
 import os
+import random
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
 from urllib.parse import parse_qs
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from chalicelib.lib import metrics
 
 log = logging.getLogger(__name__)
 
 
+class SlackApi:
+    """
+    HTTP client for the slack web API and slack response urls.
+
+    Connections are pooled and kept alive in a single requests.Session. Requests
+    are retried with jittered exponential backoff, honouring Retry-After, on
+    connection errors and 429. Idempotent requests are retried on timeouts and
+    5xx as well, for others slack may already have handled the request. Latency
+    and errors are counted per slack method in metrics.
+    """
+
+    retry_status_codes = (429, 500, 502, 503, 504)
+    # Status codes that are safe to retry for requests that aren't idempotent
+    rejected_status_codes = (429,)
+    # Upper bounds in milliseconds of the latency histogram buckets
+    latency_buckets = (50, 100, 250, 500, 1000, 2500, float("inf"))
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 10,
+        pool_maxsize: int = 10,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._metrics_lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def post(
+        self,
+        url: str,
+        json: Optional[Dict[str, Any]],
+        headers: Dict[str, str],
+        retries: Optional[int] = None,
+        data: Any = None,
+        idempotent: bool = False,
+    ) -> requests.models.Response:
+        """
+        Post json, form data or a file to slack
+
+        :param url: Slack API method URL or response_url
+        :param json: The data to post as json
+        :param headers: Request headers
+        :param retries: Max number of retries, defaults to max_retries
+        :param data: Form data or a binary file object to stream, instead of json.
+            Files are rewound before every attempt.
+        :param idempotent: The request can be repeated without side effects, like
+            opening a conversation, and is retried after timeouts and 5xx as well.
+            Posting messages is not.
+        :return: requests.models.Response
+        """
+        method = self._method(url)
+        retries = self.max_retries if retries is None else retries
+        body = dict(json=json) if data is None else dict(data=data)
+        retry_status_codes = (
+            self.retry_status_codes if idempotent else self.rejected_status_codes
+        )
+
+        for attempt in range(retries + 1):
+            if hasattr(data, "seek"):
+                data.seek(0)
+
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    url=url, headers=headers, timeout=self.timeout, **body
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                self._record(method, start, error=True)
+                # Read timeouts may come after slack handled the request
+                reached_slack = not isinstance(error, requests.ConnectionError)
+                if attempt == retries or (reached_slack and not idempotent):
+                    raise
+                self.sleep(self._backoff(attempt))
+                continue
+
+            error = response.status_code >= 400
+            self._record(method, start, error=error, status_code=response.status_code)
+            if response.status_code not in retry_status_codes or attempt == retries:
+                return response
+
+            delay = self._retry_after(response) or self._backoff(attempt)
+            log.warning(
+                f"Slack {method} responded {response.status_code}, retrying in {delay:.2f} seconds"
+            )
+            self.sleep(delay)
+
+        return response
+
+    def _method(self, url: str) -> str:
+        if url.startswith(Slack.slack_api_url):
+            return url[len(Slack.slack_api_url) :].strip("/")
+        return "response_url"
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, spreads retries from concurrent senders
+        return random.uniform(0, self.backoff * 2**attempt)
+
+    def _retry_after(self, response: requests.models.Response) -> Optional[float]:
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _record(
+        self,
+        method: str,
+        start: float,
+        error: bool,
+        status_code: Optional[int] = None,
+    ) -> None:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        metrics.record_duration(f"slack.{method}", elapsed_ms)
+        if status_code is not None:
+            metrics.record_status(f"slack.{method}", status_code)
+        with self._metrics_lock:
+            metric = self.metrics.setdefault(
+                method,
+                dict(count=0, errors=0, buckets={le: 0 for le in self.latency_buckets}),
+            )
+            metric["count"] += 1
+            metric["errors"] += int(error)
+            for le in self.latency_buckets:
+                if elapsed_ms <= le:
+                    metric["buckets"][le] += 1
+                    break
+
+
+# Shared for the lifetime of the container to reuse connections to slack
+_slack_api: Optional[SlackApi] = None
+
+
+def get_slack_api() -> SlackApi:
+    global _slack_api
+
+    if _slack_api is None:
+        _slack_api = SlackApi()
+
+    return _slack_api
+
+
+class SlackMessage:
+    """
+    Builder for the blocks of a message.
+
+    Blocks are split into pages, each small enough to be sent as a single slack
+    message, while they are added.
+    """
+
+    # Max number of blocks in a single slack message
+    max_blocks_per_message = 50
+    # Max size of the blocks in a single message as JSON, well below slack's limit
+    max_bytes_per_message = 30000
+
+    def __init__(self):
+        self.blocks: List[Dict[str, Any]] = []
+        # Index in blocks where each message (page) starts
+        self.pages = [0]
+        self._page_bytes = 0
+
+    def page_blocks(self) -> List[List[Dict[str, Any]]]:
+        """
+        The blocks of each page
+        """
+        page_ends = self.pages[1:] + [len(self.blocks)]
+        return [self.blocks[start:end] for start, end in zip(self.pages, page_ends)]
+
+    def add_divider_block(self, slack_block_id: str = "") -> None:
+        """
+        Add a slack block divider to the blocks attribute
+        https://api.slack.com/reference/block-kit/blocks#divider
+        """
+        self._add_block({"type": "divider", "block_id": slack_block_id})
+
+    def add_section_block(self, text: str) -> None:
+        """
+        Add a slack section block to the blocks attribute
+        https://api.slack.com/reference/block-kit/blocks#section
+        """
+        self._add_block({"type": "section", "text": {"type": "mrkdwn", "text": text}})
+
+    def _add_block(self, block: Dict[str, Any]) -> None:
+        """
+        Add a block, starting a new page when the current one is full
+        """
+        size = len(json.dumps(block)) + 1
+        page_blocks = len(self.blocks) - self.pages[-1]
+        if page_blocks and (
+            page_blocks >= self.max_blocks_per_message
+            or self._page_bytes + size > self.max_bytes_per_message
+        ):
+            self.pages.append(len(self.blocks))
+            self._page_bytes = 0
+
+        self.blocks.append(block)
+        self._page_bytes += size
+
+
 class Slack:
+    """
+    Client for the slack web API using a bot token.
+
+    Clients hold no state besides the token and are safe to share between
+    threads, get them with get_slack. Messages with blocks are built with SlackMessage.
+    """
 
     slack_api_url = "https://slack.com/api"
 
-    def __init__(self, slack_token):
+    def __init__(
+        self,
+        slack_token: str,
+        base_url: Optional[str] = None,
+        api: Optional[SlackApi] = None,
+    ):
+        self.slack_api_url = base_url or self.slack_api_url
+        self.api = api or get_slack_api()
         self.headers = {
             "Content-Type": "application/json; charset=utf-8",
             "Authorization": f"Bearer {slack_token}",
         }
-        self.blocks = list()
 
     def post_message(
-        self, message: str, channel: str, as_user=None
+        self,
+        message: str,
+        channel: str,
+        as_user=None,
+        retries: Optional[int] = None,
+        thread_pages: bool = False,
+        blocks: Optional[SlackMessage] = None,
     ) -> requests.models.Response:
         """
         Send slack message to channel. Channel can be a slack user ID to send direct message
+
+        Blocks that don't fit in one message are sent as several messages in order.
         :param message: The text to send
         :param channel: The channel to send the message
         :param as_user: When using user_id as channel, set to false for the message to go only to that user
-        :return: requests.models.Response
+        :param retries: Max number of retries on 429 and connection errors, see SlackApi.post
+        :param thread_pages: Send the messages after the first one in a thread under the first one
+        :param blocks: The blocks to send
+        :return: requests.models.Response of the first message, or the first failed message
         """
 
         data = {"channel": channel, "text": message}
         if as_user is not None:
             data["as_user"] = as_user
 
-        data["blocks"] = self.blocks[:49] if self.blocks else None
-        if len(self.blocks) > 49:
-            data["text"] += " *Too much data to display, some data is missing"
-            data["text"] += ", select a shorter range.*"
-        log.debug(f"Data is: ${data}")
-
+        pages = blocks.page_blocks() if blocks is not None else [[]]
+        if len(pages) == 1:
+            data["blocks"] = pages[0] or None
+            log.debug(f"Data is: ${data}")
+            return self._post(data, retries)
+
+        first_response = None
+        for number, page_blocks in enumerate(pages, start=1):
+            page = dict(data, blocks=page_blocks)
+            page["text"] = f"{message} ({number}/{len(pages)})"
+            if thread_pages and first_response is not None:
+                page["thread_ts"] = first_response.json().get("ts")
+            log.debug(f"Data is: ${page}")
+
+            response = self._post(page, retries)
+            if response.status_code != 200:
+                return response
+            first_response = first_response or response
+
+        return first_response
+
+    def _post(
+        self, data: Dict[str, Any], retries: Optional[int]
+    ) -> requests.models.Response:
         return self._handle_response(
-            requests.post(
+            self.api.post(
                 url=f"{self.slack_api_url}/chat.postMessage",
                 json=data,
                 headers=self.headers,
+                retries=retries,
+            )
+        )
+
+    def open_conversation(self, user_id: str) -> Optional[str]:
+        """
+        Open a direct message with a user
+
+        :param user_id: The slack user ID
+        :return: The channel ID of the direct message, None if it couldn't be opened
+        """
+        response = self._handle_response(
+            self.api.post(
+                url=f"{self.slack_api_url}/conversations.open",
+                json={"users": user_id},
+                headers=self.headers,
+                idempotent=True,
+            )
+        )
+        if response.status_code != 200:
+            return None
+
+        return (response.json().get("channel") or {}).get("id")
+
+    def upload_file(
+        self, fd: BinaryIO, filename: str, channel: str, title: Optional[str] = None
+    ) -> requests.models.Response:
+        """
+        Upload a file to a channel
+
+        Uses the external upload flow that replaced files.upload: get an upload URL,
+        stream the file to it and complete the upload to share it in channel.
+        The file is sent in blocks from fd so it's never held in memory as a whole.
+
+        :param fd: Seekable binary file object with the content to upload
+        :param filename: The name of the file
+        :param channel: The channel ID to share the file in, see open_conversation
+        :param title: The title of the file, defaults to filename
+        :return: requests.models.Response of the last request made
+        """
+        api = self.api
+        # The files methods only accept form data, so no json content type
+        headers = {"Authorization": self.headers["Authorization"]}
+
+        length = fd.seek(0, os.SEEK_END)
+        response = self._handle_response(
+            api.post(
+                url=f"{self.slack_api_url}/files.getUploadURLExternal",
+                json=None,
+                data={"filename": filename, "length": length},
+                headers=headers,
+                idempotent=True,
+            )
+        )
+        upload = response.json() if response.status_code == 200 else {}
+        if not upload.get("ok"):
+            return response
+
+        # The upload URL is only used for this file, uploading again replaces it
+        response = api.post(
+            url=upload["upload_url"], json=None, data=fd, headers={}, idempotent=True
+        )
+        if response.status_code != 200:
+            log.critical(
+                f"Failed to upload {filename}. Status code was: {response.status_code}"
+            )
+            return response
+
+        files = [{"id": upload["file_id"], "title": title or filename}]
+        return self._handle_response(
+            api.post(
+                url=f"{self.slack_api_url}/files.completeUploadExternal",
+                json=None,
+                data={"files": json.dumps(files), "channel_id": channel},
+                headers=headers,
             )
         )
 
@@ -74,21 +405,29 @@ class Slack:
 
         return response
 
-    def add_divider_block(self, slack_block_id: str = "") -> None:
-        """
-        Add a slack block divider to the blocks attribute
-        https://api.slack.com/reference/block-kit/blocks#divider
-        """
-        self.blocks.append({"type": "divider", "block_id": slack_block_id})
 
-    def add_section_block(self, text: str) -> None:
-        """
-        Add a slack section block to the blocks attribute
-        https://api.slack.com/reference/block-kit/blocks#section
-        """
-        self.blocks.append(
-            {"type": "section", "text": {"type": "mrkdwn", "text": text}}
-        )
+# Clients by token and base URL, shared for the lifetime of the container
+_clients: Dict[Tuple[str, str], Slack] = {}
+_clients_lock = threading.Lock()
+
+
+def get_slack(slack_token: str, base_url: str = Slack.slack_api_url) -> Slack:
+    """
+    Get the shared client for a token and slack API base URL
+
+    Clients for slack.com share the connection pool of get_slack_api, other base
+    URLs get a pool of their own.
+
+    :param slack_token: The bot token
+    :param base_url: The base URL of the slack web API
+    :return: Slack
+    """
+    key = (slack_token, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            api = get_slack_api() if base_url == Slack.slack_api_url else SlackApi()
+            _clients[key] = Slack(slack_token, base_url=base_url, api=api)
+        return _clients[key]
 
 
 def slack_client_responder(
@@ -106,17 +445,18 @@ def slack_client_responder(
     """
 
     log.debug(f"Will try to post direct message to user {user_id}")
-    headers = {
-        "Content-Type": "application/json; charset=utf-8",
-        "Authorization": f"Bearer {token}",
-    }
-    return requests.post(
+    slack = get_slack(token)
+    return slack.api.post(
         url=url,
         json={"channel": user_id, "text": "From timereport", "attachments": attachment},
-        headers=headers,
+        headers=slack.headers,
     )
 
 
+# Headers for posts to response urls, they need no token
+RESPONSE_HEADERS = {"Content-Type": "application/json"}
+
+
 def slack_responder(url, msg):
     """
     Sends post to slack_response_url
@@ -124,8 +464,7 @@ def slack_responder(url, msg):
     :param msg:
     :return: boolean
     """
-    headers = {"Content-Type": "application/json"}
-    res = requests.post(url=url, json={"text": msg}, headers=headers)
+    res = get_slack_api().post(url=url, json={"text": msg}, headers=RESPONSE_HEADERS)
     return res.status_code
 
 
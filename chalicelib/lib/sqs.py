@@ -1,7 +1,47 @@
 import json
-from typing import Callable, Dict, Any
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
 
-import boto3
+from chalicelib.lib import metrics
+
+log = logging.getLogger(__name__)
+
+# The client and queue URLs are kept for the lifetime of the container
+_client = None
+_queue_urls: Dict[str, str] = {}
+
+# Latency of enqueued messages in milliseconds per queue name
+enqueue_timings: Dict[str, Dict[str, float]] = {}
+
+
+def get_client():
+    """
+    Get the shared SQS client, created on first use
+
+    boto3 is imported here since it's slow to import and only needed when a
+    message is sent to a queue.
+    """
+    global _client
+
+    if _client is None:
+        import boto3
+
+        _client = boto3.client("sqs")
+
+    return _client
+
+
+def get_queue_url(queue_name: str) -> str:
+    """
+    Get the URL of the queue, only looked up the first time per queue name
+    """
+    if queue_name not in _queue_urls:
+        queue_data = get_client().get_queue_url(QueueName=queue_name)
+        _queue_urls[queue_name] = queue_data["QueueUrl"]
+
+    return _queue_urls[queue_name]
 
 
 def send_message(
@@ -9,6 +49,7 @@ def send_message(
     queue_name: str,
     message: Dict[str, Any],
     message_handler: Callable,
+    queue_url: Optional[str] = None,
 ) -> None:
     """
     Send a message to SQS (if enable_queue is true) otherwise call the callback sycronously
@@ -17,13 +58,75 @@ def send_message(
     :param queue_name: The name of the queue as named during creation
     :param message: Dict containing the message payload
     :param message_handler: The function that is expected to handle the send message (only when queue is disabled)
+    :param queue_url: The URL of the queue if known, skips the lookup by name
     """
     if enable_queue:  # Send to real SQS queue
-        client = boto3.client("sqs")
-        queue_data = client.get_queue_url(QueueName=queue_name)
-        client.send_message(
-            QueueUrl=queue_data["QueueUrl"], MessageBody=json.dumps(message)
+        start = time.perf_counter()
+        get_client().send_message(
+            QueueUrl=queue_url or get_queue_url(queue_name),
+            MessageBody=json.dumps(message),
         )
+        _record_timing(queue_name, (time.perf_counter() - start) * 1000)
     else:  # Handle sync, used for testing
         message_data = dict(body=json.dumps(message), receiptHandle="")
         message_handler(dict(Records=[message_data]), None)
+
+
+def _record_timing(queue_name: str, elapsed_ms: float) -> None:
+    timing = enqueue_timings.setdefault(
+        queue_name, dict(count=0, total_ms=0.0, max_ms=0.0, last_ms=0.0)
+    )
+    timing["count"] += 1
+    timing["total_ms"] += elapsed_ms
+    timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+    timing["last_ms"] = elapsed_ms
+    metrics.record_duration("sqs.send_message", elapsed_ms)
+    log.debug(f"Enqueued message on {queue_name} in {elapsed_ms:.1f} ms")
+
+
+def process_records(
+    records: Iterable[Any],
+    record_handler: Callable[[Any], Any],
+    max_workers: int = 4,
+    partial_batch_response: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Handle the records of an SQS batch concurrently on a bounded pool of threads
+
+    With partial_batch_response only the failed records are reported back to SQS
+    (requires ReportBatchItemFailures on the event source mapping), otherwise the
+    first error is raised after all records are handled and the whole batch is retried.
+
+    :param records: The SQS records
+    :param record_handler: Function handling a single record
+    :param max_workers: Max number of records handled at the same time
+    :param partial_batch_response: Return the failed message ids instead of raising
+    :return: A partial batch response when partial_batch_response is set
+    """
+    records = list(records)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(records)))) as pool:
+        futures = [pool.submit(record_handler, record) for record in records]
+
+    failures = []
+    for record, future in zip(records, futures):
+        message_id = record.to_dict().get("messageId")
+        error = future.exception()
+        if error is None:
+            log.debug(f"Handled message {message_id}")
+        else:
+            log.error(f"Failed to handle message {message_id}", exc_info=error)
+            failures.append((message_id, error))
+
+    log.info(f"Handled {len(records)} message(s), {len(failures)} failed")
+
+    if partial_batch_response:
+        return dict(
+            batchItemFailures=[
+                dict(itemIdentifier=message_id) for message_id, _ in failures
+            ]
+        )
+
+    if failures:
+        raise failures[0][1]
+
+    return None
@@ -0,0 +1,139 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from chalicelib.lib import metrics
+from chalicelib.lib.api import BackendApi
+from chalicelib.lib.list import summarize_months
+from chalicelib.model.date_range import DateRange, month_index
+from chalicelib.model.event import Event
+from chalicelib.model.lock import Lock
+
+log = logging.getLogger(__name__)
+
+
+class UserReport(NamedTuple):
+    user_id: str
+    worked_hours: float
+    expected_hours: float
+    # Hours of absence on workdays per reason
+    absence: Dict[str, float]
+    locked: bool
+    # Set when the events or locks of the user couldn't be read
+    error: Optional[str] = None
+
+
+class TeamReport:
+    """
+    The reporting status of every user for a month
+    """
+
+    def __init__(self, month: str):
+        self.month = month
+        self.users: List[UserReport] = []
+        self.elapsed = 0.0
+
+    @property
+    def locked(self) -> List[str]:
+        return [user.user_id for user in self.users if user.locked]
+
+    @property
+    def failed(self) -> List[str]:
+        return [user.user_id for user in self.users if user.error]
+
+
+def team_report(
+    backend: BackendApi, month: str, max_workers: int = 8
+) -> Optional[TeamReport]:
+    """
+    Read the events and locks of every user for month and aggregate them per user
+
+    Users are handled concurrently on a pool of max_workers threads sharing the
+    pooled session of backend, keep max_workers at or below its pool_maxsize.
+
+    :param backend: The backend API client
+    :param month: The month in format "YYYY-MM"
+    :param max_workers: Max number of users handled at the same time
+    :return: TeamReport or None if users couldn't be loaded
+    """
+    start = time.perf_counter()
+    try:
+        response = backend.read_users()
+    except requests.RequestException as error:
+        log.error(f"Failed to load users: {error}")
+        return None
+    if response.status_code != 200:
+        log.error(f"Failed to load users: {response.text}")
+        return None
+
+    user_ids = list(response.json() or [])
+    report = TeamReport(month=month)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(user_ids)))
+    ) as pool:
+        report.users = list(
+            pool.map(
+                metrics.propagate(
+                    lambda user_id: _user_report(backend, user_id, month)
+                ),
+                user_ids,
+            )
+        )
+
+    report.elapsed = time.perf_counter() - start
+    log.info(
+        f"Team report for {month} done: {len(report.users)} users, "
+        f"{len(report.failed)} failed, in {report.elapsed:.3f} seconds"
+    )
+    return report
+
+
+def _user_report(backend: BackendApi, user_id: str, month: str) -> UserReport:
+    try:
+        return _read_user_report(backend, user_id, month)
+    except (requests.RequestException, ValueError) as error:
+        # ValueError is raised for response bodies that aren't JSON
+        log.error(f"Failed to read report for user {user_id}: {error}")
+        return UserReport(
+            user_id=user_id,
+            worked_hours=0,
+            expected_hours=0,
+            absence={},
+            locked=False,
+            error="Failed to read events or locks",
+        )
+
+
+def _read_user_report(backend: BackendApi, user_id: str, month: str) -> UserReport:
+    date_range = DateRange.parse(month)
+    events = backend.read_event(user_id=user_id, date=date_range.to_dict())
+    locks = backend.read_lock(user_id=user_id)
+
+    summary = summarize_months(
+        Event.from_list(events.json() or []) if events.status_code == 200 else [],
+        month,
+        month,
+    )[0]
+    report = UserReport(
+        user_id=user_id,
+        worked_hours=summary.worked_hours,
+        expected_hours=summary.expected_hours,
+        absence=summary.absence,
+        locked=locks.status_code == 200
+        and any(
+            lock.month_index == month_index(month)
+            for lock in Lock.from_list(locks.json() or [])
+        ),
+    )
+
+    if events.status_code != 200 or locks.status_code != 200:
+        log.error(
+            f"Failed to read report for user {user_id}. Status codes were: "
+            f"events {events.status_code}, locks {locks.status_code}"
+        )
+        return report._replace(error="Failed to read events or locks")
+
+    return report
@@ -0,0 +1,139 @@
+import calendar
+import functools
+from datetime import date, timedelta
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Tuple
+
+#####################################################
+#     Swedish working days and public holidays      #
+#####################################################
+
+# Days off that are the same date every year (month, day, name).
+# Julafton, midsommarafton and nyårsafton are not public holidays by law
+# but are treated as days off, same as in api2.codelabs.se
+FIXED_HOLIDAYS = (
+    (1, 1, "Nyårsdagen"),
+    (1, 6, "Trettondedag jul"),
+    (5, 1, "Första Maj"),
+    (6, 6, "Sveriges nationaldag"),
+    (12, 24, "Julafton"),
+    (12, 25, "Juldagen"),
+    (12, 26, "Annandag jul"),
+    (12, 31, "Nyårsafton"),
+)
+
+# Days off relative to easter sunday (offset in days, name)
+EASTER_HOLIDAYS = (
+    (-2, "Långfredagen"),
+    (-1, "Påskafton"),
+    (0, "Påskdagen"),
+    (1, "Annandag påsk"),
+    (39, "Kristi himmelsfärdsdag"),
+    (49, "Pingstdagen"),
+)
+
+
+class YearTable(NamedTuple):
+    """
+    Precomputed calendar for a year.
+
+    holidays is a sorted tuple of (ordinal, name) and workdays is the number of
+    working days per month, where index 0 is january.
+    """
+
+    holidays: Tuple[Tuple[int, str], ...]
+    workdays: Tuple[int, ...]
+
+
+def easter_sunday(year: int) -> date:
+    """
+    The date of easter sunday (anonymous gregorian algorithm)
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday_offset = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday_offset) // 451
+    month, day = divmod(h + weekday_offset - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _first_weekday_from(year: int, month: int, day: int, weekday: int) -> date:
+    """
+    The first date with weekday (0 is monday) on or after year-month-day
+    """
+    start = date(year, month, day)
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+
+@functools.lru_cache(maxsize=None)
+def year_table(year: int) -> YearTable:
+    """
+    Build the calendar table for a year. Tables are cached for the lifetime of the process.
+    """
+    days_off = {date(year, month, day): name for month, day, name in FIXED_HOLIDAYS}
+
+    easter = easter_sunday(year)
+    for offset, name in EASTER_HOLIDAYS:
+        days_off[easter + timedelta(days=offset)] = name
+
+    midsommarafton = _first_weekday_from(year, 6, 19, calendar.FRIDAY)
+    days_off[midsommarafton] = "Midsommarafton"
+    days_off[midsommarafton + timedelta(days=1)] = "Midsommardagen"
+    days_off[_first_weekday_from(year, 10, 31, calendar.SATURDAY)] = "Alla helgons dag"
+
+    workdays = []
+    for month in range(1, 13):
+        first_weekday, days_in_month = calendar.monthrange(year, month)
+        full_weeks, extra_days = divmod(days_in_month, 7)
+        weekdays = full_weeks * 5 + sum(
+            1 for i in range(extra_days) if (first_weekday + i) % 7 < 5
+        )
+        weekday_holidays = sum(
+            1 for day in days_off if day.month == month and day.weekday() < 5
+        )
+        workdays.append(weekdays - weekday_holidays)
+
+    return YearTable(
+        holidays=tuple(
+            sorted((day.toordinal(), name) for day, name in days_off.items())
+        ),
+        workdays=tuple(workdays),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def holiday_ordinals(year: int) -> FrozenSet[int]:
+    """
+    The date ordinals of all days off in a year, for fast lookups of single dates
+    """
+    return frozenset(ordinal for ordinal, _ in year_table(year).holidays)
+
+
+def month_data(year: int, month: int) -> Dict[str, Any]:
+    """
+    The calendar for a single month in the same format as api2.codelabs.se/YYYY-MM.json
+
+    :param year: The year
+    :param month: The month (1-12)
+    :return: dict with antal_arbetsdagar and helgdagar
+    """
+    table = year_table(year)
+    first = date(year, month, 1).toordinal()
+    last = first + calendar.monthrange(year, month)[1]
+
+    return dict(
+        antal_arbetsdagar=table.workdays[month - 1],
+        helgdagar=_holidays_between(table, first, last),
+    )
+
+
+def _holidays_between(table: YearTable, start: int, stop: int) -> List[Dict[str, str]]:
+    return [
+        dict(datum=date.fromordinal(ordinal).isoformat(), helgdag=name)
+        for ordinal, name in table.holidays
+        if start <= ordinal < stop
+    ]
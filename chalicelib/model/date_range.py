@@ -0,0 +1,110 @@
+import calendar
+from datetime import date
+from typing import Dict, Iterator, List, Union
+
+
+def month_index(month: str) -> int:
+    """
+    Months since year 0 of a month in format "YYYY-MM", YYYY * 12 + MM - 1
+
+    :raises ValueError: If month is not in format "YYYY-MM"
+    """
+    year, number = month.split("-")
+    if len(year) != 4 or not 1 <= int(number) <= 12:
+        raise ValueError(f"Invalid month: {month}")
+    return int(year) * 12 + int(number) - 1
+
+
+def month_str(index: int) -> str:
+    """
+    The month in format "YYYY-MM" of a month index from month_index
+    """
+    return f"{index // 12}-{index % 12 + 1:02}"
+
+
+class DateRange:
+    """
+    An inclusive range of dates, held as date ordinals
+    """
+
+    __slots__ = ("start", "stop")
+
+    def __init__(self, start: int, stop: int):
+        if stop < start:
+            raise ValueError(
+                f"{date.fromordinal(start)} is after {date.fromordinal(stop)}"
+            )
+        self.start = start
+        self.stop = stop
+
+    @classmethod
+    def parse(cls, date_str: str) -> "DateRange":
+        """
+        Parse a range from a string
+
+        :param date_str: Valid formats: "2019", "2019-01", "2019-01-01",
+            "2019-01-02:2019-01-03" and "2019-01:2019-06"
+        :raises ValueError: If date_str is not in a valid format
+        """
+        first, _, last = date_str.partition(":")
+        return cls(_first_ordinal(first), _last_ordinal(last or first))
+
+    @property
+    def start_date(self) -> date:
+        return date.fromordinal(self.start)
+
+    @property
+    def stop_date(self) -> date:
+        return date.fromordinal(self.stop)
+
+    def months(self) -> List[str]:
+        """
+        The months ("YYYY-MM") covered by the range
+        """
+        first = self.start_date.year * 12 + self.start_date.month - 1
+        last = self.stop_date.year * 12 + self.stop_date.month - 1
+        return [month_str(index) for index in range(first, last + 1)]
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        The range in the format of the backend API, {"from": "YYYY-MM-DD", "to": "YYYY-MM-DD"}
+        """
+        return {"from": self.start_date.isoformat(), "to": self.stop_date.isoformat()}
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.start, self.stop + 1))
+
+    def __len__(self) -> int:
+        return self.stop - self.start + 1
+
+    def __contains__(self, day: Union[int, date]) -> bool:
+        ordinal = day.toordinal() if isinstance(day, date) else day
+        return self.start <= ordinal <= self.stop
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DateRange):
+            return NotImplemented
+        return (self.start, self.stop) == (other.start, other.stop)
+
+    def __repr__(self) -> str:
+        return f"DateRange({self.start_date}, {self.stop_date})"
+
+
+def _first_ordinal(date_str: str) -> int:
+    if len(date_str) == 4:
+        return date(int(date_str), 1, 1).toordinal()
+    if len(date_str) == 7:
+        year, month = divmod(month_index(date_str), 12)
+        return date(year, month + 1, 1).toordinal()
+    return date.fromisoformat(date_str).toordinal()
+
+
+def _last_ordinal(date_str: str) -> int:
+    if len(date_str) == 4:
+        return date(int(date_str), 12, 31).toordinal()
+    if len(date_str) == 7:
+        year, month = divmod(month_index(date_str), 12)
+        return date(
+            year, month + 1, calendar.monthrange(year, month + 1)[1]
+        ).toordinal()
+    return date.fromisoformat(date_str).toordinal()
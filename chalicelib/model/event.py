@@ -0,0 +1,119 @@
+import logging
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List
+
+log = logging.getLogger(__name__)
+
+
+def parse_hours(hours: Any) -> int:
+    """
+    Parse hours to hundredths of an hour, so sums are exact
+
+    :raises ValueError: If hours is not a number
+    """
+    if isinstance(hours, int) or (isinstance(hours, str) and hours.isdigit()):
+        # Whole hours, by far the most common
+        return int(hours) * 100
+
+    try:
+        return int((Decimal(str(hours)) * 100).to_integral_value())
+    except InvalidOperation:
+        raise ValueError(f"Invalid hours: {hours}") from None
+
+
+def format_hours(centihours: int) -> str:
+    """
+    Hundredths of an hour as a string without trailing zeros, 800 -> "8", 750 -> "7.5"
+    """
+    return f"{centihours / 100:g}"
+
+
+class Event:
+    """
+    A reported event for a user and day
+
+    The date is held as a date ordinal and hours in hundredths of an hour, both
+    parsed once from the backend JSON format with from_dict.
+    """
+
+    __slots__ = ("user_id", "user_name", "ordinal", "reason", "centihours")
+
+    def __init__(
+        self, user_id: str, user_name: str, ordinal: int, reason: str, centihours: int
+    ):
+        self.user_id = user_id
+        self.user_name = user_name
+        self.ordinal = ordinal
+        self.reason = reason
+        self.centihours = centihours
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Event":
+        """
+        Parse an event in the backend JSON format
+
+        :raises ValueError: If event_date or hours are invalid
+        """
+        return cls(
+            user_id=data.get("user_id"),
+            user_name=data.get("user_name"),
+            ordinal=date.fromisoformat(data["event_date"]).toordinal(),
+            reason=data.get("reason"),
+            centihours=parse_hours(data.get("hours")),
+        )
+
+    @classmethod
+    def from_list(cls, data: Iterable[Dict[str, Any]]) -> List["Event"]:
+        """
+        Parse events in the backend JSON format, invalid events are logged and skipped
+        """
+        events = []
+        for event in data:
+            try:
+                events.append(cls.from_dict(event))
+            except (KeyError, TypeError, ValueError) as error:
+                log.warning(f"Skipping invalid event {event}: {error}")
+        return events
+
+    @property
+    def date(self) -> date:
+        return date.fromordinal(self.ordinal)
+
+    @property
+    def event_date(self) -> str:
+        return date.fromordinal(self.ordinal).isoformat()
+
+    @property
+    def hours(self) -> float:
+        return self.centihours / 100
+
+    @property
+    def is_weekend(self) -> bool:
+        # date ordinal 1 is a monday, so ordinal % 7 is 6 for saturday and 0 for sunday
+        return self.ordinal % 7 in (6, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The event in the backend JSON format
+        """
+        return {
+            "user_id": self.user_id,
+            "user_name": self.user_name,
+            "reason": self.reason,
+            "event_date": self.event_date,
+            "hours": format_hours(self.centihours),
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Event):
+            return NotImplemented
+        return all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Event({self.user_id!r}, {self.event_date}, {self.reason!r}, "
+            f"{format_hours(self.centihours)}h)"
+        )
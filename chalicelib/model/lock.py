@@ -0,0 +1,63 @@
+import logging
+from typing import Any, Dict, Iterable, List
+
+from chalicelib.model.date_range import month_index, month_str
+
+log = logging.getLogger(__name__)
+
+
+class Lock:
+    """
+    A locked month for a user, the month is held as a month index (YYYY * 12 + MM - 1)
+    """
+
+    __slots__ = ("user_id", "month_index")
+
+    def __init__(self, user_id: str, month_index: int):
+        self.user_id = user_id
+        self.month_index = month_index
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Lock":
+        """
+        Parse a lock in the backend JSON format
+
+        :raises ValueError: If event_date is not a month in format "YYYY-MM"
+        """
+        return cls(
+            user_id=data.get("user_id"), month_index=month_index(data["event_date"])
+        )
+
+    @classmethod
+    def from_list(cls, data: Iterable[Dict[str, Any]]) -> List["Lock"]:
+        """
+        Parse locks in the backend JSON format, invalid locks are logged and skipped
+        """
+        locks = []
+        for lock in data:
+            try:
+                locks.append(cls.from_dict(lock))
+            except (KeyError, TypeError, ValueError) as error:
+                log.warning(f"Skipping invalid lock {lock}: {error}")
+        return locks
+
+    @property
+    def month(self) -> str:
+        return month_str(self.month_index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The lock in the backend JSON format
+        """
+        return {"user_id": self.user_id, "event_date": self.month}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Lock):
+            return NotImplemented
+        return (self.user_id, self.month_index) == (other.user_id, other.month_index)
+
+    def __hash__(self) -> int:
+        return hash((self.user_id, self.month_index))
+
+    def __repr__(self) -> str:
+        return f"Lock({self.user_id!r}, {self.month})"
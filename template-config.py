@@ -1,6 +1,8 @@
 import jinja2
 from os import getenv
 
+from chalicelib.lib.config import compile_config
+
 config = {
     "bot_access_token": getenv("BOT_ACCESS_TOKEN"),
     "signing_secret": getenv("SIGNING_SECRET"),
@@ -16,3 +18,6 @@ rendered_file = j2_template.render(config)
 
 with open(destination, "w") as OUTPUT:
     OUTPUT.write(rendered_file)
+
+# Pre-parsed app config, read on cold start instead of chalicelib/config.yaml
+compile_config()
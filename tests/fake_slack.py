@@ -0,0 +1,98 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs
+
+
+class FakeSlack:
+    """
+    Fake slack web API running on localhost, for tests of requests sent over HTTP.
+
+    Supports conversations.open, chat.postMessage and the external file upload
+    flow. Requests are recorded in calls and uploaded files in files, by file id.
+
+    with FakeSlack() as fake_slack:
+        slack = get_slack("fake", fake_slack.api_url)
+    """
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self.files: Dict[str, bytes] = {}
+        self.shared: Dict[str, Dict[str, Any]] = {}
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self.api_url = f"{self.url}/api"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake_slack = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                path = self.path
+                if path.startswith("/upload/"):
+                    return self._upload(path[len("/upload/") :])
+
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    data = json.loads(body)
+                else:
+                    data = {
+                        key: values[0]
+                        for key, values in parse_qs(body.decode()).items()
+                    }
+                fake_slack.calls.append(
+                    dict(
+                        method=path[len("/api/") :],
+                        data=data,
+                        authorization=self.headers.get("Authorization"),
+                    )
+                )
+                self._respond(200, fake_slack._api(path[len("/api/") :], data))
+
+            def _upload(self, file_id):
+                length = int(self.headers["Content-Length"])
+                fake_slack.files[file_id] = self.rfile.read(length)
+                fake_slack.calls.append(dict(method="upload", data=file_id))
+                self._respond(200, f"OK - {length}", content_type="text/plain")
+
+            def _respond(self, status, body, content_type="application/json"):
+                content = body if isinstance(body, str) else json.dumps(body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content.encode())))
+                self.end_headers()
+                self.wfile.write(content.encode())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _api(self, method: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if method == "conversations.open":
+            return dict(ok=True, channel=dict(id=f"D{data['users']}"))
+        if method == "chat.postMessage":
+            return dict(ok=True, channel=data.get("channel"), ts=str(len(self.calls)))
+        if method == "files.getUploadURLExternal":
+            file_id = f"F{len(self.files) + len(self.calls)}"
+            return dict(
+                ok=True, file_id=file_id, upload_url=f"{self.url}/upload/{file_id}"
+            )
+        if method == "files.completeUploadExternal":
+            files = json.loads(data["files"])
+            for file in files:
+                if file["id"] not in self.files:
+                    return dict(ok=False, error="file_not_found")
+                self.shared[file["id"]] = dict(file, channel_id=data.get("channel_id"))
+            return dict(ok=True, files=files)
+        return dict(ok=False, error="unknown_method")
@@ -1,5 +1,14 @@
-from chalicelib.action import Action
-from mockito import unstub, when
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from chalicelib import action as action_module
+from chalicelib.action import ENVELOPE_VERSION, Action
+from chalicelib.lib.factory import factory
+from chalicelib.lib.team import TeamReport, UserReport
+from chalicelib.model.event import Event
+from mockito import expect, mock, unstub, verify, when
 
 fake_payload = dict(
     text=["unsupported args"],
@@ -50,3 +59,361 @@ def test_valid_number_of_args():
     fake_action.min_arguments = 1
     fake_action.max_arguments = 1
     assert fake_action.is_valid() is False
+
+
+def test_list_action_async_fetches_concurrently():
+    payload = dict(
+        text="list 2020-05",
+        response_url="http://fakeurl.nowhere",
+        user_id="fake_userid",
+        user_name="fake_username",
+    )
+    action = Action.create(payload, fake_config)
+
+    async def fake_period_data(date_str, cross_check):
+        return dict(total_workdays=19, holidays=[])
+
+    when(action_module).get_period_data_async(
+        date_str="2020-05", cross_check=None
+    ).thenAnswer(fake_period_data)
+    when(action)._get_events(date_str="2020-05").thenReturn([])
+    when(action)._send_list(...).thenReturn("")
+
+    assert asyncio.run(action.perform_action_async()) == ""
+    verify(action)._send_list(
+        "2020-05", list_data=[], period_data=dict(total_workdays=19, holidays=[])
+    )
+    unstub()
+
+
+def test_envelope_round_trip():
+    payload = dict(
+        text="list today",
+        response_url="http://fakeurl.nowhere",
+        user_id="fake_userid",
+        user_name="fake_username",
+    )
+    action = Action.create(payload, fake_config)
+    assert action.is_valid() is True
+
+    envelope = json.loads(json.dumps(action.to_envelope()))
+    assert envelope["version"] == ENVELOPE_VERSION
+    assert envelope["action"] == "list"
+    assert envelope["state"]["date_str"] == datetime.now().strftime("%Y-%m-%d")
+
+    rehydrated = Action.from_message(envelope, fake_config)
+    assert type(rehydrated) is type(action)
+    assert rehydrated.arguments == ["today"]
+    assert rehydrated.user_id == "fake_userid"
+    assert rehydrated.user_name == "fake_username"
+    assert rehydrated.response_url == "http://fakeurl.nowhere"
+    assert rehydrated.state == action.state
+
+
+@pytest.mark.parametrize("command", ["add vab today", "edit vab today 4", "rm today"])
+def test_envelope_keeps_resolved_date(command):
+    payload = dict(
+        text=command,
+        response_url="http://fakeurl.nowhere",
+        user_id="fake_userid",
+        user_name="fake_username",
+    )
+    action = Action.create(payload, fake_config)
+    assert action.is_valid() is True
+
+    envelope = json.loads(json.dumps(action.to_envelope()))
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert envelope["state"]["date"]["from"].startswith(today)
+    assert envelope["state"]["date"]["to"].startswith(today)
+
+    # The command was received the day before it's performed
+    envelope["state"]["date"] = {
+        "from": "2020-06-01T23:59:00",
+        "to": "2020-06-01T23:59:00",
+    }
+    rehydrated = Action.from_message(envelope, fake_config)
+    assert rehydrated._parse_date("today") == {
+        "from": datetime(2020, 6, 1, 23, 59),
+        "to": datetime(2020, 6, 1, 23, 59),
+    }
+
+
+def _delayed(command):
+    """
+    The action of command received on 2020-06-01 and performed later
+    """
+    payload = dict(
+        text=command,
+        response_url="http://fakeurl.nowhere",
+        user_id="fake_userid",
+        user_name="fake_username",
+    )
+    action = Action.create(payload, fake_config)
+    assert action.is_valid() is True
+
+    envelope = json.loads(json.dumps(action.to_envelope()))
+    envelope["state"]["date"] = {
+        "from": "2020-06-01T23:59:00",
+        "to": "2020-06-01T23:59:00",
+    }
+    delayed = Action.from_message(envelope, fake_config)
+    delayed.attachments = []
+    delayed.send_attachment = lambda attachment: delayed.attachments.append(attachment)
+    return delayed
+
+
+def _click(attachment):
+    return dict(
+        actions=[dict(value="submit_yes")],
+        original_message=dict(attachments=attachment),
+        response_url="http://fakeurl.nowhere",
+        user=dict(id="fake_userid"),
+    )
+
+
+def test_delayed_add_writes_the_resolved_day():
+    when(action_module).check_locks(...).thenReturn([])
+    action = _delayed("add vab today 8")
+    action.perform_action()
+
+    (attachment,) = action.attachments
+    (event,) = factory(_click(attachment))
+    assert event["event_date"] == "2020-06-01"
+    unstub()
+
+
+def test_delayed_delete_deletes_the_resolved_day():
+    when(action_module).check_locks(...).thenReturn([])
+    when(action_module).slack_responder(...).thenReturn(200)
+    action = _delayed("delete today")
+    ordinal = datetime(2020, 6, 1).toordinal()
+    action._get_events = lambda date_str: [mock(dict(ordinal=ordinal))]
+    action.perform_action()
+
+    (attachment,) = action.attachments
+    click = Action.create(dict(_click(attachment), callback_id="delete"), fake_config)
+    when(click.backend).delete_event(...).thenReturn(
+        mock(dict(status_code=200, json=lambda: dict(count="1")))
+    )
+    click.perform_interactive()
+
+    verify(click.backend).delete_event(user_id="fake_userid", date="2020-06-01")
+    unstub()
+
+
+def test_from_message_accepts_slack_payload():
+    payload = dict(
+        text="help", response_url="http://fakeurl.nowhere", user_id="fake_userid"
+    )
+    assert Action.from_message(payload, fake_config).name == "help"
+
+
+def test_envelope_unsupported_version():
+    envelope = dict(version=ENVELOPE_VERSION + 1, action="help")
+    with pytest.raises(ValueError):
+        Action.from_envelope(envelope, fake_config)
+
+
+def _list_action(text):
+    payload = dict(
+        text=text,
+        response_url="http://fakeurl.nowhere",
+        user_id="fake_userid",
+        user_name="fake_username",
+    )
+    return Action.create(payload, fake_config)
+
+
+class _September(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 9, 15, 12)
+
+
+def test_list_defaults_to_current_month(monkeypatch):
+    monkeypatch.setattr(action_module, "datetime", _September)
+    action = _list_action("list")
+    when(action.backend).read_event(
+        user_id="fake_userid", date={"from": "2026-09-01", "to": "2026-09-30"}
+    ).thenReturn(mock({"status_code": 200, "json": lambda: []}))
+
+    assert action._get_date_str() == "2026-09-01:2026-09-30"
+    assert action._get_events(date_str=action._get_date_str()) == []
+    unstub()
+
+
+def test_list_groups_consecutive_days():
+    events = [
+        Event.from_dict(
+            dict(event_date=f"2020-06-{day:02}", reason="vacation", hours=8)
+        )
+        for day in (1, 2, 3, 4, 5, 8)
+    ]
+    period_data = dict(total_workdays=21, holidays=[])
+
+    action = _list_action("list 2020-06")
+    assert action._get_date_str() == "2020-06"
+    message = action._create_list_message(data=events, period_data=period_data)
+    assert (
+        message.blocks[-1]["text"]["text"]
+        == "*2020-06-01 → 2020-06-08* · vacation · 8h × 6"
+    )
+
+    per_day = _list_action("list 2020-06 --days")
+    assert per_day._get_date_str() == "2020-06"
+    per_day_message = per_day._create_list_message(data=events, period_data=period_data)
+    assert len(per_day_message.blocks) == len(message.blocks) + 11
+
+
+def _capture_messages(action):
+    """
+    Stub post_message of the slack client of action, returning the list the
+    SlackMessage of each call is appended to
+    """
+    sent = []
+    when(action.slack).post_message(...).thenAnswer(
+        lambda **kwargs: sent.append(kwargs["blocks"])
+    )
+    return sent
+
+
+def test_list_summary_for_year():
+    action = _list_action("list 2020")
+    events = [
+        Event.from_dict(dict(event_date="2020-06-05", reason="vacation", hours=8))
+    ]
+    when(action)._get_events(date_str="2020").thenReturn(events)
+    sent = _capture_messages(action)
+
+    assert action.is_valid() is True
+    assert action.perform_action() == ""
+
+    assert len(sent[0].blocks) == 13
+    assert (
+        sent[0].blocks[6]["text"]["text"] == "*2020-06* 160.0 / 168h (vacation: 8.0h)"
+    )
+    unstub()
+
+
+def test_list_summary_for_month_range():
+    action = _list_action("list 2020-01:2020-03 --summary")
+    when(action)._get_events(date_str="2020-01:2020-03").thenReturn([])
+    sent = _capture_messages(action)
+
+    assert asyncio.run(action.perform_action_async()) == ""
+    assert [block["text"]["text"] for block in sent[0].blocks] == [
+        "Summary for period *2020-01:2020-03*",
+        "*2020-01* 168 / 168h",
+        "*2020-02* 160 / 160h",
+        "*2020-03* 176 / 176h",
+    ]
+    unstub()
+
+
+def test_team_action():
+    action = Action.create(
+        dict(
+            text="team 2020-09",
+            response_url="http://fakeurl.nowhere",
+            user_id="fake_userid",
+            user_name="fake_username",
+        ),
+        fake_config,
+    )
+    action.config = dict(fake_config, admin_user_ids="other, fake_userid")
+    report = TeamReport("2020-09")
+    report.users = [
+        UserReport("locked", 176, 176, {}, True),
+        UserReport("absent", 168, 176, {"vab": 8}, False),
+        UserReport("failing", 176, 176, {}, False, "Failed to read events or locks"),
+    ]
+    when(action_module).team_report(
+        action.backend, month="2020-09", max_workers=8
+    ).thenReturn(report)
+    sent = _capture_messages(action)
+
+    assert action.perform_action() == ""
+    assert [block["text"]["text"] for block in sent[0].blocks[2:5]] == [
+        "<@locked> :lock: 176 / 176h",
+        "<@absent> :unlock: 168 / 176h (vab: 8h)",
+        "<@failing> :warning: Failed to read events or locks",
+    ]
+    verify(action.slack).post_message(
+        message="From timereport",
+        channel="fake_userid",
+        thread_pages=True,
+        blocks=sent[0],
+    )
+    unstub()
+
+
+@pytest.mark.parametrize("command", ["delete 2020-06-01", "edit vab 2020-06-01 4"])
+def test_changes_are_refused_when_locks_cant_be_read(command):
+    action = _list_action(command)
+    when(action.backend).read_lock(user_id="fake_userid").thenReturn(
+        mock({"status_code": 500})
+    )
+    when(action.backend).read_event(...).thenReturn(
+        mock({"status_code": 200, "json": lambda: []})
+    )
+    when(action).send_response(...).thenReturn("")
+
+    assert action.perform_action() == ""
+    assert asyncio.run(action.perform_action_async()) == ""
+
+    verify(action, times=2).send_response(
+        message="Unable to check locked months, try again later :cry:"
+    )
+    unstub()
+
+
+def test_team_action_is_only_for_admins():
+    action = _list_action("team 2020-09")
+    when(action).send_response(...).thenReturn("")
+    with expect(action_module, times=0).team_report(...):
+        assert action.perform_action() == ""
+
+    verify(action).send_response(
+        message="Only admins can show the team report :no_entry:"
+    )
+    unstub()
+
+
+def test_registry_index():
+    registry = action_module.registry
+
+    assert registry.get("list") is action_module.ListAction
+    assert registry.get("ls") is action_module.ListAction
+    assert registry.get("li") is action_module.ListAction
+    assert registry.get("loc") is action_module.LockAction
+    # Ambiguous prefixes and hidden actions are not matched
+    assert registry.get("l") is None
+    assert registry.get("e") is None
+    assert registry.get("unsup") is None
+    assert registry.get("unsupported") is action_module.UnsupportedAction
+
+    assert action_module.HelpAction in registry.actions
+    assert "\nlist - " in registry.help_text
+    assert "(alias: ls)" in registry.help_text
+    assert "unsupported" not in registry.help_text
+    with pytest.raises(TypeError):
+        registry.index["new"] = Action
+
+
+def test_registry_rejects_duplicate_names():
+    with pytest.raises(ValueError):
+
+        class DuplicateAction(Action):
+            name = "lists"
+            aliases = ("ls",)
+
+    assert action_module.registry.get("lists") is None
+
+
+def test_create_by_prefix_and_alias():
+    for text in ("ls 2020-09", "lis 2020-09"):
+        action = _list_action(text)
+        assert type(action) is action_module.ListAction
+        assert action.arguments == ["2020-09"]
+
+    assert type(_list_action("l 2020-09")) is action_module.UnsupportedAction
@@ -0,0 +1,43 @@
+from mockito import kwargs, mock, unstub, verify, when
+
+from chalicelib.lib.api import BackendApi, get_backend
+
+fake_config = dict(backend_url="http://fakebackend.nowhere", backend_api_key="key")
+
+
+def test_get_backend_is_shared():
+    backend = get_backend(fake_config)
+    assert backend is get_backend(dict(fake_config))
+    assert backend is not get_backend(dict(fake_config, backend_api_key="other"))
+    assert backend.session.headers["Authorization"] == "key"
+
+
+def test_timeouts_from_config():
+    backend = BackendApi(url="http://fake/", api_key="key", timeouts={"read_lock": 1})
+    assert backend.url == "http://fake"
+    assert backend.timeouts["read_lock"] == 1
+    assert backend.timeouts["read_event"] == BackendApi.default_timeouts["read_event"]
+
+
+def test_read_lock_uses_session():
+    backend = BackendApi(url="http://fake", api_key="key")
+    when(backend.session).get(url="http://fake/users/user/locks", **kwargs).thenReturn(
+        mock({"status_code": 200})
+    )
+
+    assert backend.read_lock(user_id="user").status_code == 200
+    verify(backend.session, times=1).get(url="http://fake/users/user/locks", timeout=3)
+    unstub()
+
+
+def test_read_event_defaults_to_date():
+    backend = BackendApi(url="http://fake", api_key="key")
+    when(backend.session).get(...).thenReturn(mock({"status_code": 200}))
+
+    backend.read_event(user_id="user", date={"from": "2020-01-01"})
+    verify(backend.session).get(
+        url="http://fake/users/user/events",
+        params={"from": "2020-01-01", "to": "2020-01-01"},
+        timeout=3,
+    )
+    unstub()
@@ -1,6 +1,7 @@
 import random
 
 import pytest
+from chalicelib.lib.helpers import parse_bool
 from tests.utils import call_from_slack, get_raw_block_text, respond_interactively
 
 
@@ -41,6 +42,28 @@ def test_help_unknown_command(chalice_app):
     assert "Supported actions" in r["slack_message"][1]["json"]["text"]
 
 
+def _bad_record_event():
+    return dict(Records=[dict(messageId="1", receiptHandle="", body="not json")])
+
+
+@pytest.mark.parametrize("value", ["false", "0", None])
+def test_failed_record_fails_the_batch_unless_enabled(monkeypatch, value):
+    import app
+
+    monkeypatch.setitem(app.config, "sqs_partial_batch_response", parse_bool(value))
+    with pytest.raises(ValueError):
+        app.command_handler(_bad_record_event(), None)
+
+
+def test_failed_record_is_reported_when_enabled(monkeypatch):
+    import app
+
+    monkeypatch.setitem(app.config, "sqs_partial_batch_response", parse_bool("true"))
+    assert app.command_handler(_bad_record_event(), None) == dict(
+        batchItemFailures=[dict(itemIdentifier="1")]
+    )
+
+
 @pytest.mark.integration
 def test_empty_list(chalice_app):
     r = call_from_slack(
@@ -0,0 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+import requests
+from mockito import mock, verify, when
+
+from chalicelib.lib.cache import LockCache, PeriodDataCache
+
+fake_today = date(2020, 6, 15)
+
+
+def _cache(tmp_path, clock):
+    return PeriodDataCache(
+        path=str(tmp_path / "period.json"),
+        current_ttl=60,
+        clock=clock,
+        today=lambda: fake_today,
+    )
+
+
+def test_past_months_never_expire(tmp_path):
+    now = [1000.0]
+    cache = _cache(tmp_path, lambda: now[0])
+    cache.set_many({"2020-05": "past", "2020-06": "current", "2020-07": "future"})
+
+    now[0] += 61
+    assert cache.get("2020-05") == "past"
+    assert cache.get("2020-06") is None
+    assert cache.get("2020-07") is None
+    assert cache.stats == dict(hits=1, misses=2, file_hits=0, expired=2)
+
+
+def test_file_store_shared_between_instances(tmp_path):
+    _cache(tmp_path, lambda: 1000.0).set("2020-05", {"antal_arbetsdagar": 19})
+
+    cache = _cache(tmp_path, lambda: 1000.0)
+    found, missing = cache.get_many(["2020-05", "2020-04"])
+    assert found == {"2020-05": {"antal_arbetsdagar": 19}}
+    assert missing == ["2020-04"]
+    assert cache.stats["file_hits"] == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = _cache(tmp_path, lambda: 1000.0)
+    cache.max_entries = 2
+    cache.set("2020-01", 1)
+    cache.set("2020-02", 2)
+    cache.get("2020-01")
+    cache.set("2020-03", 3)
+
+    assert cache.get("2020-02") is None
+    assert cache.get("2020-01") == 1
+    assert cache.get("2020-03") == 3
+
+
+def test_entries_from_file_are_limited(tmp_path):
+    writer = _cache(tmp_path, lambda: 1000.0)
+    writer.set_many({"2020-01": 1, "2020-02": 2, "2020-03": 3})
+
+    cache = _cache(tmp_path, lambda: 1000.0)
+    cache.max_entries = 2
+    cache.set("2020-04", 4)
+
+    assert list(cache._entries) == ["2020-03", "2020-04"]
+
+
+def test_concurrent_access(tmp_path):
+    cache = _cache(tmp_path, lambda: 1000.0)
+    cache.max_entries = 5
+    months = [f"20{year:02}-{month:02}" for year in range(10) for month in range(1, 13)]
+
+    def set_and_get(month):
+        cache.set(month, month)
+        cache.get_many(months[:10])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(set_and_get, months))
+
+    assert len(cache._entries) == 5
+    assert cache.stats["hits"] + cache.stats["misses"] == 10 * len(months)
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    (tmp_path / "period.json").write_text("not json")
+    cache = _cache(tmp_path, lambda: 1000.0)
+    assert cache.get("2020-01") is None
+
+    cache.set("2020-01", 1)
+    assert _cache(tmp_path, lambda: 1000.0).get("2020-01") == 1
+
+
+def _lock_backend(*months):
+    backend = mock()
+    when(backend).read_lock(user_id="user").thenReturn(
+        mock(
+            {
+                "status_code": 200,
+                "json": lambda: [dict(user_id="user", event_date=m) for m in months],
+            }
+        )
+    )
+    return backend
+
+
+def test_lock_cache_reads_through_once():
+    backend = _lock_backend("2020-05", "2020-06")
+    cache = LockCache(ttl=60, clock=lambda: 1000.0)
+
+    assert cache.locked_months(backend, "user") == {"2020-05", "2020-06"}
+    assert cache.locked_months(backend, "user") == {"2020-05", "2020-06"}
+    verify(backend, times=1).read_lock(user_id="user")
+    assert cache.stats["misses"] == 1
+    assert cache.stats["hits"] == 1
+
+
+def test_lock_cache_add_lock_updates_in_place():
+    backend = _lock_backend("2020-05")
+    cache = LockCache(ttl=60, clock=lambda: 1000.0)
+    cache.locked_months(backend, "user")
+
+    cache.add_lock("user", "2020-07")
+    assert cache.locked_months(backend, "user") == {"2020-05", "2020-07"}
+    verify(backend, times=1).read_lock(user_id="user")
+
+    # Users not in cache are read from backend on next access
+    cache.add_lock("other", "2020-07")
+    assert cache.stats["updates"] == 1
+
+
+def test_lock_cache_keeps_locks_created_while_reading():
+    backend = _lock_backend("2020-05")
+    cache = LockCache(ttl=60, clock=lambda: 1000.0)
+
+    def read_lock(user_id):
+        # Another thread creates a lock after the backend read it
+        cache.add_lock(user_id, "2020-07")
+        return mock({"status_code": 200, "json": lambda: [dict(event_date="2020-05")]})
+
+    when(backend).read_lock(user_id="user").thenAnswer(read_lock)
+    assert cache.locked_months(backend, "user") == {"2020-05"}
+
+    backend = _lock_backend("2020-05", "2020-07")
+    assert cache.locked_months(backend, "user") == {"2020-05", "2020-07"}
+    verify(backend, times=1).read_lock(user_id="user")
+
+
+def test_lock_cache_counts_stale_refresh():
+    now = [1000.0]
+    backend = _lock_backend("2020-05")
+    cache = LockCache(ttl=60, clock=lambda: now[0])
+    cache.locked_months(backend, "user")
+
+    # Locked from another container
+    when(backend).read_lock(user_id="user").thenReturn(
+        mock({"status_code": 200, "json": lambda: [dict(event_date="2020-06")]})
+    )
+    now[0] += 61
+    assert cache.locked_months(backend, "user") == {"2020-06"}
+    assert cache.stats["expired"] == 1
+    assert cache.stats["stale"] == 1
+
+
+def test_lock_cache_does_not_cache_errors():
+    backend = mock()
+    when(backend).read_lock(user_id="user").thenReturn(mock({"status_code": 500}))
+    cache = LockCache()
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            cache.locked_months(backend, "user")
+    verify(backend, times=2).read_lock(user_id="user")
+
+
+def test_lock_cache_skips_invalid_locks():
+    backend = _lock_backend("2020-05", "2020-06-01", "May")
+    cache = LockCache()
+
+    assert cache.locked_months(backend, "user") == {"2020-05"}
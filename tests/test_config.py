@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+from chalicelib.lib.config import compile_config, compiled_path, load_config
+from chalicelib.lib.helpers import parse_config
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_compiled_config_is_loaded(tmp_path):
+    source = tmp_path / "config.yaml"
+    source.write_text("log_level: DEBUG\nvalid_reasons:\n  - vab\n  - föräldraledig\n")
+
+    target = compile_config(str(source))
+
+    assert target == str(tmp_path / "config.compiled.json")
+    with open(target) as fd:
+        compiled = json.load(fd)
+    compiled["config"]["log_level"] = "from compiled"
+    with open(target, "w") as fd:
+        json.dump(compiled, fd)
+
+    assert load_config(str(source)) == dict(
+        log_level="from compiled", valid_reasons=["vab", "föräldraledig"]
+    )
+
+
+def test_yaml_is_parsed_when_compiled_config_is_missing_or_stale(tmp_path):
+    source = tmp_path / "config.yaml"
+    source.write_text("log_level: DEBUG\n")
+    assert load_config(str(source)) == dict(log_level="DEBUG")
+
+    compile_config(str(source))
+    source.write_text("log_level: INFO\n")
+    assert load_config(str(source)) == dict(log_level="INFO")
+
+    with open(compiled_path(str(source)), "w") as fd:
+        fd.write("not json")
+    assert load_config(str(source)) == dict(log_level="INFO")
+
+
+def test_compile_project_config(tmp_path):
+    source = os.path.join(dir_path, "config.yaml")
+    target = compile_config(source, target=str(tmp_path / "config.json"))
+
+    with open(target) as fd:
+        assert json.load(fd)["config"] == parse_config(source)
+
+
+def test_app_import_does_not_import_boto3():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app; print('boto3' in sys.modules)"],
+        cwd=os.path.dirname(dir_path),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "False"
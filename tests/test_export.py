@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import tempfile
+import tracemalloc
+
+import pytest
+import requests
+from chalicelib.action import Action
+from chalicelib.lib.export import export_months, read_events, write_events
+from chalicelib.lib.slack import get_slack
+from mockito import expect, mock, unstub, verify, when
+
+from .fake_slack import FakeSlack
+
+fake_config = dict(
+    admin_user_ids="anna",
+    bot_access_token="fake token",
+    backend_url="http://fakebackend.nowhere",
+    format_str="%Y-%m-%d",
+)
+
+
+def _event(user_id, event_date, reason="vab", hours=8):
+    return dict(
+        user_id=user_id,
+        user_name=user_id.title(),
+        event_date=event_date,
+        reason=reason,
+        hours=hours,
+    )
+
+
+def _response(status_code, data):
+    response = mock({"status_code": status_code, "text": json.dumps(data)})
+    when(response).json().thenReturn(data)
+    when(response).raise_for_status().thenReturn(None)
+    return response
+
+
+def test_export_months():
+    assert export_months("2020-09") == ["2020-09"]
+    assert export_months("2020-11:2021-02") == [
+        "2020-11",
+        "2020-12",
+        "2021-01",
+        "2021-02",
+    ]
+    assert len(export_months("2020")) == 12
+
+    for invalid in ("2020-13", "2020-09:2020-01", "september", "2020-09-01"):
+        with pytest.raises(ValueError):
+            export_months(invalid)
+
+
+def test_write_events():
+    events = [_event("anna", "2020-09-01"), _event("bo", "2020-09-02", hours=4)]
+
+    fd = io.BytesIO()
+    assert write_events(iter(events), fd, "csv") == 2
+    rows = list(csv.DictReader(io.StringIO(fd.getvalue().decode())))
+    assert rows[1] == dict(
+        user_id="bo", user_name="Bo", event_date="2020-09-02", reason="vab", hours="4"
+    )
+
+    fd = io.BytesIO()
+    assert write_events(iter(events), fd, "jsonl") == 2
+    assert [json.loads(line) for line in fd.getvalue().splitlines()] == events
+
+    with pytest.raises(ValueError):
+        write_events(iter(events), io.BytesIO(), "xml")
+
+
+def test_write_events_memory_is_flat():
+    events = (
+        _event(f"user{number % 300}", f"2020-{number % 12 + 1:02}-01")
+        for number in range(100000)
+    )
+
+    with tempfile.TemporaryFile() as fd:
+        tracemalloc.start()
+        count = write_events(events, fd, "csv")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert count == 100000
+        assert fd.tell() > 3 * 1024 * 1024
+    assert peak < 256 * 1024
+
+
+def test_export_action_uploads_file():
+    action = Action.create(
+        dict(
+            text="export 2020-08:2020-09 --all",
+            response_url="http://fakeurl.nowhere",
+            user_id="anna",
+            user_name="anna",
+        ),
+        fake_config,
+    )
+    when(action.backend).read_users().thenReturn(
+        _response(200, dict(anna="Anna", bo="Bo"))
+    )
+    for user_id in ("anna", "bo"):
+        for month, last_day in (("2020-08", 31), ("2020-09", 30)):
+            when(action.backend).read_event(
+                user_id=user_id,
+                date={"from": f"{month}-01", "to": f"{month}-{last_day}"},
+            ).thenReturn(_response(200, [_event(user_id, f"{month}-01")]))
+
+    with FakeSlack() as fake_slack:
+        action.slack = get_slack(fake_config["bot_access_token"], fake_slack.api_url)
+        assert action.perform_action() == ""
+
+    assert [call["method"] for call in fake_slack.calls] == [
+        "conversations.open",
+        "files.getUploadURLExternal",
+        "upload",
+        "files.completeUploadExternal",
+    ]
+    ((file_id, content),) = fake_slack.files.items()
+    rows = list(csv.DictReader(io.StringIO(content.decode())))
+    assert [(row["user_id"], row["event_date"]) for row in rows] == [
+        ("anna", "2020-08-01"),
+        ("anna", "2020-09-01"),
+        ("bo", "2020-08-01"),
+        ("bo", "2020-09-01"),
+    ]
+    assert fake_slack.shared[file_id] == dict(
+        id=file_id, title="Timereport 2020-08:2020-09, 4 events", channel_id="Danna"
+    )
+    assert fake_slack.calls[1]["data"] == dict(
+        filename="timereport-2020-08_2020-09.csv", length=str(len(content))
+    )
+    unstub()
+
+
+def test_export_all_is_only_for_admins():
+    action = Action.create(
+        dict(
+            text="export 2020-09 --all",
+            response_url="http://fakeurl.nowhere",
+            user_id="bo",
+            user_name="bo",
+        ),
+        fake_config,
+    )
+    when(action).send_response(...).thenReturn("")
+    with expect(action.backend, times=0).read_users():
+        assert action.perform_action() == ""
+
+    verify(action).send_response(message="Only admins can export all users :no_entry:")
+    unstub()
+
+
+def test_export_all_fails_when_users_cant_be_read():
+    action = Action.create(
+        dict(
+            text="export 2020-09 --all",
+            response_url="http://fakeurl.nowhere",
+            user_id="anna",
+            user_name="anna",
+        ),
+        fake_config,
+    )
+    when(action).send_response(...).thenReturn("")
+    when(action.backend).read_users().thenRaise(requests.ReadTimeout("timeout"))
+
+    assert action.perform_action() == ""
+    verify(action).send_response(message="Failed to load users :cry:")
+    unstub()
+
+
+def test_read_events_raises_on_backend_error():
+    backend = mock()
+    response = mock({"status_code": 500})
+    when(response).raise_for_status().thenRaise(requests.HTTPError("500"))
+    when(backend).read_event(...).thenReturn(response)
+
+    with pytest.raises(requests.HTTPError):
+        list(read_events(backend, ["anna"], ["2020-09"]))
@@ -1,4 +1,12 @@
-from chalicelib.lib.helpers import parse_date, date_range, month_range
+from chalicelib.lib.helpers import (
+    parse_date,
+    date_range,
+    locked_months_in_range,
+    month_range,
+    parse_bool,
+    parse_rate,
+    parse_seconds,
+)
 from datetime import datetime, date
 
 format_str = "%Y-%m-%d"
@@ -85,3 +93,45 @@ def test_month_range():
         assert isinstance(item, date)
         assert item.year == 2019
         assert 0 < item.month < 6
+
+
+def test_locked_months_in_range():
+    locked = frozenset(["2019-12", "2020-02", "2020-03", "2021-01"])
+
+    def locked_between(start, end):
+        return locked_months_in_range(
+            locked,
+            datetime.strptime(start, format_str),
+            datetime.strptime(end, format_str),
+        )
+
+    assert locked_between("2020-01-01", "2020-01-31") == []
+    assert locked_between("2020-02-29", "2020-02-29") == ["2020-02"]
+    assert locked_between("2019-12-31", "2020-03-01") == [
+        "2019-12",
+        "2020-02",
+        "2020-03",
+    ]
+    assert locked_between("2015-01-01", "2025-12-31") == sorted(locked)
+
+
+def test_parse_rate():
+    assert parse_rate("profile_sample_rate", "0.01") == 0.01
+    assert parse_rate("profile_sample_rate", None) == 0.0
+    assert parse_rate("profile_sample_rate", "1%") == 0.0
+    assert parse_rate("profile_sample_rate", "5") == 0.0
+
+
+def test_parse_bool():
+    for value in ("1", "true", "True", "YES", True):
+        assert parse_bool(value) is True
+    for value in ("0", "false", "no", "", None, False):
+        assert parse_bool(value) is False
+
+
+def test_parse_seconds():
+    assert parse_seconds("lock_cache_ttl", "30", default=60) == 30
+    assert parse_seconds("lock_cache_ttl", "0", default=60) == 0
+    assert parse_seconds("lock_cache_ttl", None, default=60) == 60
+    assert parse_seconds("lock_cache_ttl", "1m", default=60) == 60
+    assert parse_seconds("lock_cache_ttl", "-1", default=60) == 60
@@ -0,0 +1,108 @@
+import pytest
+import requests
+from mockito import mock, unstub, verify, when
+
+from chalicelib import action as action_module
+from chalicelib.action import Action
+from chalicelib.lib.idempotency import IdempotencyStore, interactive_key
+
+from .test_data import interactive_message
+
+fake_config = dict(
+    bot_access_token="fake token",
+    backend_url="http://fakebackend.nowhere",
+    format_str="%Y-%m-%d",
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(path=str(tmp_path / "idempotency.sqlite"))
+
+
+def test_interactive_key():
+    key = interactive_key(interactive_message)
+    assert key == "submit:XXXXXX:1549534730.003400:submit_yes"
+
+    # Every click has a new action_ts but is the same answer to the same message
+    assert interactive_key(dict(interactive_message, action_ts="1")) == key
+    assert interactive_key(dict(interactive_message, user=dict(id="other"))) != key
+
+    no_ts = dict(interactive_message)
+    no_ts.pop("action_ts")
+    no_ts.pop("message_ts")
+    assert interactive_key(no_ts) is None
+
+
+def test_claim_duplicate(store):
+    assert store.claim("key") is True
+    assert store.claim("key") is False
+    assert store.stats["claimed"] == 1
+    assert store.stats["duplicates"] == 1
+
+
+def test_claim_shared_between_instances(store):
+    assert store.claim("key") is True
+    assert IdempotencyStore(path=store.path).claim("key") is False
+
+
+def test_claim_after_ttl(store):
+    now = [1000.0]
+    store = IdempotencyStore(path=store.path, ttl=60, clock=lambda: now[0])
+    assert store.claim("key") is True
+
+    now[0] += 61
+    assert store.claim("key") is True
+
+
+def test_release(store):
+    assert store.claim("key") is True
+    store.release("key")
+    assert IdempotencyStore(path=store.path).claim("key") is True
+
+
+def test_perform_interactive_once(store):
+    when(action_module).get_idempotency_store(...).thenReturn(store)
+    payload = dict(interactive_message, callback_id="add", response_url="http://x")
+
+    action = Action.create(payload, fake_config)
+    when(action).perform_interactive().thenReturn("")
+    action.perform_interactive_once()
+
+    redelivered = Action.create(payload, fake_config)
+    when(redelivered).perform_interactive().thenReturn("")
+    assert redelivered.perform_interactive_once() == ""
+
+    verify(action, times=1).perform_interactive()
+    verify(redelivered, times=0).perform_interactive()
+    unstub()
+
+
+def test_perform_interactive_once_releases_on_error(store):
+    when(action_module).get_idempotency_store(...).thenReturn(store)
+    payload = dict(interactive_message, callback_id="delete", response_url="http://x")
+
+    action = Action.create(payload, fake_config)
+    when(action).perform_interactive().thenRaise(ValueError("backend down"))
+    with pytest.raises(ValueError):
+        action.perform_interactive_once()
+
+    assert store.claim(interactive_key(payload)) is True
+    unstub()
+
+
+def test_write_is_not_redone_when_the_response_fails(store):
+    when(action_module).get_idempotency_store(...).thenReturn(store)
+    when(action_module).factory(...).thenReturn([dict(user_id="XXXXXX")])
+    when(action_module).slack_responder(...).thenRaise(requests.ReadTimeout())
+    payload = dict(interactive_message, callback_id="add", response_url="http://x")
+
+    action = Action.create(payload, fake_config)
+    when(action.backend).create_event(...).thenReturn(mock({"status_code": 200}))
+    assert action.perform_interactive_once() == ""
+
+    redelivered = Action.create(payload, fake_config)
+    assert redelivered.perform_interactive_once() == ""
+
+    verify(action.backend, times=1).create_event(...)
+    unstub()
@@ -0,0 +1,121 @@
+from chalicelib.lib.api import BackendApi
+from chalicelib.model.event import Event
+from chalicelib.lib.list import (
+    EventRun,
+    MonthSummary,
+    PeriodSummary,
+    event_runs,
+    get_list_data,
+    period_summary,
+    summarize_months,
+)
+from mockito import mock, unstub, verify, when
+
+
+def _event(event_date, reason="vacation", hours=8):
+    return Event.from_dict(dict(event_date=event_date, reason=reason, hours=hours))
+
+
+def test_event_runs_groups_over_weekends_and_holidays():
+    events = [_event(f"2020-06-{day:02}") for day in (1, 2, 3, 4, 5, 8, 9, 10)]
+    events += [_event("2020-06-11", hours=4), _event("2020-06-22", reason="vab")]
+
+    assert event_runs(events) == [
+        EventRun("2020-06-01", "2020-06-10", "vacation", 8, 8),
+        EventRun("2020-06-11", "2020-06-11", "vacation", 4, 1),
+        EventRun("2020-06-22", "2020-06-22", "vab", 8, 1),
+    ]
+
+    events = [_event("2020-06-18"), _event("2020-06-22")]
+    assert len(event_runs(events)) == 2
+    assert event_runs(events, holidays=["2020-06-19"]) == [
+        EventRun("2020-06-18", "2020-06-22", "vacation", 8, 2)
+    ]
+
+
+def test_event_runs_splits_on_missing_workday():
+    events = [_event("2020-06-01"), _event("2020-06-03")]
+
+    assert [run.count for run in event_runs(events)] == [1, 1]
+    assert event_runs([]) == []
+
+
+def test_summarize_months():
+    events = [
+        _event("2020-06-05"),
+        # Midsommarafton and a saturday are not counted
+        _event("2020-06-19"),
+        _event("2020-06-20"),
+        _event("2020-08-03", reason="vab", hours=4),
+        _event("2020-08-04"),
+        # Outside the range
+        _event("2020-09-01"),
+    ]
+
+    summaries = summarize_months(events, "2020-06", "2020-08")
+
+    assert [summary.month for summary in summaries] == ["2020-06", "2020-07", "2020-08"]
+    assert summaries[0] == MonthSummary("2020-06", 168, 160, {"vacation": 8})
+    assert summaries[1].absence == {}
+    assert summaries[1].worked_hours == summaries[1].expected_hours == 23 * 8
+    assert summaries[2].absence == {"vab": 4, "vacation": 8}
+
+
+def test_summarize_months_across_years():
+    summaries = summarize_months([_event("2021-01-04")], "2020-11", "2021-02")
+
+    assert [summary.month for summary in summaries] == [
+        "2020-11",
+        "2020-12",
+        "2021-01",
+        "2021-02",
+    ]
+    assert summaries[2].absence == {"vacation": 8}
+
+
+def test_get_list_data_parses_events():
+    backend = BackendApi("http://fakebackend.nowhere", "fake")
+    response = mock({"status_code": 200})
+    when(response).json().thenReturn(
+        [
+            dict(event_date="2020-02-03", reason="vab", hours="4"),
+            dict(event_date="2020-01-02", reason="vab", hours="7.5"),
+        ]
+    )
+    when(backend).read_event(...).thenReturn(response)
+
+    assert get_list_data(backend, "fake_user", "2020") == [
+        _event("2020-01-02", reason="vab", hours=7.5),
+        _event("2020-02-03", reason="vab", hours=4),
+    ]
+    verify(backend).read_event(
+        user_id="fake_user", date={"from": "2020-01-01", "to": "2020-12-31"}
+    )
+
+    get_list_data(backend, "fake_user", "2020-01:2020-06")
+    verify(backend).read_event(
+        user_id="fake_user", date={"from": "2020-01-01", "to": "2020-06-30"}
+    )
+    assert get_list_data(backend, "fake_user", "june") is False
+    unstub()
+
+
+def test_period_summary_counts_workdays_only():
+    events = [
+        _event("2020-06-05"),
+        _event("2020-06-06"),
+        _event("2020-06-19", reason="vab"),
+        _event("2020-06-22", reason="vab", hours="4"),
+    ]
+    period_data = dict(
+        total_workdays=21,
+        holidays=[dict(datum="2020-06-19", helgdag="Midsommarafton")],
+    )
+
+    assert period_summary(events, period_data) == PeriodSummary(
+        total_workhours=168,
+        total_worked=156.0,
+        total_absent=12.0,
+        per_reason={"vacation": 8.0, "vab": 4.0},
+    )
+    assert period_summary([], period_data).total_absent == 0
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from chalicelib.lib import metrics
+from chalicelib.lib.aio import run_blocking
+from mockito import mock
+from tests.utils import call_from_slack
+
+
+def _invocation(lines, **dimensions):
+    return metrics.invocation(
+        namespace="timereport", enabled=True, emit=lines.append, **dimensions
+    )
+
+
+def test_nothing_is_collected_when_disabled():
+    lines = []
+    with metrics.invocation(
+        namespace="timereport", enabled=False, emit=lines.append
+    ) as current:
+        assert current is None
+        assert metrics.span("phase") is metrics.span("other phase")
+        with metrics.span("phase"):
+            pass
+        metrics.record_status("phase", 200)
+
+    assert lines == []
+
+
+def test_invocation_is_emitted_as_emf():
+    lines = []
+
+    @metrics.timed("backend.read_event")
+    def read_event():
+        return mock({"status_code": 200})
+
+    with _invocation(lines, function="command"):
+        metrics.set_dimension("action", "list")
+        with metrics.span("verify_token"):
+            pass
+        read_event()
+        read_event()
+        with pytest.raises(ValueError):
+            with metrics.span("is_valid"):
+                raise ValueError()
+
+    (line,) = lines
+    emf = json.loads(line)
+    (directive,) = emf["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "timereport"
+    assert directive["Dimensions"] == [["action", "function"]]
+    assert {metric["Name"] for metric in directive["Metrics"]} == {
+        "verify_token",
+        "backend.read_event",
+        "is_valid",
+        "invocation",
+    }
+    assert emf["function"] == "command"
+    assert emf["action"] == "list"
+    assert isinstance(emf["verify_token"], float)
+    assert len(emf["backend.read_event"]) == 2
+    assert emf["status_codes"] == {"backend.read_event": {"200": 2}}
+    assert emf["errors"] == ["is_valid"]
+
+
+def test_timed_coroutine():
+    lines = []
+
+    @metrics.timed("period_data")
+    async def get_period_data():
+        return dict(total_workdays=21)
+
+    with _invocation(lines, function="command_handler"):
+        assert asyncio.run(get_period_data()) == dict(total_workdays=21)
+
+    assert "period_data" in json.loads(lines[0])
+
+
+def test_spans_in_other_threads_are_collected():
+    lines = []
+
+    def read_lock(user_id):
+        with metrics.span("backend.read_lock"):
+            return user_id
+
+    async def read_locks():
+        return await asyncio.gather(
+            run_blocking(read_lock, "a"), run_blocking(read_lock, "b")
+        )
+
+    with _invocation(lines, function="command_handler"):
+        assert asyncio.run(read_locks()) == ["a", "b"]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            assert list(pool.map(metrics.propagate(read_lock), "cd")) == ["c", "d"]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(read_lock, "not propagated").result()
+
+    assert len(json.loads(lines[0])["backend.read_lock"]) == 4
+
+
+def test_command_emits_metrics(chalice_app, capsys, monkeypatch):
+    import app
+
+    monkeypatch.setitem(app.config, "enable_metrics", True)
+    r = call_from_slack(
+        chalice_app=chalice_app,
+        full_command="help",
+        user_id=f"{random.randint(0, 10000)}",
+        user_name="mattias",
+    )
+
+    assert r["response"]["statusCode"] == 200
+    lines = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    # Without a queue the command handler runs within the command request
+    handler, command = lines
+    assert handler["function"] == "command_handler"
+    assert handler["action"] == "help"
+    assert "perform_action" in handler
+    assert command["function"] == "command"
+    assert command["action"] == "help"
+    for phase in ("verify_token", "parse_payload", "is_valid", "handle_slack_request"):
+        assert phase in command
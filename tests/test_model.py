@@ -0,0 +1,97 @@
+from datetime import date
+
+import pytest
+from chalicelib.model.date_range import DateRange, month_index, month_str
+from chalicelib.model.event import Event, format_hours, parse_hours
+from chalicelib.model.lock import Lock
+
+
+def test_event_round_trip():
+    data = dict(
+        user_id="U1",
+        user_name="anna",
+        reason="vab",
+        event_date="2020-06-06",
+        hours="7.5",
+    )
+    event = Event.from_dict(data)
+
+    assert event.ordinal == date(2020, 6, 6).toordinal()
+    assert event.centihours == 750
+    assert event.hours == 7.5
+    assert event.is_weekend
+    assert event.to_dict() == data
+    assert Event.from_dict(event.to_dict()) == event
+    assert not hasattr(event, "__dict__")
+
+
+def test_hours_are_fixed_point():
+    assert parse_hours(8) == 800
+    assert parse_hours("0.1") + parse_hours("0.2") == parse_hours("0.3")
+    assert format_hours(800) == "8"
+    assert format_hours(725) == "7.25"
+
+    with pytest.raises(ValueError):
+        parse_hours("eight")
+
+
+def test_lock_round_trip():
+    lock = Lock.from_dict(dict(user_id="U1", event_date="2020-12"))
+
+    assert lock.month_index == 2020 * 12 + 11
+    assert lock.month == "2020-12"
+    assert lock.to_dict() == dict(user_id="U1", event_date="2020-12")
+    assert {lock, Lock("U1", lock.month_index)} == {lock}
+
+    with pytest.raises(ValueError):
+        Lock.from_dict(dict(user_id="U1", event_date="2020-13"))
+
+
+def test_invalid_events_and_locks_are_skipped():
+    events = Event.from_list(
+        [
+            dict(event_date="2020-06-01", reason="vab", hours="8"),
+            dict(event_date="2020-06-02", reason="vab", hours="eight"),
+            dict(event_date="2020-06-31", reason="vab", hours="8"),
+            dict(reason="vab", hours="8"),
+        ]
+    )
+    assert [event.event_date for event in events] == ["2020-06-01"]
+
+    locks = Lock.from_list(
+        [dict(event_date="2020-06"), dict(event_date="2020-06-01"), dict()]
+    )
+    assert [lock.month for lock in locks] == ["2020-06"]
+
+
+@pytest.mark.parametrize(
+    "date_str, start, stop",
+    [
+        ("2020", "2020-01-01", "2020-12-31"),
+        ("2020-02", "2020-02-01", "2020-02-29"),
+        ("2020-02-03", "2020-02-03", "2020-02-03"),
+        ("2020-02-03:2020-03-04", "2020-02-03", "2020-03-04"),
+        ("2020-11:2021-02", "2020-11-01", "2021-02-28"),
+    ],
+)
+def test_date_range_parse(date_str, start, stop):
+    date_range = DateRange.parse(date_str)
+
+    assert date_range.to_dict() == {"from": start, "to": stop}
+    assert date.fromisoformat(stop) in date_range
+    assert len(date_range) == len(list(date_range))
+
+
+def test_date_range_invalid():
+    for invalid in ("", "today", "2020-13", "2020-03:2020-02"):
+        with pytest.raises(ValueError):
+            DateRange.parse(invalid)
+
+
+def test_date_range_months():
+    assert DateRange.parse("2020-11-15:2021-01-02").months() == [
+        "2020-11",
+        "2020-12",
+        "2021-01",
+    ]
+    assert month_str(month_index("2021-01")) == "2021-01"
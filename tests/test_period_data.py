@@ -0,0 +1,93 @@
+import asyncio
+from datetime import date
+
+import pytest
+import requests
+from mockito import kwargs, mock, unstub, verify, when
+
+from chalicelib.lib import period_data as period_data_module
+from chalicelib.lib.cache import PeriodDataCache
+from chalicelib.lib.period_data import get_period_data, get_period_data_async
+from chalicelib.lib.workdays import easter_sunday, month_data, year_table
+
+
+@pytest.fixture(autouse=True)
+def period_cache(tmp_path, monkeypatch):
+    cache = PeriodDataCache(path=str(tmp_path / "period.json"))
+    monkeypatch.setattr(period_data_module, "period_cache", cache)
+    return cache
+
+
+def test_easter_sunday():
+    assert easter_sunday(2019) == date(2019, 4, 21)
+    assert easter_sunday(2020) == date(2020, 4, 12)
+    assert easter_sunday(2021) == date(2021, 4, 4)
+
+
+def test_month_data():
+    # 2020-05-01 and 2020-05-21 are holidays on weekdays
+    may = month_data(2020, 5)
+    assert may["antal_arbetsdagar"] == 19
+    assert {"2020-05-01", "2020-05-21"} <= {d["datum"] for d in may["helgdagar"]}
+
+    # Midsommarafton 2020-06-19, nationaldagen on a saturday
+    june = month_data(2020, 6)
+    assert june["antal_arbetsdagar"] == 21
+    assert "2020-06-19" in [d["datum"] for d in june["helgdagar"]]
+
+
+def test_year_table():
+    assert sum(year_table(2020).workdays) == 252
+    assert year_table(2020) is year_table(2020)
+
+
+def test_get_period_data_multiple_months():
+    when(requests).get(...).thenRaise(AssertionError("Unexpected request"))
+    period_data = get_period_data("2020-04-15:2020-05-02")
+    unstub()
+
+    assert (
+        period_data["total_workdays"]
+        == month_data(2020, 4)["antal_arbetsdagar"]
+        + month_data(2020, 5)["antal_arbetsdagar"]
+    )
+    assert "2020-04-10" in [d["datum"] for d in period_data["holidays"]]
+
+
+def test_get_period_data_cross_check():
+    when(requests).get(
+        url="https://api2.codelabs.se/2020-05.json", **kwargs
+    ).thenReturn(mock({"status_code": 200, "json": lambda: month_data(2020, 5)}))
+
+    period_data = get_period_data("2020-05", cross_check=True)
+    assert period_data["total_workdays"] == 19
+    verify(requests, times=1).get(...)
+    unstub()
+
+
+def test_get_period_data_async_same_as_sync():
+    when(requests).get(
+        url="https://api2.codelabs.se/2020-06.json", **kwargs
+    ).thenReturn(mock({"status_code": 500}))
+    when(requests).get(
+        url="https://api2.codelabs.se/2020-07.json", **kwargs
+    ).thenReturn(mock({"status_code": 200, "json": lambda: month_data(2020, 7)}))
+
+    period_data = asyncio.run(
+        get_period_data_async("2020-06:2020-07", cross_check=True)
+    )
+    assert period_data == get_period_data("2020-06:2020-07")
+    unstub()
+
+
+def test_get_period_data_cross_check_only_fetches_missing(period_cache):
+    period_cache.set("2020-05", month_data(2020, 5))
+    when(requests).get(
+        url="https://api2.codelabs.se/2020-06.json", **kwargs
+    ).thenReturn(mock({"status_code": 200, "json": lambda: month_data(2020, 6)}))
+
+    get_period_data("2020-05:2020-06", cross_check=True)
+    get_period_data("2020-05:2020-06", cross_check=True)
+    verify(requests, times=1).get(...)
+    assert period_cache.stats["hits"] == 3
+    unstub()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+from chalicelib.lib import profiler
+from chalicelib.lib.aio import run_blocking
+from tests.utils import call_from_slack
+
+
+def _work():
+    return sorted(json.dumps(dict(day=day)) for day in range(100))
+
+
+def test_should_profile():
+    assert profiler.should_profile({}) is False
+    assert profiler.should_profile(dict(profile_sample_rate=0.0)) is False
+    assert profiler.should_profile(dict(profile_sample_rate=1.0)) is True
+
+    config = dict(profile_sample_rate=0.01, profile_user_ids="U1, U2")
+    assert profiler.should_profile(config, rand=lambda: 0.005) is True
+    assert profiler.should_profile(config, rand=lambda: 0.5) is False
+    assert profiler.should_profile(config, "U2", rand=lambda: 0.5) is True
+    assert profiler.should_profile(config, "U3", rand=lambda: 0.5) is False
+
+
+def test_message_user_id():
+    assert profiler.message_user_id(dict(user_id="U1", text="list")) == "U1"
+    assert profiler.message_user_id(dict(user=dict(id="U2"))) == "U2"
+    assert profiler.message_user_id(dict(callback_id="delete")) is None
+
+
+def test_profile_writes_profile_and_logs_summary(tmp_path, caplog):
+    with caplog.at_level(logging.INFO, logger="chalicelib.lib.profiler"):
+        with profiler.profile("command_handler", top=5, directory=str(tmp_path)):
+            _work()
+
+    (path,) = tmp_path.iterdir()
+    assert path.name.startswith("timereport-profile-command_handler-")
+    (record,) = caplog.records
+    lines = record.getMessage().splitlines()
+    assert str(path) in lines[0]
+    assert len(lines) == 2 + 5
+    assert any("test_profiler.py" in line and "(_work)" in line for line in lines)
+
+
+def test_profile_includes_executor_threads(tmp_path, caplog):
+    async def handle():
+        return await run_blocking(_work)
+
+    with caplog.at_level(logging.INFO, logger="chalicelib.lib.profiler"):
+        with profiler.profile("command_handler", top=50, directory=str(tmp_path)):
+            asyncio.run(handle())
+
+    message = caplog.records[0].getMessage()
+    assert "with 1 calls on other threads" in message
+    assert "(_work)" in message
+
+    # Outside of a profile functions run as they are
+    assert profiler.run_profiled(sum, [1, 2]) == 3
+
+
+def test_profile_is_disabled_or_busy(tmp_path):
+    with profiler.profile("disabled", enabled=False, directory=str(tmp_path)):
+        _work()
+    assert list(tmp_path.iterdir()) == []
+
+    with profiler.profile("outer", directory=str(tmp_path)):
+        with profiler.profile("inner", directory=str(tmp_path)):
+            _work()
+    assert [path.name.split("-")[2] for path in tmp_path.iterdir()] == ["outer"]
+
+
+def test_old_profiles_are_removed(tmp_path):
+    for number in range(3):
+        old = tmp_path / f"timereport-profile-old-{number}.prof"
+        old.write_bytes(b"")
+        os.utime(old, (number, number))
+
+    with profiler.profile("new", directory=str(tmp_path), keep=2):
+        _work()
+
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert len(names) == 2
+    assert names[0].startswith("timereport-profile-new-")
+    assert names[1] == "timereport-profile-old-2.prof"
+
+
+def test_command_handler_is_profiled_for_user(chalice_app, tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setitem(app.config, "profile_user_ids", "U1")
+    for user_id in ("U1", "U2"):
+        r = call_from_slack(
+            chalice_app=chalice_app,
+            full_command="help",
+            user_id=user_id,
+            user_name="mattias",
+        )
+        assert r["response"]["statusCode"] == 200
+
+    (path,) = tmp_path.iterdir()
+    assert path.name.startswith("timereport-profile-command_handler-")
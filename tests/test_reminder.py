@@ -1,32 +1,47 @@
-import json
+import time
 
 import pytest
 import requests
 from mockito import expect, kwargs, mock, unstub, verify, when
 
-from chalicelib.lib.reminder import last_month, remind_users
-from chalicelib.lib.slack import Slack
+from chalicelib.lib.reminder import TokenBucket, last_month, remind_users
+from chalicelib.lib.reminder_ledger import SqliteReminderLedger
+from chalicelib.lib.slack import Slack, get_slack_api
 
 fake_config = dict(backend_url="http://localhost:8010", bot_access_token="secret_token")
 
 
-def test_remind_user_without_lock():
-    when(requests).get(url=f"{fake_config['backend_url']}/users", **kwargs).thenReturn(
-        mock({"status_code": 200, "text": json.dumps(dict(testuser="test"))})
+def _response(status_code, body=None):
+    return mock({"status_code": status_code, "text": str(body), "json": lambda: body})
+
+
+def _backend(**locks_by_user):
+    """
+    Backend with the users in locks_by_user, a list of locked months per user or
+    a status code when the locks can't be read
+    """
+    backend = mock()
+    when(backend).read_users().thenReturn(
+        _response(200, {user_id: user_id for user_id in locks_by_user})
     )
+    for user_id, locks in locks_by_user.items():
+        response = (
+            _response(locks)
+            if isinstance(locks, int)
+            else _response(200, [dict(event_date=month) for month in locks])
+        )
+        when(backend).read_lock(user_id=user_id).thenReturn(response)
+    return backend
 
-    when(requests).get(
-        url=f"{fake_config['backend_url']}/users/testuser/locks",
-        **kwargs,
-    ).thenReturn(mock({"status_code": 200, "text": json.dumps([])}))
 
-    when(requests).post(
+def test_remind_user_without_lock():
+    when(get_slack_api().session).post(
         url="https://slack.com/api/chat.postMessage", **kwargs
     ).thenReturn(mock({"status_code": 200}))
 
-    remind_users(Slack(fake_config["bot_access_token"]), fake_config["backend_url"])
+    remind_users(Slack(fake_config["bot_access_token"]), _backend(testuser=[]))
 
-    verify(requests, times=1).post(
+    verify(get_slack_api().session, times=1).post(
         url="https://slack.com/api/chat.postMessage", **kwargs
     )
 
@@ -34,17 +49,126 @@ def test_remind_user_without_lock():
 
 
 def test_remind_user_with_lock():
-    when(requests).get(url=f"{fake_config['backend_url']}/users", **kwargs).thenReturn(
-        mock({"status_code": 200, "text": json.dumps(dict(testuser="test"))})
+    with expect(get_slack_api().session, times=0).post(...):
+        remind_users(
+            Slack(fake_config["bot_access_token"]),
+            _backend(testuser=[last_month()]),
+        )
+
+    unstub()
+
+
+def test_remind_users_report():
+    backend = _backend(locked=[last_month()], unlocked=[], failing=500, timeout=[])
+    when(backend).read_lock(user_id="timeout").thenRaise(requests.Timeout())
+    when(get_slack_api().session).post(
+        url="https://slack.com/api/chat.postMessage", **kwargs
+    ).thenReturn(mock({"status_code": 200}))
+
+    report = remind_users(Slack(fake_config["bot_access_token"]), backend)
+
+    assert report.outcomes == dict(
+        locked="locked",
+        unlocked="reminded",
+        failing="lock_read_failed",
+        timeout="lock_read_failed",
+    )
+    assert report.reminded == ["unlocked"]
+    assert report.summary()["users"] == 4
+    unstub()
+
+
+def test_remind_users_fails_when_users_cant_be_read():
+    backend = mock()
+    when(backend).read_users().thenRaise(requests.ConnectionError())
+
+    assert remind_users(Slack(fake_config["bot_access_token"]), backend) is None
+
+
+def test_remind_user_retries_after_rate_limit():
+    when(get_slack_api().session).post(
+        url="https://slack.com/api/chat.postMessage", **kwargs
+    ).thenReturn(
+        mock({"status_code": 429, "headers": {"Retry-After": "2"}})
+    ).thenReturn(
+        mock({"status_code": 200})
+    )
+
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    limiter = TokenBucket(rate=10, clock=lambda: now[0], sleep=sleep)
+
+    report = remind_users(
+        Slack(fake_config["bot_access_token"]),
+        _backend(testuser=[]),
+        limiter=limiter,
     )
 
-    lock_evt = dict(event_date=last_month(), user_id="testuser")
-    when(requests).get(
-        url=f"{fake_config['backend_url']}/users/testuser/locks",
-        **kwargs,
-    ).thenReturn(mock({"status_code": 200, "text": json.dumps([lock_evt])}))
+    assert report.reminded == ["testuser"]
+    # Waited for Retry-After before sending again
+    assert now[0] == 2.0
+    verify(get_slack_api().session, times=2).post(
+        url="https://slack.com/api/chat.postMessage", **kwargs
+    )
+    unstub()
+
+
+def test_token_bucket():
+    now = [0.0]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    sleeps = []
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
 
-    with expect(requests, times=0).post(...):
-        remind_users(Slack(fake_config["bot_access_token"]), fake_config["backend_url"])
+    for _ in range(4):
+        bucket.acquire()
+    # Burst of 2, then one token every 0.5 seconds
+    assert sleeps == [0.5, 0.5]
 
+    bucket.pause(3)
+    bucket.acquire()
+    assert sum(sleeps) == 4.0
+
+
+def test_remind_users_with_ledger(tmp_path):
+    ledger = SqliteReminderLedger(path=str(tmp_path / "reminders.sqlite"))
+    month = last_month()
+    ledger.mark_locked(month, "locked_before")
+    ledger.mark_reminded(month, "reminded_today", time.time())
+    ledger.mark_reminded(month, "reminded_last_week", time.time() - 7 * 24 * 3600)
+
+    backend = _backend(
+        locked_before=[month],
+        reminded_today=[],
+        reminded_last_week=[],
+        locked_now=[month],
+    )
+    when(get_slack_api().session).post(
+        url="https://slack.com/api/chat.postMessage", **kwargs
+    ).thenReturn(mock({"status_code": 200}))
+
+    report = remind_users(
+        Slack(fake_config["bot_access_token"]),
+        backend,
+        ledger=ledger,
+        cadence_days=3,
+    )
+
+    assert report.outcomes == dict(
+        locked_before="locked",
+        reminded_today="not_due",
+        reminded_last_week="reminded",
+        locked_now="locked",
+    )
+    # Only users that could still be unlocked are read from the backend
+    verify(backend, times=2).read_lock(...)
+    entries = ledger.entries(month)
+    assert entries["locked_now"].locked is True
+    assert entries["reminded_last_week"].reminded_at > time.time() - 60
     unstub()
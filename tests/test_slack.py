@@ -1,15 +1,22 @@
 import os
-from mockito import when, mock, unstub
-from .test_data import fake_request_body
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 import requests
+from mockito import kwargs, when, mock, unstub
+from .test_data import fake_request_body
 from chalicelib.lib.slack import (
+    get_slack_api,
     slack_payload_extractor,
     verify_token,
     submit_message_menu,
     delete_message_menu,
     slack_client_responder,
     slack_responder,
+    get_slack,
     Slack,
+    SlackApi,
+    SlackMessage,
 )
 
 fake_slack = Slack(slack_token="fake")
@@ -56,7 +63,9 @@ def test_slack_client_responder():
         "Content-Type": "application/json; charset=utf-8",
         "Authorization": "Bearer fake",
     }
-    when(requests).post(url=fake_url, json=fake_data, headers=fake_headers).thenReturn(
+    when(get_slack_api().session).post(
+        url=fake_url, json=fake_data, headers=fake_headers, **kwargs
+    ).thenReturn(
         mock({"status_code": 200, "text": '{"ok": "true", "message_ts": "xxxxx"}'})
     )
 
@@ -68,16 +77,17 @@ def test_slack_client_responder():
     unstub()
 
 
-def test_slack_client_responder_failure():
+def test_slack_client_responder_failure(monkeypatch):
+    monkeypatch.setattr(get_slack_api(), "sleep", lambda seconds: None)
     fake_url = "http://fake_slack_url.com"
     fake_data = {"channel": "fake", "text": "From timereport", "attachments": "fake"}
     fake_headers = {
         "Content-Type": "application/json; charset=utf-8",
         "Authorization": "Bearer fake",
     }
-    when(requests).post(url=fake_url, json=fake_data, headers=fake_headers).thenReturn(
-        mock({"status_code": 500})
-    )
+    when(get_slack_api().session).post(
+        url=fake_url, json=fake_data, headers=fake_headers, **kwargs
+    ).thenReturn(mock({"status_code": 500}))
 
     test_result = slack_client_responder(
         token="fake", user_id="fake", attachment="fake", url=fake_url
@@ -87,10 +97,11 @@ def test_slack_client_responder_failure():
 
 
 def test_slack_responder():
-    when(requests).post(
+    when(get_slack_api().session).post(
         url="fake",
         json={"text": "fake message"},
         headers={"Content-Type": "application/json"},
+        **kwargs,
     ).thenReturn(mock({"status_code": 200}))
     assert slack_responder(url="fake", msg="fake message") == 200
     unstub()
@@ -122,17 +133,153 @@ def test_delete_menu():
 
 
 def test_add_divider():
-    fake_slack = Slack(slack_token="fake")
-    fake_slack.add_divider_block()
-    assert isinstance(fake_slack.blocks, list)
-    assert "type" in fake_slack.blocks[0].keys()
-    assert "block_id" in fake_slack.blocks[0].keys()
+    message = SlackMessage()
+    message.add_divider_block()
+    assert isinstance(message.blocks, list)
+    assert "type" in message.blocks[0].keys()
+    assert "block_id" in message.blocks[0].keys()
 
 
 def test_add_section():
-    fake_slack = Slack(slack_token="fake")
-    fake_slack.add_section_block(text="Fake section")
-    assert isinstance(fake_slack.blocks, list)
-    assert "type" in fake_slack.blocks[0].keys()
-    assert "text" in fake_slack.blocks[0].keys()
-    assert isinstance(fake_slack.blocks[0].get("text"), dict)
+    message = SlackMessage()
+    message.add_section_block(text="Fake section")
+    assert isinstance(message.blocks, list)
+    assert "type" in message.blocks[0].keys()
+    assert "text" in message.blocks[0].keys()
+    assert isinstance(message.blocks[0].get("text"), dict)
+
+
+def _fake_response(status_code, headers=None):
+    return mock({"status_code": status_code, "headers": headers or {}})
+
+
+def test_slack_api_retries_with_retry_after():
+    sleeps = []
+    slack_api = SlackApi(sleep=sleeps.append)
+    url = "https://slack.com/api/conversations.open"
+    when(slack_api.session).post(url=url, **kwargs).thenReturn(
+        _fake_response(429, {"Retry-After": "3"})
+    ).thenReturn(_fake_response(503)).thenReturn(_fake_response(200))
+
+    response = slack_api.post(url=url, json={}, headers={}, idempotent=True)
+
+    assert response.status_code == 200
+    assert sleeps[0] == 3
+    assert 0 <= sleeps[1] <= slack_api.backoff * 2
+    metric = slack_api.metrics["conversations.open"]
+    assert metric["count"] == 3
+    assert metric["errors"] == 2
+    assert sum(metric["buckets"].values()) == 3
+
+
+def test_slack_api_gives_up_after_retries():
+    slack_api = SlackApi(max_retries=2, sleep=lambda seconds: None)
+    when(slack_api.session).post(...).thenReturn(_fake_response(429))
+
+    assert (
+        slack_api.post(url="http://response.url", json={}, headers={}).status_code
+        == 429
+    )
+    assert slack_api.metrics["response_url"]["count"] == 3
+    assert slack_api.post(url="http://response.url", json={}, headers={}, retries=0)
+    assert slack_api.metrics["response_url"]["count"] == 4
+
+
+def test_slack_api_does_not_retry_client_errors():
+    slack_api = SlackApi(sleep=lambda seconds: None)
+    when(slack_api.session).post(...).thenReturn(_fake_response(400))
+
+    assert (
+        slack_api.post(url="http://response.url", json={}, headers={}).status_code
+        == 400
+    )
+    assert slack_api.metrics["response_url"]["count"] == 1
+
+
+def test_slack_api_only_retries_messages_that_did_not_reach_slack():
+    slack_api = SlackApi(sleep=lambda seconds: None)
+    url = "https://slack.com/api/chat.postMessage"
+
+    when(slack_api.session).post(url=url, **kwargs).thenReturn(_fake_response(503))
+    assert slack_api.post(url=url, json={}, headers={}).status_code == 503
+    assert slack_api.metrics["chat.postMessage"]["count"] == 1
+
+    when(slack_api.session).post(url=url, **kwargs).thenRaise(requests.ReadTimeout())
+    with pytest.raises(requests.ReadTimeout):
+        slack_api.post(url=url, json={}, headers={})
+    assert slack_api.metrics["chat.postMessage"]["count"] == 2
+
+    when(slack_api.session).post(url=url, **kwargs).thenRaise(
+        requests.ConnectTimeout()
+    ).thenRaise(requests.ConnectionError()).thenReturn(_fake_response(200))
+    assert slack_api.post(url=url, json={}, headers={}).status_code == 200
+    assert slack_api.metrics["chat.postMessage"]["count"] == 5
+
+
+def test_blocks_are_paged_by_count():
+    message = SlackMessage()
+    for day in range(120):
+        message.add_section_block(text=f"Day {day}")
+
+    assert len(message.blocks) == 120
+    assert message.pages == [0, 50, 100]
+    assert [len(page) for page in message.page_blocks()] == [50, 50, 20]
+
+
+def test_blocks_are_paged_by_size():
+    message = SlackMessage()
+    for _ in range(4):
+        message.add_section_block(text="x" * 12000)
+
+    assert message.pages == [0, 2]
+
+
+def test_post_message_sends_pages_in_thread(monkeypatch):
+    sent = []
+
+    def fake_post(url, json, headers, retries=None):
+        sent.append(json)
+        response = mock({"status_code": 200, "text": "ok"})
+        when(response).json().thenReturn({"ok": True, "ts": "1.0"})
+        return response
+
+    monkeypatch.setattr(get_slack_api(), "post", fake_post)
+    message = SlackMessage()
+    for day in range(60):
+        message.add_section_block(text=f"Day {day}")
+
+    response = fake_slack.post_message(
+        "List", channel="fake", thread_pages=True, blocks=message
+    )
+
+    assert response.status_code == 200
+    assert [message["text"] for message in sent] == ["List (1/2)", "List (2/2)"]
+    assert len(sent[0]["blocks"]) == 50
+    assert sent[1]["blocks"][0]["text"]["text"] == "Day 50"
+    assert "thread_ts" not in sent[0]
+    assert sent[1]["thread_ts"] == "1.0"
+
+
+def test_get_slack_shares_clients():
+    slack = get_slack("fake")
+
+    assert get_slack("fake") is slack
+    assert slack.api is get_slack_api()
+    assert get_slack("other") is not slack
+    assert slack.headers["Authorization"] == "Bearer fake"
+
+
+def test_get_slack_pools_other_base_urls():
+    slack = get_slack("fake", "http://127.0.0.1:1/api")
+
+    assert slack is not get_slack("fake")
+    assert slack.slack_api_url == "http://127.0.0.1:1/api"
+    assert slack.api is not get_slack_api()
+    assert get_slack("other", "http://127.0.0.1:1/api").api is not slack.api
+
+
+def test_get_slack_is_thread_safe():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: get_slack("threaded"), range(32)))
+
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,106 @@
+import json
+import threading
+
+import boto3
+import pytest
+from mockito import mock, unstub, verify, when
+
+from chalicelib.lib import sqs
+
+
+@pytest.fixture(autouse=True)
+def reset_sqs(monkeypatch):
+    monkeypatch.setattr(sqs, "_client", None)
+    monkeypatch.setattr(sqs, "_queue_urls", {})
+    monkeypatch.setattr(sqs, "enqueue_timings", {})
+    yield
+    unstub()
+
+
+def test_send_message_reuses_client_and_queue_url():
+    client = mock()
+    when(boto3).client("sqs").thenReturn(client)
+    when(client).get_queue_url(QueueName="fake-queue").thenReturn(
+        dict(QueueUrl="http://fake-queue-url")
+    )
+    when(client).send_message(...).thenReturn(None)
+
+    for _ in range(3):
+        sqs.send_message(True, "fake-queue", dict(text="list"), None)
+
+    verify(boto3, times=1).client("sqs")
+    verify(client, times=1).get_queue_url(QueueName="fake-queue")
+    verify(client, times=3).send_message(
+        QueueUrl="http://fake-queue-url", MessageBody=json.dumps(dict(text="list"))
+    )
+    assert sqs.enqueue_timings["fake-queue"]["count"] == 3
+
+
+def test_send_message_with_known_queue_url():
+    client = mock()
+    when(boto3).client("sqs").thenReturn(client)
+    when(client).send_message(...).thenReturn(None)
+
+    sqs.send_message(True, "fake-queue", {}, None, queue_url="http://known")
+
+    verify(client, times=0).get_queue_url(...)
+    verify(client).send_message(QueueUrl="http://known", MessageBody="{}")
+
+
+def test_send_message_without_queue_calls_handler():
+    received = []
+    sqs.send_message(
+        None, "fake-queue", dict(text="list"), lambda *a: received.append(a)
+    )
+
+    assert received == [
+        (
+            dict(Records=[dict(body=json.dumps(dict(text="list")), receiptHandle="")]),
+            None,
+        )
+    ]
+    assert sqs.enqueue_timings == {}
+
+
+def _record(message_id, body):
+    return mock({"body": body, "to_dict": lambda: dict(messageId=message_id)})
+
+
+def _fail_on_bad_body(record):
+    if record.body == "bad":
+        raise ValueError("bad record")
+
+
+def test_process_records_partial_batch_response():
+    records = [_record("1", "good"), _record("2", "bad"), _record("3", "good")]
+
+    response = sqs.process_records(
+        records, _fail_on_bad_body, partial_batch_response=True
+    )
+    assert response == dict(batchItemFailures=[dict(itemIdentifier="2")])
+
+
+def test_process_records_raises_without_partial_batch_response():
+    handled = []
+
+    def _handler(record):
+        handled.append(record.body)
+        _fail_on_bad_body(record)
+
+    with pytest.raises(ValueError):
+        sqs.process_records([_record("1", "bad"), _record("2", "good")], _handler)
+
+    # All records are handled even if one fails
+    assert sorted(handled) == ["bad", "good"]
+
+
+def test_process_records_runs_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    response = sqs.process_records(
+        [_record(str(i), "good") for i in range(3)],
+        lambda record: barrier.wait(),
+        max_workers=3,
+        partial_batch_response=True,
+    )
+    assert response == dict(batchItemFailures=[])
@@ -0,0 +1,91 @@
+import json
+
+import requests
+from chalicelib.lib.api import BackendApi
+from chalicelib.lib.team import UserReport, team_report
+from mockito import mock, unstub, when
+
+
+def _response(status_code, data):
+    response = mock({"status_code": status_code, "text": json.dumps(data)})
+    when(response).json().thenReturn(data)
+    return response
+
+
+def _fake_backend(users, events, locks):
+    backend = BackendApi("http://fakebackend.nowhere", "fake")
+    when(backend).read_users().thenReturn(_response(200, users))
+    for user_id in users:
+        when(backend).read_event(user_id=user_id, date=...).thenReturn(
+            _response(200, events.get(user_id, []))
+        )
+        when(backend).read_lock(user_id=user_id).thenReturn(
+            locks.get(user_id, _response(200, []))
+        )
+    return backend
+
+
+def test_team_report():
+    backend = _fake_backend(
+        users=dict(locked="Locked", absent="Absent", failing="Failing"),
+        events=dict(
+            absent=[
+                dict(event_date="2020-09-01", reason="vab", hours=8),
+                dict(event_date="2020-09-02", reason="vab", hours=4),
+            ]
+        ),
+        locks=dict(
+            locked=_response(200, [dict(event_date="2020-09", user_id="locked")]),
+            failing=_response(500, None),
+        ),
+    )
+
+    report = team_report(backend, "2020-09", max_workers=2)
+
+    assert [user.user_id for user in report.users] == ["locked", "absent", "failing"]
+    assert report.users[0] == UserReport("locked", 176, 176, {}, True)
+    assert report.users[1].worked_hours == 164
+    assert report.users[1].absence == {"vab": 12}
+    assert not report.users[1].locked
+    assert report.locked == ["locked"]
+    assert report.failed == ["failing"]
+    assert report.elapsed > 0
+    unstub()
+
+
+def test_team_report_many_users():
+    users = {f"user{number}": "User" for number in range(300)}
+    backend = _fake_backend(users=users, events={}, locks={})
+
+    report = team_report(backend, "2020-09", max_workers=8)
+
+    assert len(report.users) == 300
+    assert not report.failed
+    unstub()
+
+
+def test_team_report_marks_users_with_exceptions_as_failed():
+    backend = _fake_backend(
+        users=dict(slow="Slow", broken="Broken", fine="Fine"), events={}, locks={}
+    )
+    when(backend).read_lock(user_id="slow").thenRaise(requests.Timeout())
+    broken = mock({"status_code": 200, "text": "<html>"})
+    when(broken).json().thenRaise(ValueError("Expecting value"))
+    when(backend).read_event(user_id="broken", date=...).thenReturn(broken)
+
+    report = team_report(backend, "2020-09", max_workers=2)
+
+    assert report.failed == ["slow", "broken"]
+    assert report.users[2] == UserReport("fine", 176, 176, {}, False)
+    unstub()
+
+
+def test_team_report_without_users():
+    backend = BackendApi("http://fakebackend.nowhere", "fake")
+    when(backend).read_users().thenReturn(_response(500, None))
+
+    assert team_report(backend, "2020-09") is None
+
+    when(backend).read_users().thenRaise(requests.ConnectionError("backend down"))
+    assert team_report(backend, "2020-09") is None
+    unstub()
@@ -5,6 +5,7 @@ from typing import Dict, List
 from unittest import mock
 from urllib.parse import urlencode
 
+from chalicelib.lib.slack import get_slack_api
 from tests.conftest import signing_secret
 
 
@@ -67,7 +68,7 @@ def _perform_call(chalice_app, endpoint, payload):
     request_basestring = f"v0:{timestamp}:{body}"
     new_sign = f'v0={hmac.new(bytes(signing_secret, "utf-8"), bytes(request_basestring, "utf-8"), hashlib.sha256).hexdigest()}'
 
-    with mock.patch("chalicelib.lib.slack.requests") as mock_request:
+    with mock.patch.object(get_slack_api(), "session") as mock_request:
         mock_request.post.return_value = mock.Mock(status_code=200)
         response = chalice_app.handle_request(
             method="POST",